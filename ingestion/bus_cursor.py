@@ -0,0 +1,226 @@
+"""
+Cursor compartido sobre el bus LUA (``data/lua_eventbus.jsonl``).
+
+Un único componente para los tres lectores del bus (colector, control loop y
+``tools/drain_lua_bus``):
+
+- lee por lotes con ``FileTailer`` (handle abierto, solo líneas completas);
+- decodifica cada línea UNA vez (``orjson`` si está instalado, si no ``json``);
+- persiste el offset en un fichero de estado opcional (``load_offset`` /
+  ``write_offset``, mismo formato que usaba ``drain_lua_bus``: un entero);
+- reparte cada lote a todos los suscriptores del proceso (pub/sub), de modo
+  que varios consumidores comparten una sola lectura. ``shared_cursor(path)``
+  devuelve el cursor común de una ruta.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ingestion.file_tailer import FileTailer
+
+try:  # decodificador rápido opcional
+    import orjson as _orjson  # type: ignore
+except Exception:  # pragma: no cover - depende del entorno
+    _orjson = None  # type: ignore
+
+Event = Dict[str, Any]
+
+
+def decode_line(raw: bytes) -> Optional[Event]:
+    """JSON de una línea del bus -> dict (``None`` si no es un objeto JSON válido)."""
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        if _orjson is not None:
+            evt = _orjson.loads(raw)
+        else:
+            evt = json.loads(raw.decode("utf-8", errors="ignore"))
+    except ValueError:  # json.JSONDecodeError y orjson.JSONDecodeError
+        return None
+    return evt if isinstance(evt, dict) else None
+
+
+def load_offset(state_path: Path | str) -> int:
+    """Offset guardado en ``state_path`` (0 si no existe o no se puede leer)."""
+    state = Path(state_path)
+    try:
+        if state.exists():
+            txt = state.read_text(encoding="utf-8").strip()
+            return int(txt) if txt else 0
+    except Exception:
+        return 0
+    return 0
+
+
+def write_offset(state_path: Path | str, offset: int) -> None:
+    p = Path(state_path)
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_text(str(int(offset)), encoding="utf-8")
+    tmp.replace(p)
+
+
+class Subscription:
+    """Cola de eventos de un consumidor; ``drain()`` devuelve y vacía lo pendiente."""
+
+    def __init__(self, maxlen: Optional[int] = None) -> None:
+        self._q: Deque[Event] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def _push(self, events: List[Event]) -> None:
+        with self._lock:
+            self._q.extend(events)
+
+    def drain(self) -> List[Event]:
+        with self._lock:
+            out = list(self._q)
+            self._q.clear()
+        return out
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+
+class BusCursor:
+    """Lector por lotes del bus con offset persistente y reparto a suscriptores.
+
+    - ``state_path``: fichero con el offset; si existe, se reanuda desde él.
+      Sin estado, ``from_end`` decide si se empieza al final o al principio.
+    - ``read_batch()`` lee lo nuevo, lo decodifica, lo publica a los
+      suscriptores y lo devuelve. Con ``state_path`` guarda el offset tras cada
+      lote (``autocommit``) o al llamar a ``commit()``.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        state_path: Path | str | None = None,
+        from_end: bool = False,
+        autocommit: bool = True,
+    ) -> None:
+        self.path = Path(path)
+        self.state_path = Path(state_path) if state_path else None
+        self.autocommit = bool(autocommit)
+        self._lock = threading.RLock()
+        self._subs: List[Subscription] = []
+        self._callbacks: List[Callable[[List[Event]], None]] = []
+        if self.state_path is not None and self.state_path.exists():
+            self.tailer = FileTailer(self.path, from_end=False)
+            self.tailer.seek(load_offset(self.state_path))
+        else:
+            self.tailer = FileTailer(self.path, from_end=from_end)
+        self.stats = {"batches": 0, "lines": 0, "events": 0, "bad_lines": 0}
+
+    @property
+    def offset(self) -> int:
+        return self.tailer.offset
+
+    def subscribe(
+        self, callback: Optional[Callable[[List[Event]], None]] = None, maxlen: Optional[int] = None
+    ) -> Optional[Subscription]:
+        """Registra un consumidor: ``callback(lote)`` o, sin callback, una ``Subscription``."""
+        with self._lock:
+            if callback is not None:
+                self._callbacks.append(callback)
+                return None
+            sub = Subscription(maxlen=maxlen)
+            self._subs.append(sub)
+            return sub
+
+    def unsubscribe(self, sub: Any) -> None:
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+            if sub in self._callbacks:
+                self._callbacks.remove(sub)
+
+    def read_lines(self) -> List[bytes]:
+        """Líneas completas nuevas sin decodificar (no se publican)."""
+        with self._lock:
+            return self.tailer.read_lines()
+
+    def read_batch(self) -> List[Event]:
+        with self._lock:
+            lines = self.tailer.read_lines()
+            if not lines:
+                return []
+            events: List[Event] = []
+            for raw in lines:
+                evt = decode_line(raw)
+                if evt is None:
+                    if raw.strip():
+                        self.stats["bad_lines"] += 1
+                    continue
+                events.append(evt)
+            self.stats["batches"] += 1
+            self.stats["lines"] += len(lines)
+            self.stats["events"] += len(events)
+            if self.autocommit:
+                self.commit()
+            if events:
+                for sub in self._subs:
+                    sub._push(events)
+                for cb in self._callbacks:
+                    cb(events)
+            return events
+
+    poll_batch = read_batch
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.tailer.wait(timeout)
+
+    def commit(self) -> None:
+        if self.state_path is not None:
+            write_offset(self.state_path, self.offset)
+
+    def close(self) -> None:
+        with self._lock:
+            if self.autocommit:
+                self.commit()
+            self.tailer.close()
+
+
+_shared: Dict[str, BusCursor] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cursor(path: Path | str, **kwargs: Any) -> BusCursor:
+    """Cursor único por ruta dentro del proceso (los kwargs solo cuentan al crearlo)."""
+    key = Path(path).resolve().as_posix()
+    with _shared_lock:
+        cur = _shared.get(key)
+        if cur is None:
+            cur = _shared[key] = BusCursor(path, **kwargs)
+        return cur
+
+
+def read_new_lines(path: Path | str, offset: int) -> Tuple[List[bytes], int]:
+    """Lectura puntual: líneas completas desde ``offset`` y el nuevo offset.
+
+    Si el fichero es más corto que ``offset`` (rotado/truncado) se empieza en 0.
+    """
+    if not Path(path).exists():
+        return [], offset
+    t = FileTailer(path, from_end=False)
+    try:
+        t.seek(max(0, int(offset)))
+        lines = t.read_lines()
+        return lines, t.offset
+    finally:
+        t.close()
+
+
+__all__ = [
+    "BusCursor",
+    "Subscription",
+    "decode_line",
+    "load_offset",
+    "read_new_lines",
+    "shared_cursor",
+    "write_offset",
+]
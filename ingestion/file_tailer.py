@@ -0,0 +1,195 @@
+"""
+Lector "tail -f" de ficheros de texto por líneas (p. ej. ``lua_eventbus.jsonl``).
+
+Mantiene el fichero abierto y en cada ``read_lines()`` lee TODO lo disponible
+con una sola llamada ``readinto`` sobre un buffer reutilizable. Devuelve solo
+las líneas completas; la línea parcial final (el escritor aún no puso ``\\n``)
+se guarda para la siguiente lectura.
+
+Detecta truncado (tamaño < posición) y rotación (otro inode/dispositivo en la
+ruta) y en ambos casos reabre desde el principio. ``wait(timeout)`` bloquea
+hasta que hay datos nuevos con un sondeo de ``stat`` con backoff exponencial
+(funciona igual en Windows, donde no hay inotify).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import BinaryIO, List, Optional
+
+
+class FileTailer:
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        from_end: bool = True,
+        chunk_size: int = 64 * 1024,
+        min_backoff_s: float = 0.005,
+        max_backoff_s: float = 0.1,
+    ) -> None:
+        self.path = os.fspath(path)
+        self.from_end = bool(from_end)
+        self.min_backoff_s = float(min_backoff_s)
+        self.max_backoff_s = float(max_backoff_s)
+        self._buf = bytearray(max(1024, int(chunk_size)))
+        self._partial = b""
+        self._fh: Optional[BinaryIO] = None
+        self._ident: Optional[tuple] = None
+        self._read_pos = 0  # bytes leídos del fichero actual
+        self._start_at: Optional[int] = None
+        self.rotations = 0
+        self.reads = 0
+        if self.from_end and not self._open():
+            # aún no existe: cuando aparezca, todo su contenido es nuevo
+            self.from_end = False
+
+    # --- estado -----------------------------------------------------------
+    @property
+    def offset(self) -> int:
+        """Bytes ya entregados como líneas completas (excluye la parcial)."""
+        return self._read_pos - len(self._partial)
+
+    def _open(self) -> bool:
+        try:
+            fh = open(self.path, "rb")
+        except OSError:
+            return False
+        st = os.fstat(fh.fileno())
+        self._fh = fh
+        self._ident = (st.st_dev, st.st_ino)
+        self._partial = b""
+        if self._start_at is not None:
+            # offset mayor que el fichero: se rotó/truncó desde entonces -> desde 0
+            fh.seek(self._start_at if self._start_at <= st.st_size else 0)
+        elif self.from_end:
+            fh.seek(0, os.SEEK_END)
+        self._start_at = None
+        self.from_end = False  # solo la primera apertura salta al final
+        self._read_pos = fh.tell()
+        return True
+
+    def seek(self, offset: int) -> None:
+        """Posiciona la lectura en ``offset`` (p. ej. cursor persistido)."""
+        if self._fh is None:
+            self._start_at = int(offset)
+            self._open()
+            return
+        self._fh.seek(int(offset))
+        self._read_pos = int(offset)
+        self._partial = b""
+
+    def close(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            try:
+                fh.close()
+            except Exception:
+                pass
+
+    def _check_rotation(self) -> bytes:
+        """Reabre desde 0 si la ruta apunta a otro fichero o este se truncó.
+
+        En una rotación devuelve lo que quedaba sin leer del fichero antiguo
+        (con la línea parcial delante) para no perder su cola.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return b""  # borrado: seguimos con el handle hasta que aparezca otro
+        rotated = self._ident is not None and (st.st_dev, st.st_ino) != self._ident
+        # en Windows st_ino puede ser 0 -> solo cuenta el tamaño
+        if rotated and st.st_ino == 0:
+            rotated = False
+        if not rotated and st.st_size >= self._read_pos:
+            return b""
+        old_tail = b""
+        if rotated:
+            old_tail = self._partial + self._read_available()
+            if old_tail and not old_tail.endswith(b"\n"):
+                old_tail += b"\n"
+        self.close()
+        self.from_end = False
+        self.rotations += 1
+        self._open()
+        return old_tail
+
+    # --- lectura ----------------------------------------------------------
+    def _read_available(self) -> bytes:
+        fh = self._fh
+        assert fh is not None
+        chunks: List[bytes] = []
+        view = memoryview(self._buf)
+        while True:
+            n = fh.readinto(view)  # type: ignore[attr-defined]
+            self.reads += 1
+            if not n:
+                break
+            self._read_pos += n
+            chunks.append(bytes(view[:n]))
+            if n < len(self._buf):
+                break
+            # buffer lleno: probablemente hay más; seguimos leyendo
+        return b"".join(chunks)
+
+    def read_lines(self) -> List[bytes]:
+        """Líneas completas nuevas (sin ``\\n`` final); ``[]`` si no hay nada."""
+        old_tail = b""
+        if self._fh is None:
+            if not self._open():
+                return []
+        else:
+            old_tail = self._check_rotation()
+            if self._fh is None:
+                return self._split(old_tail)
+        data = self._read_available()
+        if self._partial:
+            data = self._partial + data
+        if old_tail:
+            data = old_tail + data
+        if not data:
+            return []
+        return self._split(data)
+
+    def _split(self, data: bytes) -> List[bytes]:
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            self._partial = data
+            return []
+        self._partial = data[cut + 1:]
+        return [ln.rstrip(b"\r") for ln in data[:cut].split(b"\n")]
+
+    def _has_new_data(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if self._fh is None:
+            return st.st_size > (self._start_at or 0)
+        if self._ident is not None and st.st_ino and (st.st_dev, st.st_ino) != self._ident:
+            return True
+        return st.st_size != self._read_pos
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Bloquea hasta que haya bytes nuevos (o rotación). ``False`` si vence ``timeout``."""
+        deadline = None if timeout is None else time.monotonic() + float(timeout)
+        delay = self.min_backoff_s
+        while not self._has_new_data():
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                time.sleep(min(delay, left))
+            else:
+                time.sleep(delay)
+            delay = min(delay * 2, self.max_backoff_s)
+        return True
+
+    def __enter__(self) -> "FileTailer":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+__all__ = ["FileTailer"]
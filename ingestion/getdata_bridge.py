@@ -17,7 +17,11 @@ BUS = Path("data/lua_eventbus.jsonl")
 BUS.parent.mkdir(parents=True, exist_ok=True)
 
 
-def emit(d: dict) -> None:
+def emit(d: dict, t_read: float | None = None) -> None:
+    # sellos de latencia (ver runtime.latency): perf_counter común a todos los procesos
+    if t_read is not None:
+        d["ts_bridge_read"] = t_read
+    d["ts_bus_write"] = time.perf_counter()
     with BUS.open("a", encoding="utf-8") as f:
         f.write(json.dumps(d, ensure_ascii=False) + "\n")
 
@@ -70,6 +74,7 @@ def run(
             continue
 
         txt = GETDATA.read_text(encoding="utf-8", errors="ignore")
+        t_read = time.perf_counter()
         sig = (len(txt), int(os.path.getmtime(GETDATA)))
         if sig == last_sig:
             time.sleep(interval)
@@ -101,7 +106,8 @@ def run(
                         "next": cur_kph,
                         "t_game": t_game,
                         "source": "getdata_current",
-                    }
+                    },
+                    t_read,
                 )
                 last_current_kph = cur_kph
 
@@ -125,7 +131,8 @@ def run(
                             "dist_m": nxt_dist,
                             "t_game": t_game,
                             "source": "getdata_probe",
-                        }
+                        },
+                        t_read,
                     )
                     last_next_kph = nxt_kph
                     last_next_dist = nxt_dist
@@ -1,46 +1,72 @@
 from __future__ import annotations
 
-import json
 import os
-import time
-from typing import Any, Dict, Iterable, Optional
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from ingestion.bus_cursor import BusCursor
 
 
 class LuaEventBus:
+    """Lee eventos JSONL que escribe el script Lua (``lua_eventbus.jsonl``).
+
+    Lee a través de un ``BusCursor`` (handle abierto, lotes, JSON decodificado
+    una vez): las líneas a medio escribir se esperan a la siguiente lectura.
+    ``poll_batch()`` devuelve todos los eventos nuevos; ``poll()`` conserva la
+    API anterior (uno por llamada, sin bloquear). Con ``cursor`` se reutiliza
+    un cursor ya existente (p. ej. ``shared_cursor``) y otros consumidores
+    pueden suscribirse a él.
+    """
+
     def __init__(
-        self, path: str, from_end: bool = True, create_if_missing: bool = True
+        self,
+        path: str,
+        from_end: bool = True,
+        create_if_missing: bool = True,
+        cursor: Optional[BusCursor] = None,
     ) -> None:
         self.path = path
-        self.pos = 0
         # Crea el fichero y carpeta si no existen (evita fallos y bloqueos)
         if create_if_missing:
-            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
             try:
                 open(self.path, "a", encoding="utf-8").close()
             except Exception:
                 pass
-        if from_end and os.path.exists(self.path):
-            self.pos = os.path.getsize(self.path)
+        self.cursor = cursor if cursor is not None else BusCursor(self.path, from_end=from_end)
+        self._pending: Deque[Dict[str, Any]] = deque()
+
+    @property
+    def pos(self) -> int:
+        """Offset (bytes) del fichero hasta el que se han consumido líneas completas."""
+        return self.cursor.offset
+
+    def poll_batch(self, max_events: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Todos los eventos disponibles (o hasta ``max_events``), sin bloquear."""
+        if not self._pending:
+            self._pending.extend(self.cursor.read_batch())
+        if max_events is None or max_events >= len(self._pending):
+            out = list(self._pending)
+            self._pending.clear()
+            return out
+        return [self._pending.popleft() for _ in range(max(0, int(max_events)))]
 
     def poll(self) -> Optional[Dict[str, Any]]:
-        # Si no existe, devuelve None sin dormir (no frenes el muestreo)
-        if not os.path.exists(self.path):
-            return None
-        with open(self.path, "r", encoding="utf-8", errors="ignore") as f:
-            f.seek(self.pos)
-            line = f.readline()
-            if not line:
-                return None
-            self.pos = f.tell()
-            try:
-                return json.loads(line)
-            except json.JSONDecodeError:
-                return None
+        # Sin eventos devuelve None sin dormir (no frenes el muestreo)
+        batch = self.poll_batch(1)
+        return batch[0] if batch else None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Bloquea hasta que haya eventos pendientes o bytes nuevos en el fichero."""
+        return bool(self._pending) or self.cursor.wait(timeout)
+
+    def close(self) -> None:
+        self.cursor.close()
 
     def stream(self) -> Iterable[Dict[str, Any]]:
         while True:
-            evt = self.poll()
-            if evt:
-                yield evt
+            batch = self.poll_batch()
+            if batch:
+                yield from batch
             else:
-                time.sleep(0.05)
+                self.wait(0.5)
@@ -1,16 +1,20 @@
 ﻿from __future__ import annotations
 
 import logging
+import math
 import os
 import platform
 import re
 import struct
 import sys
 import time
+from array import array
 from pathlib import Path
 from queue import Empty, Queue
 from threading import Event, Thread
-from typing import Any, Dict, Iterable, Iterator, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from runtime.scheduler import POLICIES, DeadlineScheduler
 
 # Optional Prometheus metrics (do not hard-fail if library missing)
 try:
@@ -95,6 +99,82 @@ def _load_suggested_aliases() -> Dict[str, List[str]]:
     return {}
 
 
+# --- Caché por loco de la resolución de controles (lista común + schema) ---
+# Subir si cambian las heurísticas de _compute_common_controls/schema.
+_CONTROLS_CACHE_VERSION = 1
+# fingerprint -> {"fingerprint", "controls", "schema", "index"} (compartido en el proceso)
+_RESOLVED: Dict[str, Dict[str, Any]] = {}
+# Campos fijos del CSV además de los controles comunes
+_SCHEMA_BASE: List[str] = [
+    "provider",
+    "product",
+    "engine",
+    "lat",
+    "lon",
+    "heading",
+    "heading_deg",
+    "gradient",
+    "fuel_level",
+    "is_in_tunnel",
+    "time_ingame_h",
+    "time_ingame_m",
+    "time_ingame_s",
+    "time_ingame",
+    "v_ms",
+    "v_kmh",
+    "odom_m",
+    "t_wall",
+]
+
+
+def _controls_cache_path() -> Path | None:
+    """Fichero de la caché en disco (``TSC_RD_CONTROLS_CACHE``; ``0`` la desactiva)."""
+    val = os.getenv("TSC_RD_CONTROLS_CACHE", str(Path("data") / "cache" / "rd_controls.json"))
+    if val.strip().lower() in ("", "0", "off", "none"):
+        return None
+    return Path(val)
+
+
+def _resolver_stamp() -> str:
+    """Cambia cuando cambian las reglas de resolución (controls.py / suggested_aliases.json)."""
+    base = Path(__file__).resolve().parents[1] / "profiles"
+    parts = [f"v{_CONTROLS_CACHE_VERSION}"]
+    for name in ("controls.py", "suggested_aliases.json"):
+        try:
+            st = (base / name).stat()
+            parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{name}:-")
+    return "|".join(parts)
+
+
+def _load_controls_cache(path: Path) -> Dict[str, Any]:
+    try:
+        import json as _json
+
+        data = _json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict) and isinstance(data.get("locos"), dict):
+            return data
+    except Exception:
+        pass
+    return {"locos": {}}
+
+
+def _save_controls_cache(path: Path, loco: str, entry: Dict[str, Any]) -> None:
+    """Añade/actualiza la entrada de ``loco`` (escritura atómica, best effort)."""
+    try:
+        import json as _json
+
+        data = _load_controls_cache(path)
+        data["locos"][loco] = entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(_json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(path)
+    except Exception:
+        logging.getLogger("ingestion.rd_client").debug("no se pudo guardar %s", path, exc_info=True)
+
+
 # NOTE: Starting an HTTP exporter at module import can cause surprising side-effects
 # (server started on import). We prefer to start it explicitly when the runtime
 # is constructed (RDClient.__init__) so tests and importers aren't affected.
@@ -133,6 +213,8 @@ if USE_FAKE:
 
 # Claves especiales disponibles en Listener (no se suscriben; se evalúan siempre)
 SPECIAL_KEYS: List[str] = list(Listener.special_fields.keys())  # type: ignore[attr-defined]
+# (clave, método del driver) para leer los specials sin pasar por el listener
+_SPECIAL_GETTERS = tuple(Listener.special_fields.items())  # type: ignore[attr-defined]
 
 
 def _locate_raildriver_dll() -> str | None:
@@ -252,6 +334,7 @@ class RDClient:
     rd: Optional[object]
     listener: Optional[object]
     ctrl_index_by_name: Dict[str, int]
+    _ctrl_table: Optional[tuple]
     _last_geo: Dict[str, Any]
     poll_dt: float
     _control_aliases: dict | None
@@ -273,6 +356,8 @@ class RDClient:
             self.poll_dt = 1.0 / float(poll_hz)
         else:
             self.poll_dt = float(poll_dt)
+        # planificador de stream() (stats de overruns/jitter tras arrancar)
+        self.scheduler: Optional[DeadlineScheduler] = None
         # Logger for diagnostics
         self.logger = logging.getLogger("ingestion.rd_client")
         # Optionally inject a custom alias mapping for controls (useful for tests)
@@ -465,6 +550,7 @@ class RDClient:
                 pass
             # Build a name->index mapping explicitly so mypy can infer types
             self.ctrl_index_by_name = {}
+            self._ctrl_table = None  # índices nuevos: rehacer la tabla de lectura por tick
             for idx, nm in self.rd.get_controller_list():  # type: ignore[attr-defined]
                 try:
                     self.ctrl_index_by_name[str(nm)] = int(idx)
@@ -691,7 +777,14 @@ class RDClient:
     # --- Lecturas puntuales ---
     def read_specials(self) -> Dict[str, Any]:
         # py-raildriver expone helpers; aquí usamos listener snapshot para unificar
-        snap = self._snapshot()
+        return self._specials_from(self._snapshot())
+
+    def _specials_from(self, snap: Dict[str, Any], fallback: bool = True) -> Dict[str, Any]:
+        """Specials normalizados a partir de un snapshot ``!Clave -> valor``.
+
+        Con ``fallback`` las claves ausentes se piden directamente al driver;
+        sin él (lectura por tick) no se repite ninguna llamada.
+        """
         out: Dict[str, Any] = {}
         # LocoName → [Provider, Product, Engine]
         if "!LocoName" in snap:
@@ -708,7 +801,7 @@ class RDClient:
         coords = snap.get("!Coordinates")
         if coords and isinstance(coords, (list, tuple)) and len(coords) >= 2:
             out["lat"], out["lon"] = float(coords[0]), float(coords[1])
-        else:
+        elif fallback:
             # Fallback directo a RailDriver si el snapshot no trae coordenadas
             try:
                 c2 = self.rd.get_current_coordinates()  # type: ignore[attr-defined]
@@ -723,7 +816,7 @@ class RDClient:
             except Exception:
                 hdg = snap["!Heading"]
             out["heading"] = hdg
-        elif "heading" not in out:
+        elif fallback and "heading" not in out:
             try:
                 h = float(self.rd.get_current_heading())  # type: ignore[attr-defined]
                 out["heading"] = h
@@ -740,7 +833,7 @@ class RDClient:
                 pass
         if "!Gradient" in snap:
             out["gradient"] = snap["!Gradient"]
-        elif "gradient" not in out:
+        elif fallback and "gradient" not in out:
             try:
                 g = self.rd.get_current_gradient()  # type: ignore[attr-defined]
                 out["gradient"] = g
@@ -748,7 +841,7 @@ class RDClient:
                 pass
         if "!FuelLevel" in snap:
             out["fuel_level"] = snap["!FuelLevel"]
-        elif "fuel_level" not in out:
+        elif fallback and "fuel_level" not in out:
             try:
                 f = self.rd.get_current_fuel_level()  # type: ignore[attr-defined]
                 out["fuel_level"] = f
@@ -756,7 +849,7 @@ class RDClient:
                 pass
         if "!IsInTunnel" in snap:
             out["is_in_tunnel"] = bool(snap["!IsInTunnel"])
-        elif "is_in_tunnel" not in out:
+        elif fallback and "is_in_tunnel" not in out:
             try:
                 it = self.rd.get_current_is_in_tunnel()  # type: ignore[attr-defined]
                 out["is_in_tunnel"] = bool(it)
@@ -769,7 +862,7 @@ class RDClient:
                 out["time_ingame_h"], out["time_ingame_m"], out["time_ingame_s"] = tval[:3]
             else:
                 out["time_ingame"] = str(tval)
-        else:
+        elif fallback:
             try:
                 tobj = self.rd.get_current_time()  # type: ignore[attr-defined]
                 out["time_ingame"] = str(tobj)
@@ -778,33 +871,89 @@ class RDClient:
         return out
 
     def read_controls(self, names: Iterable[str]) -> Dict[str, float]:
-        snap = self._snapshot()
-        res: Dict[str, float] = {}
-        for n in names:
-            # Lectura directa preferente por índice
-            idx = self.ctrl_index_by_name.get(n)
-            if idx is not None:
-                try:
-                    res[n] = float(self.rd.get_current_controller_value(idx))  # type: ignore[attr-defined]
-                    continue
-                except Exception:
-                    pass
-            if n in snap and snap[n] is not None:
-                try:
-                    res[n] = float(snap[n])
-                    continue
-                except Exception:
-                    pass
-            # Fallback: lectura directa (índice es más eficiente)
-            idx = self.ctrl_index_by_name.get(n)
-            if idx is not None:
-                try:
-                    res[n] = float(self.rd.get_current_controller_value(idx))  # type: ignore[attr-defined]
-                except Exception:
-                    # si falla, ignoramos ese control en esta pasada
-                    pass
+        names = list(names)
+        sel, vals = self.read_controls_into(names)
+        res: Dict[str, float] = {n: v for n, v in zip(sel, vals) if v == v}
+        missing = [n for n in names if n not in res]
+        if missing:
+            # Sin índice o lectura fallida: último recurso, el snapshot del listener
+            try:
+                snap = self._snapshot()
+            except Exception:
+                snap = {}
+            for n in missing:
+                if snap.get(n) is not None:
+                    try:
+                        res[n] = float(snap[n])
+                    except Exception:
+                        # si falla, ignoramos ese control en esta pasada
+                        pass
         return res
 
+    # --- Lectura por lotes: una pasada por tick ---
+    def _control_table(self, names: Iterable[str]) -> Tuple[List[str], List[int], "array[float]"]:
+        """Tabla precalculada (nombres con índice, índices, buffer) para ``names``.
+
+        Se recalcula solo si cambia la lista pedida o se re-adjunta el driver.
+        """
+        key = tuple(names)
+        tab = getattr(self, "_ctrl_table", None)
+        if tab is None or tab[0] != key:
+            idx_map = self.ctrl_index_by_name
+            sel = [n for n in key if n in idx_map]
+            tab = (key, sel, [idx_map[n] for n in sel], array("d", [math.nan]) * len(sel))
+            self._ctrl_table = tab
+        return tab[1], tab[2], tab[3]
+
+    def read_controls_into(self, names: Iterable[str]) -> Tuple[List[str], "array[float]"]:
+        """Lee cada control de ``names`` UNA vez, por índice, en un buffer reutilizado.
+
+        Devuelve ``(nombres, valores)`` alineados; una lectura fallida queda NaN
+        (sin reintento en el mismo tick). Si el driver expone
+        ``get_current_controller_values(indices)`` se usa en una sola llamada.
+        El buffer se sobrescribe en la siguiente lectura: copiar si se guarda.
+        """
+        sel, idxs, buf = self._control_table(names)
+        if not idxs:
+            return sel, buf
+        rd = self.rd
+        batch = getattr(rd, "get_current_controller_values", None)
+        if callable(batch):
+            try:
+                for i, v in enumerate(batch(idxs)):
+                    buf[i] = float(v)
+                return sel, buf
+            except Exception:
+                pass  # se cae a la lectura individual
+        get = rd.get_current_controller_value  # type: ignore[union-attr]
+        for i, idx in enumerate(idxs):
+            try:
+                buf[i] = float(get(idx))
+            except Exception:
+                buf[i] = math.nan
+        return sel, buf
+
+    def read_tick(self, names: Iterable[str]) -> Dict[str, Any]:
+        """Specials + controles con una sola llamada al driver por campo.
+
+        Sustituye a ``read_specials()`` + ``read_controls()`` en el bucle: no
+        pasa por el listener (que relee todos los controles suscritos por
+        nombre) y cada special se pide una vez.
+        """
+        snap: Dict[str, Any] = {}
+        rd = self.rd
+        for key, method in _SPECIAL_GETTERS:
+            try:
+                snap[key] = getattr(rd, method)()
+            except Exception:
+                continue
+        row = self._specials_from(snap, fallback=False)
+        sel, vals = self.read_controls_into(names)
+        for n, v in zip(sel, vals):
+            if v == v:
+                row[n] = v
+        return row
+
     # --- RD shim factory with safe set/confirm semantics ---
     def _make_rd(self):
         """Return a thin wrapper around self.rd that implements safe set semantics.
@@ -934,11 +1083,31 @@ class RDClient:
         return RDShim(self)
 
     def stream(self) -> Iterator[Dict[str, Any]]:
-        """Genera dicts con specials + subset de controles comunes."""
+        """Genera dicts con specials + subset de controles comunes.
+
+        El ritmo lo marca un ``DeadlineScheduler`` (plazos absolutos cada
+        ``poll_dt``): la frecuencia real es la configurada aunque leer cueste.
+        ``TSC_RD_SCHED_POLICY`` = ``skip`` (por defecto) | ``catchup``.
+        Si cambia la loco se releen los índices y la lista de controles
+        (cacheada por loco en ``TSC_RD_CONTROLS_CACHE``).
+        """
         common_ctrls = self._common_controls()
+        last_loco: Optional[tuple] = None
+        policy = os.environ.get("TSC_RD_SCHED_POLICY", "skip").strip().lower()
+        self.scheduler = DeadlineScheduler(
+            period_s=self.poll_dt, policy=policy if policy in POLICIES else "skip"
+        )
         while True:
-            row: Dict[str, Any] = self.read_specials()
-            row.update(self.read_controls(common_ctrls))
+            self.scheduler.wait()
+            row: Dict[str, Any] = self.read_tick(common_ctrls)
+            loco = (row.get("provider"), row.get("product"), row.get("engine"))
+            if loco != last_loco and loco[2] is not None:
+                if last_loco is not None:
+                    # cambio de loco: índices nuevos; la resolución sale de la caché
+                    self.refresh_loco()
+                    common_ctrls = self._common_controls()
+                    row = self.read_tick(common_ctrls)
+                last_loco = loco
             # Aliases and unified speedometer
             # Throttle alias already handled above; keep single mapping here.
             if "SpeedometerKPH" in row:
@@ -966,9 +1135,80 @@ class RDClient:
             if "Throttle" not in row and "Regulator" in row:
                 row["Throttle"] = row["Regulator"]
             yield row
-            time.sleep(self.poll_dt)
+
+    # -------- Resolución de controles cacheada por loco ------------------------
+    def loco_key(self) -> str:
+        """``provider.product.engine`` de la loco actual (``unknown`` si no se sabe)."""
+        try:
+            loco = self.rd.get_loco_name()  # type: ignore[union-attr]
+            if isinstance(loco, (list, tuple)) and len(loco) >= 3:
+                return ".".join(str(x) for x in loco[:3])
+        except Exception:
+            pass
+        return "unknown"
+
+    def _controls_fingerprint(self) -> str:
+        import hashlib
+
+        items = sorted(self.ctrl_index_by_name.items())
+        payload = repr((items, _resolver_stamp())).encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def _resolved(self) -> Dict[str, Any]:
+        """Lista común, schema e índices para la loco actual.
+
+        Orden: memoria del proceso -> caché en disco (misma loco y mismo
+        fingerprint de controles/reglas) -> cálculo completo (y se persiste).
+        """
+        fp = self._controls_fingerprint()
+        entry = _RESOLVED.get(fp)
+        if entry is not None:
+            return entry
+        loco = self.loco_key()
+        path = _controls_cache_path()
+        if path is not None:
+            cached = _load_controls_cache(path)["locos"].get(loco)
+            if isinstance(cached, dict) and cached.get("fingerprint") == fp:
+                entry = cached
+        if entry is None:
+            controls = self._compute_common_controls()
+            entry = {
+                "fingerprint": fp,
+                "controls": controls,
+                "schema": sorted(set(_SCHEMA_BASE + controls)),
+                "index": {n: self.ctrl_index_by_name[n] for n in controls},
+            }
+            if path is not None:
+                _save_controls_cache(path, loco, entry)
+        _RESOLVED[fp] = entry
+        return entry
+
+    def refresh_loco(self) -> str:
+        """Relee la lista de controles del driver (cambio de loco) y devuelve la loco.
+
+        La resolución vuelve a salir de la caché si la loco ya se vio antes.
+        """
+        idx_map: Dict[str, int] = {}
+        try:
+            for idx, nm in self.rd.get_controller_list():  # type: ignore[union-attr]
+                try:
+                    idx_map[str(nm)] = int(idx)
+                except Exception:
+                    continue
+        except Exception:
+            return self.loco_key()
+        if idx_map != self.ctrl_index_by_name:
+            self.ctrl_index_by_name = idx_map
+            self._ctrl_table = None
+        return self.loco_key()
 
     def _common_controls(self) -> List[str]:
+        if not isinstance(self, RDClient):
+            # objeto mínimo con solo ctrl_index_by_name (herramientas/tests): sin caché
+            return RDClient._compute_common_controls(self)
+        return list(self._resolved()["controls"])
+
+    def _compute_common_controls(self) -> List[str]:
         names = set(self.ctrl_index_by_name.keys())
         # prepare normalized map: norm -> original names
         norm_map: Dict[str, List[str]] = {}
@@ -1062,6 +1302,8 @@ class RDClient:
 
         # use normalized matching: if normalized name matches a preferred normalized
         preferred_norms = {_norm_ctrl_name(p) for p in preferred}
+        # suggested aliases: se leen una vez (no por cada nombre)
+        suggested = {a for aliases in _load_suggested_aliases().values() for a in aliases}
         chosen_set = set()
         for n in names:
             if n in preferred or rx.match(n):
@@ -1070,39 +1312,15 @@ class RDClient:
             if _norm_ctrl_name(n) in preferred_norms:
                 chosen_set.add(n)
                 continue
-            # check suggested aliases (fallback: only consult file if other heuristics didn't match)
-            suggested = _load_suggested_aliases()
-            if suggested:
-                for aliases in suggested.values():
-                    if n in aliases:
-                        chosen_set.add(n)
-                        break
+            # check suggested aliases (fallback: only if other heuristics didn't match)
+            if n in suggested:
+                chosen_set.add(n)
 
         return sorted(list(chosen_set))
 
     # -------- Superset de campos para “comprimir” el CSV ----------------------
     def schema(self) -> List[str]:
-        base = [
-            "provider",
-            "product",
-            "engine",
-            "lat",
-            "lon",
-            "heading",
-            "heading_deg",
-            "gradient",
-            "fuel_level",
-            "is_in_tunnel",
-            "time_ingame_h",
-            "time_ingame_m",
-            "time_ingame_s",
-            "time_ingame",
-            "v_ms",
-            "v_kmh",
-            "odom_m",
-            "t_wall",
-        ]
-        return sorted(set(base + self._common_controls()))
+        return list(self._resolved()["schema"])
 
 
 # --- TSC actuator shim: expone `rd` con set_brake / set_throttle -------------
@@ -6,6 +6,22 @@ import time
 from typing import Any, Dict, Iterable, List, Tuple
 
 
+def accel_mps2(
+    throttle: float,
+    brake: float,
+    v_ms: float,
+    thrust: float = 0.8,
+    brake_decel: float = 1.2,
+    drag: float = 0.05,
+) -> float:
+    """Aceleración del fake: empuje - freno - rozamiento proporcional (m/s²).
+
+    Con los coeficientes por defecto la velocidad límite a tracción plena es
+    ``thrust / drag`` = 16 m/s (57.6 km/h).
+    """
+    return thrust * throttle - brake_decel * brake - drag * v_ms
+
+
 class FakeRailDriver:
     """
     Simulador ligero compatible con la API de `raildriver.library.RailDriver`.
@@ -103,6 +119,22 @@ class FakeRailDriver:
             return float(self._v_ms * 3.6)
         return float(self._values.get(name, 0.0))
 
+    def get_current_controller_values(self, indices: Iterable[int | str]) -> List[float]:
+        """Lectura por lotes: un solo paso de física para todos los controles."""
+        self._step()
+        out: List[float] = []
+        for index_or_name in indices:
+            try:
+                name = self._name_from_index_or_name(index_or_name)
+            except ValueError:
+                out.append(math.nan)
+                continue
+            if name == "SpeedometerKPH":
+                out.append(float(self._v_ms * 3.6))
+            else:
+                out.append(float(self._values.get(name, 0.0)))
+        return out
+
     def set_controller_value(self, index_or_name: int | str, value: float) -> None:
         name = self._name_from_index_or_name(index_or_name)
         vmin, vmax = self._minmax.get(name, (0.0, 1.0))
@@ -159,8 +191,7 @@ class FakeRailDriver:
 
         thr = float(self._values.get("Regulator", 0.0))
         brk = float(self._values.get("VirtualBrake", 0.0))
-        # Aceleración: empuje - freno - rozamiento proporcional
-        a = 0.8 * thr - 1.2 * brk - 0.05 * self._v_ms
+        a = accel_mps2(thr, brk, self._v_ms)
         self._v_ms = max(0.0, self._v_ms + a * dt)
 
         # Actualiza manómetros de forma plausible
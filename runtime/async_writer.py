@@ -0,0 +1,205 @@
+"""
+Escritura asíncrona de eventos y heartbeat del colector.
+
+El bucle de muestreo solo encola (``write``/``heartbeat``); un hilo de fondo:
+
+- agrupa los eventos pendientes y los añade a ``events.jsonl`` con UNA
+  apertura y UNA escritura por lote (antes: ``open(..., "a")`` por evento);
+- reescribe el heartbeat como mucho cada ``heartbeat_s`` segundos con el
+  último sello recibido (antes: en cada tick);
+- con ``flush()``/``close()`` vacía todo lo pendiente antes de volver.
+
+Los eventos con sellos de latencia (``ts_ingest``) reciben ``ts_write``
+(``runtime.latency``): el instante en que el hilo escritor escribe su lote.
+
+La cola está acotada (``queue_max``): si se llena (disco parado) ``write``
+descarta el evento y lo cuenta en ``stats["dropped"]`` en lugar de bloquear
+el bucle de muestreo, como la política ``drop_newest`` de ``RunStore``.
+
+Así un bloqueo de E/S (antivirus en Windows escaneando ``data/``) lo sufre el
+hilo escritor y no aparece como jitter de muestreo. ``TSC_EVT_ASYNC=0`` hace
+que ``from_env`` devuelva el mismo objeto en modo síncrono (sin hilo).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from queue import Empty, Full, Queue
+from typing import Any, Dict, List, Optional, Union
+
+from runtime import latency
+
+Item = Union[Dict[str, Any], threading.Event]
+
+
+class AsyncEventWriter:
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        heartbeat_path: str | os.PathLike | None = None,
+        heartbeat_s: float = 1.0,
+        batch_max: int = 256,
+        queue_max: int = 10000,
+        threaded: bool = True,
+    ) -> None:
+        self.path = Path(path)
+        self.heartbeat_path = Path(heartbeat_path) if heartbeat_path else None
+        self.heartbeat_s = max(0.0, float(heartbeat_s))
+        self.batch_max = max(1, int(batch_max))
+        self._q: "Queue[Item]" = Queue(maxsize=max(0, int(queue_max)))
+        self._hb_value: Optional[float] = None
+        self._hb_last_write = 0.0
+        self._hb_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"events": 0, "batches": 0, "heartbeats": 0, "errors": 0, "dropped": 0}
+        self._thread: Optional[threading.Thread] = None
+        if threaded:
+            self._thread = threading.Thread(target=self._loop, name="evt-writer", daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def from_env(
+        cls, path: str | os.PathLike, heartbeat_path: str | os.PathLike | None = None
+    ) -> "AsyncEventWriter":
+        """``TSC_EVT_ASYNC`` (1/0) y ``TSC_HB_PERIOD_S`` (periodo del heartbeat)."""
+        threaded = os.environ.get("TSC_EVT_ASYNC", "1") != "0"
+        try:
+            hb = float(os.environ.get("TSC_HB_PERIOD_S", "1.0"))
+        except ValueError:
+            hb = 1.0
+        return cls(path, heartbeat_path=heartbeat_path, heartbeat_s=hb, threaded=threaded)
+
+    @property
+    def threaded(self) -> bool:
+        return self._thread is not None
+
+    # --- API del bucle de muestreo ---------------------------------------
+    def write(self, evt: Dict[str, Any]) -> None:
+        """Encola un evento (se serializa en el hilo escritor); nunca bloquea."""
+        if self._thread is None:
+            self._append([evt])
+            return
+        try:
+            self._q.put_nowait(evt)
+        except Full:
+            self.stats["dropped"] += 1
+
+    def heartbeat(self, ts: Optional[float] = None) -> None:
+        """Registra el último latido; se escribe como mucho cada ``heartbeat_s``."""
+        if self.heartbeat_path is None:
+            return
+        with self._hb_lock:
+            self._hb_value = time.time() if ts is None else float(ts)
+        if self._thread is None:
+            self._write_heartbeat(force=False)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que se escriba todo lo encolado hasta ahora (y el heartbeat)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain_inline()
+            return True
+        deadline = time.monotonic() + max(0.0, float(timeout))
+        done = threading.Event()
+        try:
+            self._q.put(done, timeout=max(0.0, float(timeout)))
+        except Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self.flush(timeout)
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self._drain_inline()
+
+    def __enter__(self) -> "AsyncEventWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    # --- hilo escritor ----------------------------------------------------
+    def _loop(self) -> None:
+        # despertar al menos a ritmo de heartbeat para coalescer latidos
+        tick = min(0.25, self.heartbeat_s) if self.heartbeat_s > 0 else 0.25
+        while not self._stop.is_set():
+            try:
+                first = self._q.get(timeout=tick)
+            except Empty:
+                self._write_heartbeat(force=False)
+                continue
+            self._handle([first, *self._take(self.batch_max - 1)])
+            self._write_heartbeat(force=False)
+
+    def _take(self, n: int) -> List[Item]:
+        items: List[Item] = []
+        while len(items) < n:
+            try:
+                items.append(self._q.get_nowait())
+            except Empty:
+                break
+        return items
+
+    def _handle(self, items: List[Item]) -> None:
+        batch: List[Dict[str, Any]] = []
+        for it in items:
+            if isinstance(it, threading.Event):
+                # marcador de flush: escribir lo anterior y avisar
+                self._append(batch)
+                batch = []
+                self._write_heartbeat(force=True)
+                it.set()
+            else:
+                batch.append(it)
+        self._append(batch)
+
+    def _drain_inline(self) -> None:
+        items = self._take(self._q.qsize() + 1)
+        while items:
+            self._handle(items)
+            items = self._take(self.batch_max)
+        self._write_heartbeat(force=True)
+
+    def _append(self, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        # sello de latencia del lote (etapa "write"): tras la espera en cola
+        ts_write = latency.now()
+        for e in events:
+            if "ts_ingest" in e:
+                e["ts_write"] = ts_write
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self.stats["events"] += len(events)
+            self.stats["batches"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+
+    def _write_heartbeat(self, force: bool) -> None:
+        if self.heartbeat_path is None:
+            return
+        with self._hb_lock:
+            val = self._hb_value
+            if val is None:
+                return
+            now = time.monotonic()
+            if not force and now - self._hb_last_write < self.heartbeat_s:
+                return
+            self._hb_value = None
+            self._hb_last_write = now
+        try:
+            self.heartbeat_path.write_text(str(val), encoding="utf-8")
+            self.stats["heartbeats"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+
+
+__all__ = ["AsyncEventWriter"]
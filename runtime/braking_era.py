@@ -1,13 +1,14 @@
 ﻿from __future__ import annotations
 
 import csv
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from math import ceil
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from runtime.braking_v0 import (BrakingConfig, clamp, effective_distance,
-                                kph_to_mps)
+import numpy as np
+
+from runtime.braking_v0 import BrakingConfig, kph_to_mps
 
 """Braking ERA implementation.
 
@@ -36,9 +37,43 @@ def _lin_interp(x: float, xs: List[float], ys: List[float]) -> float:
 
 @dataclass
 class EraCurve:
+    """Curva de deceleración de servicio a(v) con tabla de distancias precalculada.
+
+    Al crearse integra una vez ``D(v) = ∫_0^v v'/a(v') dv'`` en una rejilla
+    fina de velocidades (``grid_dv_mps``, NumPy). Así la distancia de frenado
+    v0 -> v_lim es ``D(v0) - D(v_lim)`` y la velocidad segura para una
+    distancia es la inversa de ``D`` por interpolación: O(log n) por consulta
+    en vez de integrar en Python en cada paso de una bisección. Por encima de
+    la rejilla se extiende con la deceleración del último punto (cerrado).
+    Si se modifican ``speeds_mps``/``decel_mps2`` tras crearla: ``rebuild()``.
+    """
+
     speeds_mps: List[float]  # ascendente
     decel_mps2: List[float]  # misma longitud
     min_decel_mps2: float = 0.1  # seguridad numérica
+    grid_dv_mps: float = 0.05  # resolución de la tabla D(v)
+    grid_vmax_kph: float = 400.0  # tope de la rejilla (más allá: analítico)
+    _v_grid: np.ndarray = field(init=False, repr=False, compare=False)
+    _d_grid: np.ndarray = field(init=False, repr=False, compare=False)
+    _a_top: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """(Re)calcula la tabla acumulada D(v) sobre la rejilla de velocidades."""
+        top = max(kph_to_mps(self.grid_vmax_kph), max(self.speeds_mps, default=0.0))
+        dv = max(1e-3, float(self.grid_dv_mps))
+        n = int(ceil(top / dv)) + 1
+        v = np.linspace(0.0, (n - 1) * dv, n)
+        integrand = v / self.a_of_v_array(v)
+        d = np.empty_like(v)
+        d[0] = 0.0
+        # trapecios acumulados
+        np.cumsum(0.5 * (integrand[1:] + integrand[:-1]) * dv, out=d[1:])
+        self._v_grid = v
+        self._d_grid = d
+        self._a_top = float(self.a_of_v_array(v[-1:])[0])
 
     @classmethod
     def from_csv(cls, path: str | Path) -> "EraCurve":
@@ -74,47 +109,288 @@ class EraCurve:
         a = _lin_interp(v_mps, self.speeds_mps, self.decel_mps2)
         return max(self.min_decel_mps2, float(a))
 
+    def a_of_v_array(self, v_mps: np.ndarray) -> np.ndarray:
+        """``a_of_v`` vectorizado (mismo clamp en los extremos)."""
+        v = np.asarray(v_mps, dtype=float)
+        if not self.speeds_mps:
+            return np.full(v.shape, self.min_decel_mps2)
+        a = np.interp(v, self.speeds_mps, self.decel_mps2)
+        return np.maximum(self.min_decel_mps2, a)
+
+    # --- tabla D(v) ---------------------------------------------------------
+    def _dist_from_zero(self, v_mps: np.ndarray) -> np.ndarray:
+        v = np.maximum(0.0, np.asarray(v_mps, dtype=float))
+        vg, dg = self._v_grid, self._d_grid
+        d = np.interp(v, vg, dg)
+        above = v > vg[-1]
+        if np.any(above):
+            d = np.where(above, dg[-1] + (v * v - vg[-1] ** 2) / (2.0 * self._a_top), d)
+        return d
+
+    def _speed_for_dist(self, d_m: np.ndarray) -> np.ndarray:
+        d = np.maximum(0.0, np.asarray(d_m, dtype=float))
+        vg, dg = self._v_grid, self._d_grid
+        v = np.interp(d, dg, vg)
+        above = d > dg[-1]
+        if np.any(above):
+            v = np.where(above, np.sqrt(vg[-1] ** 2 + 2.0 * self._a_top * np.maximum(0.0, d - dg[-1])), v)
+        return v
+
+    def braking_distance_array(self, v0_kph: Any, v_lim_kph: Any) -> np.ndarray:
+        """Distancias de frenado (m) v0 -> v_lim elemento a elemento (0 si v0 <= v_lim)."""
+        v0 = np.asarray(v0_kph, dtype=float) / 3.6
+        vlim = np.asarray(v_lim_kph, dtype=float) / 3.6
+        d = self._dist_from_zero(v0) - self._dist_from_zero(vlim)
+        return np.where(v0 > vlim + 1e-6, np.maximum(0.0, d), 0.0)
+
+    def v_safe_for_distance_array(
+        self, d_eff_m: Any, v_lim_kph: Any, vmax_kph: float = 400.0, gradient_pct: Any = None
+    ) -> np.ndarray:
+        """Máxima v0 (km/h) que frena a ``v_lim_kph`` en ``d_eff_m``, elemento a elemento.
+
+        ``gradient_pct`` se ignora (curva única); ver ``EraCurveFamily``.
+        """
+        vlim_kph = np.asarray(v_lim_kph, dtype=float)
+        d = np.maximum(0.0, np.asarray(d_eff_m, dtype=float))
+        return self._v_safe_from_target(self._dist_from_zero(vlim_kph / 3.6) + d, vlim_kph, vmax_kph)
+
+    def _v_safe_from_target(self, target: np.ndarray, vlim_kph: np.ndarray, vmax_kph: float) -> np.ndarray:
+        v_kph = self._speed_for_dist(target) * 3.6
+        hi = np.maximum(vlim_kph + 0.5, float(vmax_kph))
+        return np.clip(v_kph, vlim_kph, hi)
+
     def braking_distance(
         self, v0_kph: float, v_lim_kph: float, dv_mps: float = 0.2
     ) -> float:
-        """Distancia para ir de v0→v_lim integrando d = ∫ v/a(v) dv. (metros)"""
-        v0 = kph_to_mps(max(v0_kph, v_lim_kph))
-        vlim = kph_to_mps(v_lim_kph)
-        if v0 <= vlim + 1e-6:
-            return 0.0
-        dv = max(1e-3, float(dv_mps))
-        n = ceil((v0 - vlim) / dv)
-        d = 0.0
-        v_hi = v0
-        for _ in range(n):
-            v_lo = max(vlim, v_hi - dv)
-            v_mid = 0.5 * (v_hi + v_lo)
-            a = self.a_of_v(v_mid)
-            d += (v_hi - v_lo) * (v_mid / a)
-            v_hi = v_lo
-        return d
+        """Distancia para ir de v0→v_lim, d = ∫ v/a(v) dv, por diferencia de la tabla D(v). (metros)
+
+        ``dv_mps`` se conserva por compatibilidad; la resolución es ``grid_dv_mps``.
+        """
+        return float(self.braking_distance_array(max(v0_kph, v_lim_kph), v_lim_kph))
 
     def v_safe_for_distance(
         self, d_eff_m: float, v_lim_kph: float, vmax_kph: float = 400.0
     ) -> float:
-        """Máxima v0_kph tal que la distancia para frenar a v_lim_kph ≤ d_eff_m (búsqueda binaria)."""
-        lo = v_lim_kph
-        hi = max(lo + 0.5, float(vmax_kph))
-        for _ in range(40):
-            mid = 0.5 * (lo + hi)
-            d = self.braking_distance(mid, v_lim_kph)
-            if d <= d_eff_m:
-                lo = mid
-            else:
-                hi = mid
-        return lo
+        """Máxima v0_kph tal que la distancia para frenar a v_lim_kph ≤ d_eff_m (inversa de D(v))."""
+        return float(self.v_safe_for_distance_array(d_eff_m, v_lim_kph, vmax_kph))
+
+
+class EraCurveFamily:
+    """Familia de curvas ERA indexada por pendiente (``gradient_pct``).
+
+    Una ``EraCurve`` (con su tabla D(v) ya precalculada) por cada pendiente
+    del CSV. En cada consulta se calcula la velocidad segura con las dos
+    curvas que rodean la pendiente pedida y se interpola linealmente entre
+    ellas (fuera del rango: la curva del extremo). ``D_bin(v_lim)``, la
+    parte que solo depende del límite objetivo, se memoiza por (bin, límite).
+    """
+
+    def __init__(self, curves: Dict[float, EraCurve], memo_max: int = 4096) -> None:
+        if not curves:
+            raise ValueError("EraCurveFamily needs at least one curve")
+        grads = sorted(curves)
+        self.gradients = np.asarray(grads, dtype=float)
+        self.curves: List[EraCurve] = [curves[g] for g in grads]
+        self.memo_max = int(memo_max)
+        self._memo: Dict[Tuple[int, float], float] = {}
+
+    @classmethod
+    def from_csv(cls, path: str | Path) -> "EraCurveFamily":
+        """CSV con ``speed_kph``, deceleración y columna de pendiente (``GRADIENT_COLUMNS``)."""
+        rows: Dict[float, List[Tuple[float, float]]] = {}
+        with Path(path).open("r", encoding="utf-8") as f:
+            rd = csv.DictReader(f)
+            gcol = next((c for c in GRADIENT_COLUMNS if c in (rd.fieldnames or [])), None)
+            for row in rd:
+                sk = row.get("speed_kph")
+                a = row.get("decel_service_mps2") or row.get("decel_mps2") or row.get("A")
+                g = row.get(gcol) if gcol else "0"
+                try:
+                    vk, av, gv = float(sk), float(a), float(g)  # type: ignore[arg-type]
+                except Exception:
+                    continue
+                rows.setdefault(gv, []).append((vk, av))
+        curves = {}
+        for g, pts in rows.items():
+            pts.sort(key=lambda t: t[0])
+            curves[g] = EraCurve([kph_to_mps(v) for v, _ in pts], [max(0.0, a) for _, a in pts])
+        return cls(curves)
+
+    def curve_for(self, gradient_pct: float) -> EraCurve:
+        """Curva del bin más cercano a ``gradient_pct``."""
+        i = int(np.argmin(np.abs(self.gradients - float(gradient_pct))))
+        return self.curves[i]
+
+    def _bins(self, gradient_pct: Any, shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Índices de los bins inferior/superior y peso del superior por elemento."""
+        if gradient_pct is None:
+            g = np.zeros(shape)
+        else:
+            g = np.broadcast_to(np.asarray(gradient_pct, dtype=float), shape)
+            g = np.where(np.isnan(g), 0.0, g)
+        gs = self.gradients
+        g = np.clip(g, gs[0], gs[-1])
+        hi = np.clip(np.searchsorted(gs, g, side="left"), 0, len(gs) - 1)
+        lo = np.maximum(hi - 1, 0)
+        lo = np.where(gs[hi] == g, hi, lo)
+        span = gs[hi] - gs[lo]
+        w = np.where(span > 0, (g - gs[lo]) / np.where(span > 0, span, 1.0), 0.0)
+        return lo, hi, w
+
+    def _dist_lim(self, b: int, vlim_kph: np.ndarray) -> np.ndarray:
+        """D_bin(v_lim) memoizado por (bin, límite): los límites distintos son pocos."""
+        uniq, inv = np.unique(vlim_kph, return_inverse=True)
+        vals = np.empty(uniq.shape)
+        curve = self.curves[b]
+        for k, v in enumerate(uniq.tolist()):
+            key = (b, v)
+            d = self._memo.get(key)
+            if d is None:
+                if len(self._memo) >= self.memo_max:
+                    self._memo.clear()
+                d = self._memo[key] = float(curve._dist_from_zero(np.asarray(v / 3.6)))
+            vals[k] = d
+        return vals[inv.reshape(vlim_kph.shape)]
+
+    def _per_bin(self, idx: np.ndarray, d: np.ndarray, vlim: np.ndarray, vmax_kph: float) -> np.ndarray:
+        out = np.empty(idx.shape)
+        for b in np.unique(idx).tolist():
+            m = idx == b
+            target = self._dist_lim(b, vlim[m]) + d[m]
+            out[m] = self.curves[b]._v_safe_from_target(target, vlim[m], vmax_kph)
+        return out
+
+    def v_safe_for_distance_array(
+        self, d_eff_m: Any, v_lim_kph: Any, vmax_kph: float = 400.0, gradient_pct: Any = None
+    ) -> np.ndarray:
+        vlim = np.asarray(v_lim_kph, dtype=float)
+        d = np.asarray(d_eff_m, dtype=float)
+        shape = np.broadcast_shapes(vlim.shape, d.shape)
+        vlim = np.broadcast_to(vlim, shape)
+        d = np.maximum(0.0, np.broadcast_to(d, shape))
+        lo, hi, w = self._bins(gradient_pct, shape)
+        v_lo = self._per_bin(lo, d, vlim, vmax_kph)
+        if not np.any(w > 0):
+            return v_lo
+        v_hi = self._per_bin(hi, d, vlim, vmax_kph)
+        return (1.0 - w) * v_lo + w * v_hi
+
+    def braking_distance_array(self, v0_kph: Any, v_lim_kph: Any, gradient_pct: Any = None) -> np.ndarray:
+        v0 = np.asarray(v0_kph, dtype=float)
+        vlim = np.asarray(v_lim_kph, dtype=float)
+        shape = np.broadcast_shapes(v0.shape, vlim.shape)
+        v0, vlim = np.broadcast_to(v0, shape), np.broadcast_to(vlim, shape)
+        lo, hi, w = self._bins(gradient_pct, shape)
+        out = np.zeros(shape)
+        for idx, wt in ((lo, 1.0 - w), (hi, w)):
+            for b in np.unique(idx).tolist():
+                m = idx == b
+                out[m] += self.curves[b].braking_distance_array(v0[m], vlim[m]) * wt[m]
+        return out
+
+    def v_safe_for_distance(
+        self, d_eff_m: float, v_lim_kph: float, vmax_kph: float = 400.0, gradient_pct: float = 0.0
+    ) -> float:
+        return float(self.v_safe_for_distance_array(d_eff_m, v_lim_kph, vmax_kph, gradient_pct))
+
+    def braking_distance(self, v0_kph: float, v_lim_kph: float, gradient_pct: float = 0.0) -> float:
+        return float(self.braking_distance_array(max(v0_kph, v_lim_kph), v_lim_kph, gradient_pct))
+
+
+# Columnas de pendiente aceptadas en el CSV de una familia
+GRADIENT_COLUMNS = ("gradient_pct", "gradient", "grad_pct")
+
+
+def load_era_curve(path: str | Path) -> EraCurve | EraCurveFamily:
+    """``EraCurveFamily`` si el CSV trae columna de pendiente; si no, ``EraCurve``."""
+    with Path(path).open("r", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    if any(c.strip() in GRADIENT_COLUMNS for c in header):
+        return EraCurveFamily.from_csv(path)
+    return EraCurve.from_csv(path)
+
+
+# Códigos de fase de la variante vectorizada (índice en PHASES)
+PHASES = ("CRUISE", "COAST", "BRAKE")
+PHASE_CRUISE, PHASE_COAST, PHASE_BRAKE = 0, 1, 2
+
+
+def _as_config(cfg: BrakingConfig | dict) -> BrakingConfig:
+    """``BrakingConfig`` o ``dict`` con claves equivalentes (tests rápidos)."""
+    if isinstance(cfg, dict):
+        return BrakingConfig(
+            margin_kph=float(cfg.get("v_margin_kph", cfg.get("margin_kph", 3.0))),
+            max_service_decel=float(
+                cfg.get("a_service_mps2", cfg.get("max_service_decel", 0.7))
+            ),
+            reaction_time_s=float(
+                cfg.get("t_react_s", cfg.get("reaction_time_s", 0.6))
+            ),
+        )
+    return cfg
+
+
+def compute_target_speed_kph_era_array(
+    v_now_kph: Any,
+    next_limit_kph: Any,
+    dist_next_limit_m: Any,
+    curve: Optional[EraCurve | EraCurveFamily] = None,
+    *,
+    gradient_pct: Any = None,
+    cfg: BrakingConfig | dict = BrakingConfig(),
+) -> tuple[np.ndarray, np.ndarray]:
+    """Versión vectorizada: arrays -> (v_objetivo_kph, código de fase ``PHASES``).
+
+    Misma regla que ``compute_target_speed_kph_era`` elemento a elemento:
+    límite NaN/None -> v_objetivo = v_actual y CRUISE; distancia NaN -> 0 en la
+    ruta ERA (conservador). Sin ``curve`` se usa la regla v0. ``gradient_pct``
+    (array o escalar; NaN -> 0) solo cuenta con una ``EraCurveFamily``.
+    """
+    cfg = _as_config(cfg)
+    v_now = np.asarray(v_now_kph, dtype=float)
+    n_shape = v_now.shape
+    if next_limit_kph is None:
+        lim = np.full(n_shape, np.nan)
+    else:
+        lim = np.broadcast_to(np.asarray(next_limit_kph, dtype=float), n_shape)
+    if dist_next_limit_m is None:
+        dist = np.full(n_shape, np.nan)
+    else:
+        dist = np.broadcast_to(np.asarray(dist_next_limit_m, dtype=float), n_shape)
+
+    if curve is None:
+        from runtime.braking_v0 import compute_target_speed_kph as _compute_v0
+
+        v_obj = _compute_v0(v_now, dist, lim, cfg)
+    else:
+        v_lim = np.maximum(0.0, lim - cfg.margin_kph)
+        v_now_mps = np.maximum(0.0, v_now) / 3.6
+        d = np.where(np.isnan(dist), 0.0, dist)
+        d_eff = np.maximum(0.0, d - v_now_mps * float(cfg.reaction_time_s))
+        d_eff = np.where(np.isnan(d_eff), 0.0, d_eff)
+        with np.errstate(invalid="ignore"):
+            v_safe = curve.v_safe_for_distance_array(
+                d_eff, np.nan_to_num(v_lim, nan=0.0), gradient_pct=gradient_pct
+            )
+        v_obj = np.clip(np.minimum(v_now, v_safe), max(cfg.min_target_kph, 0.0), 400.0)
+
+    no_lim = np.isnan(lim)
+    v_obj = np.where(no_lim, v_now, v_obj)
+    with np.errstate(invalid="ignore"):
+        phase = np.where(
+            v_obj < v_now - cfg.coast_band_kph,
+            PHASE_BRAKE,
+            np.where(v_obj <= v_now + cfg.coast_band_kph, PHASE_COAST, PHASE_CRUISE),
+        ).astype(np.int8)
+    phase[no_lim] = PHASE_CRUISE
+    return v_obj, phase
 
 
 def compute_target_speed_kph_era(
     v_now_kph: float,
     next_limit_kph: Optional[float],
     dist_next_limit_m: Optional[float],
-    curve: Optional[EraCurve] = None,
+    curve: Optional[EraCurve | EraCurveFamily] = None,
     *,
     gradient_pct: Optional[float] = None,
     cfg: BrakingConfig | dict = BrakingConfig(),
@@ -124,67 +400,31 @@ def compute_target_speed_kph_era(
     Si se proporciona una `curve` (EraCurve) se usa la integración ERA. Si
     `curve` es None se delega a la regla conservadora `braking_v0.compute_target_speed_kph`.
     El parámetro `cfg` puede ser un `BrakingConfig` o un `dict` con claves
-    equivalentes (por compatibilidad con tests rápidos).
+    equivalentes (por compatibilidad con tests rápidos). Para arrays enteros:
+    ``compute_target_speed_kph_era_array``.
     """
     if next_limit_kph is None:
         return v_now_kph, "CRUISE"
-
-    # Normalizar cfg a BrakingConfig si vino como dict
-    if isinstance(cfg, dict):
-        cfg = BrakingConfig(
-            margin_kph=float(cfg.get("v_margin_kph", cfg.get("margin_kph", 3.0))),
-            max_service_decel=float(
-                cfg.get("a_service_mps2", cfg.get("max_service_decel", 0.7))
-            ),
-            reaction_time_s=float(
-                cfg.get("t_react_s", cfg.get("reaction_time_s", 0.6))
-            ),
-        )
-
-    # Si no hay curva, delegar a la versión v0 (vectorizada)
-    if curve is None:
-        try:
-            import numpy as _np
-
-            from runtime.braking_v0 import \
-                compute_target_speed_kph as _compute_v0
-        except Exception:
-            # no debería pasar, pero en caso de import fallido devolvemos crucero seguro
-            return v_now_kph, "CRUISE"
-
-        v_obj_arr = _compute_v0(
-            _np.asarray([v_now_kph], dtype=float),
-            _np.asarray(
-                [dist_next_limit_m if dist_next_limit_m is not None else _np.nan],
-                dtype=float,
-            ),
-            _np.asarray([next_limit_kph]) if next_limit_kph is not None else None,
-            cfg,
-        )
-        v_obj_kph = float(v_obj_arr[0])
-        # fase igual que en v0
-        if v_obj_kph < v_now_kph - cfg.coast_band_kph:
-            phase = "BRAKE"
-        elif v_obj_kph <= v_now_kph + cfg.coast_band_kph:
-            phase = "COAST"
-        else:
-            phase = "CRUISE"
-        return v_obj_kph, phase
-
-    # ERA path: usar la curva proporcionada
-    v_lim_kph = max(0.0, next_limit_kph - cfg.margin_kph)
-    v_now_mps = kph_to_mps(max(0.0, v_now_kph))
-    d_eff = effective_distance(dist_next_limit_m, v_now_mps, cfg)
-    v_safe_kph = curve.v_safe_for_distance(d_eff, v_lim_kph)
-    v_obj_kph = clamp(min(v_now_kph, v_safe_kph), max(cfg.min_target_kph, 0.0), 400.0)
-
-    if v_obj_kph < v_now_kph - cfg.coast_band_kph:
-        phase = "BRAKE"
-    elif v_obj_kph <= v_now_kph + cfg.coast_band_kph:
-        phase = "COAST"
-    else:
-        phase = "CRUISE"
-    return v_obj_kph, phase
+    tgt, ph = compute_target_speed_kph_era_array(
+        [v_now_kph],
+        [next_limit_kph],
+        [np.nan if dist_next_limit_m is None else dist_next_limit_m],
+        curve,
+        gradient_pct=gradient_pct,
+        cfg=cfg,
+    )
+    return float(tgt[0]), PHASES[int(ph[0])]
 
 
-__all__ = ["EraCurve", "compute_target_speed_kph_era"]
+__all__ = [
+    "EraCurve",
+    "EraCurveFamily",
+    "GRADIENT_COLUMNS",
+    "PHASES",
+    "PHASE_BRAKE",
+    "PHASE_COAST",
+    "PHASE_CRUISE",
+    "compute_target_speed_kph_era",
+    "compute_target_speed_kph_era_array",
+    "load_era_curve",
+]
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import functools
-import json
 import math
 import os
 import time
@@ -9,13 +8,19 @@ from math import asin, cos, radians, sin
 
 from ingestion.lua_eventbus import LuaEventBus
 from ingestion.rd_client import RDClient
+from runtime import latency
+from runtime.async_writer import AsyncEventWriter
 from runtime.csv_logger import CSVLogger
+from runtime.delta_recorder import KEYFRAME_COL, DeltaEncoder
 
 try:
     from storage.run_store_sqlite import RunStore
 except Exception:
     RunStore = None  # type: ignore
 from runtime.events_bus import normalize
+from runtime.telemetry_shm import DEFAULT_NAME as SHM_DEFAULT_NAME
+from runtime.telemetry_shm import TelemetryShmWriter
+from storage.columnar import ColumnarRunWriter, columnar_path_for
 
 
 # Small, reusable retry decorator for transient failures.
@@ -80,6 +85,9 @@ def run(
     stop_time: float | None = None,
     bus_from_start: bool = False,
     sqlite_db: str = "data/run.db",
+    columnar: bool | None = None,
+    shm: bool | None = None,
+    delta: bool | None = None,
 ) -> None:
     # Inicializa heartbeat para que otras utilidades (p.ej., drain) detecten que el colector está activo
     try:
@@ -89,8 +97,11 @@ def run(
         pass
 
     rd = RDClient(poll_hz=hz)
-    csvlog = CSVLogger(
+    # Abre/cierra por fila por defecto (TSC_CSV_MODE=persistent: handle con buffer).
+    # En modo persistente, flush por fila: el control loop y drain leen la última fila.
+    csvlog = CSVLogger.from_env(
         CSV_PATH,
+        flush_rows=1,
         base_order=[
             "t_wall",
             "time_ingame_h",
@@ -124,6 +135,29 @@ def run(
                     rs_kwargs["synchronous"] = int(sync_env)
                 except Exception:
                     rs_kwargs["synchronous"] = sync_env
+            # Escritor por lotes: TSC_DB_BATCH_ROWS>0 activa executemany en hilo de fondo
+            for env_name, key, cast in (
+                ("TSC_DB_BATCH_ROWS", "batch_rows", int),
+                ("TSC_DB_BATCH_MS", "batch_ms", float),
+                ("TSC_DB_QUEUE_MAX", "queue_max", int),
+                ("TSC_DB_ON_FULL", "on_full", str),
+                # Particionado por sesión, rotación y retención
+                ("TSC_DB_ARCHIVE_DIR", "archive_dir", str),
+                ("TSC_DB_ROTATE_MB", "rotate_max_mb", float),
+                ("TSC_DB_ROTATE_S", "rotate_max_s", float),
+                ("TSC_DB_RETENTION_DAYS", "retention_days", float),
+                ("TSC_DB_RETENTION_KEEP", "retention_keep", int),
+                # Checkpoints del WAL programados / por tamaño
+                ("TSC_DB_CHECKPOINT_S", "checkpoint_s", float),
+                ("TSC_DB_CHECKPOINT_MB", "checkpoint_wal_mb", float),
+                ("TSC_DB_CHECKPOINT_TRUNCATE_MB", "checkpoint_truncate_mb", float),
+            ):
+                val = os.environ.get(env_name)
+                if val:
+                    try:
+                        rs_kwargs[key] = cast(val)
+                    except Exception:
+                        pass
             if rs_kwargs:
                 store = RunStore(sqlite_db, **rs_kwargs)
             else:
@@ -132,8 +166,49 @@ def run(
             print(f"[collector] SQLite deshabilitado: {e}")
     # si bus_from_start=True => NO tail; leer desde el principio
     bus = LuaEventBus(LUA_BUS, create_if_missing=True, from_end=(not bus_from_start))
+    # events.jsonl + heartbeat en un hilo aparte (por lotes; TSC_EVT_ASYNC=0 -> síncrono)
+    evt_writer = AsyncEventWriter.from_env(EVT_PATH, heartbeat_path=HB_PATH)
     # Primar cabecera con superset de campos (specials + controles + derivados)
-    csvlog.init_with_fields(rd.schema())
+    # + sello de latencia de la fila (runtime.latency); el de commit lo anota
+    # RunStore tras el COMMIT real (tabla commits de run.db)
+    fields = [*rd.schema(), "ts_ingest"]
+    # Opcional: CSV por cambios (keyframes + deltas); shm, columnar y SQLite siguen densos
+    if delta is None:
+        delta = os.environ.get("TSC_RUN_DELTA", "0") == "1"
+    delta_enc = DeltaEncoder.from_env(fields) if delta else None
+    rec_fields = [*fields, KEYFRAME_COL] if delta_enc is not None else fields
+    # CSV nuevo (primera sesión o rotado): el .f64 empieza también de cero
+    csv_new = not os.path.exists(CSV_PATH) or os.path.getsize(CSV_PATH) == 0
+    csvlog.init_with_fields(rec_fields)
+    # Opcional: copia columnar binaria (run.f64 + esquema) para herramientas offline
+    if columnar is None:
+        columnar = os.environ.get("TSC_RUN_COLUMNAR", "0") == "1"
+    colwriter = None
+    if columnar:
+        try:
+            colwriter = ColumnarRunWriter(columnar_path_for(CSV_PATH), fields, fresh=csv_new)
+        except Exception as e:
+            print(f"[collector] columnar deshabilitado: {e}")
+    # Opcional: anillo en memoria compartida para el control loop (--source shm)
+    if shm is None:
+        shm = os.environ.get("TSC_SHM", "0") == "1"
+    shm_writer = None
+    if shm:
+        try:
+            shm_writer = TelemetryShmWriter(
+                fields, name=os.environ.get("TSC_SHM_NAME", SHM_DEFAULT_NAME)
+            )
+        except Exception as e:
+            print(f"[collector] shm deshabilitado: {e}")
+    # Sesión en SQLite: una columna REAL por control (TSC_DB_PROJECT=0 -> solo núcleo)
+    run_info_pending = False
+    if store is not None:
+        try:
+            project = os.environ.get("TSC_DB_PROJECT", "1") != "0"
+            store.begin_run(fields if project else ())
+            run_info_pending = True
+        except Exception as e:
+            print(f"[collector] begin_run falló: {e}")
 
     # --- estado para derivar odómetro/velocidad ---
     prev_t: float | None = None
@@ -160,219 +235,242 @@ def run(
     # Señal del último evento escrito para de-dup
     last_sig = None  # (type, marker_or_station, time)
 
-    # Mantener UN solo generador — el ritmo ya lo gobierna RDClient.stream()
-    for row in rd.stream():
-        # Auto-stop por tiempo si se indico
-        if stop_time and time.time() >= stop_time:
-            break
-        now = time.time()
-        row["t_wall"] = now
-        # ---- enriquecer: odómetro/velocidad si faltan ----
-        # Preferencias de keys de posición: lat/lon en grados si existen (fila o meta)
-        meta = row.get("meta") or {}
-        lat = (
-            row.get("lat")
-            or row.get("lat_deg")
-            or meta.get("lat")
-            or meta.get("lat_deg")
-        )
-        lon = (
-            row.get("lon")
-            or row.get("lon_deg")
-            or meta.get("lon")
-            or meta.get("lon_deg")
-        )
-        t_wall = float(row.get("t_wall") or 0.0)
-        odom_m = row.get("odom_m")
-        speed_kph = row.get("speed_kph")
-
-        if (
-            isinstance(lat, (int, float))
-            and isinstance(lon, (int, float))
-            and prev_t is not None
-            and prev_lat is not None
-            and prev_lon is not None
-        ):
-            dt = max(1e-3, t_wall - prev_t)
-            d = _haversine_m(float(prev_lat), float(prev_lon), float(lat), float(lon))
-            # descartar picos imposibles (>150 m en dt de 0.2 s ~ >2700 km/h)
-            if d <= 150.0:
-                odom_accum_m += d
-                if speed_kph in (None, "", 0, 0.0):
-                    speed_kph = (d / dt) * 3.6
-        elif prev_t is not None and speed_kph is not None and speed_kph != "":
-            # fallback: integrar por velocidad si no hay lat/lon
-            try:
-                v = float(speed_kph) / 3.6
+    try:
+        # Mantener UN solo generador — el ritmo ya lo gobierna RDClient.stream()
+        for row in rd.stream():
+            ts_ingest = latency.now()
+            # Auto-stop por tiempo si se indico
+            if stop_time and time.time() >= stop_time:
+                break
+            now = time.time()
+            row["t_wall"] = now
+            # ---- enriquecer: odómetro/velocidad si faltan ----
+            # Preferencias de keys de posición: lat/lon en grados si existen (fila o meta)
+            meta = row.get("meta") or {}
+            lat = (
+                row.get("lat")
+                or row.get("lat_deg")
+                or meta.get("lat")
+                or meta.get("lat_deg")
+            )
+            lon = (
+                row.get("lon")
+                or row.get("lon_deg")
+                or meta.get("lon")
+                or meta.get("lon_deg")
+            )
+            t_wall = float(row.get("t_wall") or 0.0)
+            odom_m = row.get("odom_m")
+            speed_kph = row.get("speed_kph")
+
+            if (
+                isinstance(lat, (int, float))
+                and isinstance(lon, (int, float))
+                and prev_t is not None
+                and prev_lat is not None
+                and prev_lon is not None
+            ):
                 dt = max(1e-3, t_wall - prev_t)
-                odom_accum_m += v * dt
-            except Exception:
-                pass
-
-        # clamp y asignación a la fila si faltaban
-        if odom_m in (None, "", 0, 0.0):
-            row["odom_m"] = float(round(odom_accum_m, 3))
-        if speed_kph is not None and speed_kph != "":
-            try:
-                row["speed_kph"] = float(max(0.0, min(400.0, float(speed_kph))))
-            except Exception:
-                pass
-
-        # actualizar estado
-        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
-            prev_lat, prev_lon = float(lat), float(lon)
-        prev_t = t_wall
-
-        # log de salud (cada ~1 s)
-        if time.time() >= debug_next_log_t:
-            try:
-                print(
-                    f"[collector] t={t_wall:.3f} odom={row.get('odom_m')} speed={row.get('speed_kph')}"
-                )
-            except Exception:
-                pass
-            debug_next_log_t = time.time() + 1.0
-
-        # ---- escritura ----
-        csvlog.write_row(row)
-        # Robustez: SQLite con retry y fallback automático
-        fallback_mode = False
-        sqlite_retry_count = 3
-        sqlite_retry_delay = 0.1
-        error_count = 0
-        if store is not None and not fallback_mode:
-            for attempt in range(sqlite_retry_count):
+                d = _haversine_m(float(prev_lat), float(prev_lon), float(lat), float(lon))
+                # descartar picos imposibles (>150 m en dt de 0.2 s ~ >2700 km/h)
+                if d <= 150.0:
+                    odom_accum_m += d
+                    if speed_kph in (None, "", 0, 0.0):
+                        speed_kph = (d / dt) * 3.6
+            elif prev_t is not None and speed_kph is not None and speed_kph != "":
+                # fallback: integrar por velocidad si no hay lat/lon
                 try:
-                    store.insert_row(row)
-                    if attempt > 0:
-                        error_count = max(0, error_count - 1)
-                    break
-                except Exception as e:
-                    if attempt < sqlite_retry_count - 1:
-                        delay = sqlite_retry_delay * (2**attempt)
-                        time.sleep(delay)
-                    else:
-                        print(
-                            f"[collector] SQLite insert failed after {sqlite_retry_count} attempts: {e}"
-                        )
-                        fallback_mode = True
-        # Refresca heartbeat en cada tick (señal de vida del colector)
-        try:
-            with open(HB_PATH, "w", encoding="utf-8") as hb:
-                hb.write(str(now))
-        except Exception:
-            pass
-
-        # Drenar hasta 10 eventos por tick (para no quedarnos atrás)
-        drained = 0
-        while drained < 10:
-            evt = bus.poll()
-            if not evt:
-                break
-            # Enriquecer evento con telemetría del tick si faltan campos
-            evt_dict = dict(evt)
-            evt_dict["source"] = "collector"
-            if evt_dict.get("lat") in (None, "") and row.get("lat") is not None:
-                evt_dict["lat"] = float(row["lat"])  # type: ignore[arg-type]
-            if evt_dict.get("lon") in (None, "") and row.get("lon") is not None:
-                evt_dict["lon"] = float(row["lon"])  # type: ignore[arg-type]
-            if evt_dict.get("time") is None:
+                    v = float(speed_kph) / 3.6
+                    dt = max(1e-3, t_wall - prev_t)
+                    odom_accum_m += v * dt
+                except Exception:
+                    pass
+
+            # clamp y asignación a la fila si faltaban
+            if odom_m in (None, "", 0, 0.0):
+                row["odom_m"] = float(round(odom_accum_m, 3))
+            if speed_kph is not None and speed_kph != "":
                 try:
-                    h = float(row.get("time_ingame_h") or 0)
-                    m = float(row.get("time_ingame_m") or 0)
-                    s = float(row.get("time_ingame_s") or 0)
-                    evt_dict["time"] = h + m / 60.0 + s / 3600.0
+                    row["speed_kph"] = float(max(0.0, min(400.0, float(speed_kph))))
                 except Exception:
                     pass
-            # Sellos siempre presentes para downstream (normalizer/analizadores)
-            evt_dict["odom_m"] = odom_m
-            evt_dict["t_wall"] = now
-
-            # De-dup básico: mismo tipo+identificador+tiempo ⇒ no reescribir
-            ident = (
-                evt_dict.get("marker")
-                or evt_dict.get("name")
-                or evt_dict.get("station")
-                or evt_dict.get("payload")
-            )
-            sig = (evt_dict.get("type"), ident, evt_dict.get("time"))
-            if sig == last_sig:
-                drained += 1
-                continue
-            last_sig = sig
-            # Skip incomplete marker events lacking coordinates
-            missing_lat = evt_dict.get("lat") in (None, "")
-            missing_lon = evt_dict.get("lon") in (None, "")
-            if evt_dict.get("type") == "marker_pass" and (missing_lat or missing_lon):
-                drained += 1
-                continue
-            # --- logica de alcance de limite (estimado)
-            # Normaliza SIEMPRE el evento actual antes de ramificar
-            nrm = normalize(evt_dict)
-            # Sello de seguridad: si algún evento viene sin t_wall, estampar ahora
-            if nrm.get("t_wall") is None:
-                nrm["t_wall"] = now
-            # Si llega un speed_limit_change nuevo y habia uno pendiente,
-            # consideramos que acabamos de "alcanzar" la placa del pendiente.
-            if nrm.get("type") == "speed_limit_change":
-                prev = pending_limit
-                if prev:
-                    dist = float(odom_m or 0.0) - float(
-                        prev.get("odom_m") or 0.0
-                    )  # distancia por odometro
-                    reach = {
-                        "type": "limit_reached",
-                        "limit_kmh": prev["limit_next_kmh"],
-                        "time": evt_dict.get("time"),
-                        "lat": evt_dict.get("lat"),
-                        "lon": evt_dict.get("lon"),
-                        "odom_m": odom_m,
-                        "dist_m_travelled": dist,
-                    }
-                    # Distancia geodésica (Haversine) si hay coordenadas
+
+            # actualizar estado
+            if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+                prev_lat, prev_lon = float(lat), float(lon)
+            prev_t = t_wall
+
+            # log de salud (cada ~1 s)
+            if time.time() >= debug_next_log_t:
+                try:
+                    print(
+                        f"[collector] t={t_wall:.3f} odom={row.get('odom_m')} speed={row.get('speed_kph')}"
+                    )
+                except Exception:
+                    pass
+                debug_next_log_t = time.time() + 1.0
+
+            # ---- escritura ----
+            row["ts_ingest"] = ts_ingest
+            # primero la memoria compartida: es la ruta de menor latencia
+            if shm_writer is not None:
+                shm_writer.publish(row)
+            rec = delta_enc.encode(row) if delta_enc is not None else row
+            csvlog.write_row(rec)
+            if colwriter is not None:
+                colwriter.write_row(row)
+            if run_info_pending and store is not None:
+                run_info_pending = False
+                try:
+                    store.update_run(
+                        provider=row.get("provider"),
+                        product=row.get("product"),
+                        engine=row.get("engine"),
+                    )
+                except Exception:
+                    pass
+            # Robustez: SQLite con retry y fallback automático
+            fallback_mode = False
+            sqlite_retry_count = 3
+            sqlite_retry_delay = 0.1
+            error_count = 0
+            if store is not None and not fallback_mode:
+                for attempt in range(sqlite_retry_count):
                     try:
-                        plat, plon = prev.get("lat"), prev.get("lon")  # type: ignore[assignment]
-                        clat, clon = evt_dict.get("lat"), evt_dict.get("lon")
-                        if (
-                            (plat is not None)
-                            and (plon is not None)
-                            and (clat is not None)
-                            and (clon is not None)
-                        ):
-                            R = 6371000.0
-                            p1, p2 = math.radians(float(plat)), math.radians(
-                                float(clat)
+                        # fila densa: las columnas proyectadas nunca quedan a NULL entre keyframes
+                        store.insert_row(row)
+                        if attempt > 0:
+                            error_count = max(0, error_count - 1)
+                        break
+                    except Exception as e:
+                        if attempt < sqlite_retry_count - 1:
+                            delay = sqlite_retry_delay * (2**attempt)
+                            time.sleep(delay)
+                        else:
+                            print(
+                                f"[collector] SQLite insert failed after {sqlite_retry_count} attempts: {e}"
                             )
-                            dphi = p2 - p1
-                            dl = math.radians(float(clon) - float(plon))
-                            a = (
-                                math.sin(dphi / 2) ** 2
-                                + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
-                            )
-                            reach["dist_geo_m"] = 2 * R * math.asin(math.sqrt(a))
+                            fallback_mode = True
+            # Heartbeat: se registra en cada tick, el escritor lo vuelca a ritmo fijo
+            evt_writer.heartbeat(now)
+
+            # Drenar todo lo disponible en el bus (una lectura por tick)
+            for evt in bus.poll_batch():
+                # Enriquecer evento con telemetría del tick si faltan campos
+                evt_dict = dict(evt)
+                latency.stamp(evt_dict, "ingest")
+                evt_dict["source"] = "collector"
+                if evt_dict.get("lat") in (None, "") and row.get("lat") is not None:
+                    evt_dict["lat"] = float(row["lat"])  # type: ignore[arg-type]
+                if evt_dict.get("lon") in (None, "") and row.get("lon") is not None:
+                    evt_dict["lon"] = float(row["lon"])  # type: ignore[arg-type]
+                if evt_dict.get("time") is None:
+                    try:
+                        h = float(row.get("time_ingame_h") or 0)
+                        m = float(row.get("time_ingame_m") or 0)
+                        s = float(row.get("time_ingame_s") or 0)
+                        evt_dict["time"] = h + m / 60.0 + s / 3600.0
                     except Exception:
                         pass
-                    # Anti-ruido: ignora si avance < 5 m
-                    if dist >= 5.0:
-                        rn = normalize(reach)
-                        # Sello de seguridad: si el evento carece de t_wall, estampar ahora
-                        if rn.get("t_wall") is None:
-                            rn["t_wall"] = now
-                        with open(EVT_PATH, "a", encoding="utf-8") as f:
-                            f.write(json.dumps(rn, ensure_ascii=False) + "\n")
-                pending_limit = {
-                    "limit_next_kmh": nrm["limit_next_kmh"],
-                    "odom_m": odom_m,
-                    "time": evt_dict.get("time"),
-                    "lat": evt_dict.get("lat"),
-                    "lon": evt_dict.get("lon"),
-                }
-            else:
-                # nrm ya calculado arriba
-                pass
-                with open(EVT_PATH, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(nrm, ensure_ascii=False) + "\n")
-            drained += 1
+                # Sellos siempre presentes para downstream (normalizer/analizadores)
+                evt_dict["odom_m"] = odom_m
+                evt_dict["t_wall"] = now
+
+                # De-dup básico: mismo tipo+identificador+tiempo ⇒ no reescribir
+                ident = (
+                    evt_dict.get("marker")
+                    or evt_dict.get("name")
+                    or evt_dict.get("station")
+                    or evt_dict.get("payload")
+                )
+                sig = (evt_dict.get("type"), ident, evt_dict.get("time"))
+                if sig == last_sig:
+                    continue
+                last_sig = sig
+                # Skip incomplete marker events lacking coordinates
+                missing_lat = evt_dict.get("lat") in (None, "")
+                missing_lon = evt_dict.get("lon") in (None, "")
+                if evt_dict.get("type") == "marker_pass" and (missing_lat or missing_lon):
+                    continue
+                # --- logica de alcance de limite (estimado)
+                # Normaliza SIEMPRE el evento actual antes de ramificar
+                nrm = normalize(evt_dict)
+                latency.carry(evt_dict, nrm)
+                # Sello de seguridad: si algún evento viene sin t_wall, estampar ahora
+                if nrm.get("t_wall") is None:
+                    nrm["t_wall"] = now
+                # Si llega un speed_limit_change nuevo y habia uno pendiente,
+                # consideramos que acabamos de "alcanzar" la placa del pendiente.
+                if nrm.get("type") == "speed_limit_change":
+                    prev = pending_limit
+                    if prev:
+                        dist = float(odom_m or 0.0) - float(
+                            prev.get("odom_m") or 0.0
+                        )  # distancia por odometro
+                        reach = {
+                            "type": "limit_reached",
+                            "limit_kmh": prev["limit_next_kmh"],
+                            "time": evt_dict.get("time"),
+                            "lat": evt_dict.get("lat"),
+                            "lon": evt_dict.get("lon"),
+                            "odom_m": odom_m,
+                            "dist_m_travelled": dist,
+                        }
+                        # Distancia geodésica (Haversine) si hay coordenadas
+                        try:
+                            plat, plon = prev.get("lat"), prev.get("lon")  # type: ignore[assignment]
+                            clat, clon = evt_dict.get("lat"), evt_dict.get("lon")
+                            if (
+                                (plat is not None)
+                                and (plon is not None)
+                                and (clat is not None)
+                                and (clon is not None)
+                            ):
+                                R = 6371000.0
+                                p1, p2 = math.radians(float(plat)), math.radians(
+                                    float(clat)
+                                )
+                                dphi = p2 - p1
+                                dl = math.radians(float(clon) - float(plon))
+                                a = (
+                                    math.sin(dphi / 2) ** 2
+                                    + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+                                )
+                                reach["dist_geo_m"] = 2 * R * math.asin(math.sqrt(a))
+                        except Exception:
+                            pass
+                        # Anti-ruido: ignora si avance < 5 m
+                        if dist >= 5.0:
+                            rn = normalize(reach)
+                            # Sello de seguridad: si el evento carece de t_wall, estampar ahora
+                            if rn.get("t_wall") is None:
+                                rn["t_wall"] = now
+                            # mismos sellos que el evento que lo dispara (ts_write al escribir)
+                            latency.carry(evt_dict, rn)
+                            evt_writer.write(rn)
+                    pending_limit = {
+                        "limit_next_kmh": nrm["limit_next_kmh"],
+                        "odom_m": odom_m,
+                        "time": evt_dict.get("time"),
+                        "lat": evt_dict.get("lat"),
+                        "lon": evt_dict.get("lon"),
+                    }
+                else:
+                    # nrm ya calculado arriba; ts_write lo pone el escritor
+                    evt_writer.write(nrm)
+
+    finally:
+        bus.close()
+        # vaciar eventos pendientes y último heartbeat antes de salir
+        evt_writer.close()
+        csvlog.close()
+        if colwriter is not None:
+            colwriter.close()
+        if shm_writer is not None:
+            shm_writer.close()
+        if store is not None:
+            # vaciar la cola del escritor por lotes antes de salir
+            store.close()
 
 
 if __name__ == "__main__":
@@ -393,10 +491,32 @@ if __name__ == "__main__":
         action="store_true",
         help="Leer el bus LUA desde el inicio (por defecto, solo nuevas líneas)",
     )
+    ap.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Escribir también run.f64 (formato columnar binario) junto a run.csv",
+    )
+    ap.add_argument(
+        "--shm",
+        action="store_true",
+        help="Publicar cada fila en memoria compartida (control_loop --source shm)",
+    )
+    ap.add_argument(
+        "--delta",
+        action="store_true",
+        help="CSV por cambios: keyframes periódicos + solo columnas que cambian (SQLite sigue denso)",
+    )
     args = ap.parse_args()
     end_t = (_t.time() + args.duration) if args.duration > 0 else None
     try:
-        run(args.hz, stop_time=end_t, bus_from_start=args.bus_from_start)
+        run(
+            args.hz,
+            stop_time=end_t,
+            bus_from_start=args.bus_from_start,
+            columnar=args.columnar or None,
+            shm=args.shm or None,
+            delta=args.delta or None,
+        )
     except KeyboardInterrupt:
         print("[collector] interrupción del usuario — saliendo limpio.")
         _sys.exit(0)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import atexit
 import json
 import logging
 import math
@@ -9,17 +10,23 @@ import sqlite3
 import time
 from dataclasses import replace
 from pathlib import Path
-from typing import TYPE_CHECKING, Dict, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
 
+from ingestion.bus_cursor import BusCursor
+from runtime import latency
 from runtime.actuators import (debug_trace, load_rd_from_spec, scan_for_rd,
                                send_to_rd)
-from runtime.braking_era import EraCurve
+from runtime.braking_era import load_era_curve
 from runtime.braking_v0 import BrakingConfig
 from runtime.csv_logger import CSVLogger
 from runtime.guards import JerkBrakeLimiter, RateLimiter, overspeed_guard
 from runtime.mode_guard import ModeGuard
+from runtime.parsing import to_float_loose
 from runtime.profiles import load_braking_profile, load_profile_extras
-from storage.run_store_sqlite import RunStore
+from runtime.scheduler import POLICIES, DeadlineScheduler
+from runtime.telemetry_shm import DEFAULT_NAME as SHM_DEFAULT_NAME
+from runtime.telemetry_shm import TelemetryShmReader
+from storage.telemetry_reader import TelemetryReader
 
 # Avoid redefining names during type-checking: import for types only and
 # provide runtime fallbacks when the modules are not available.
@@ -73,11 +80,6 @@ else:
                 return self.kp * error + self.ki * self._i + self.kd * d
 
 
-# Fix: Variables globales para FSM
-_active_limit_kph: float | None = None
-_last_dist_next_m: float | None = None
-
-
 class ControlLoop:
     """Fix: Clase ControlLoop simplificada y corregida"""
 
@@ -106,7 +108,11 @@ class ControlLoop:
         self.last_command_value: Optional[float] = None
         self.last_ack_time: Optional[float] = None
         self.logger = logging.getLogger(__name__)
-        if source not in ["sqlite", "csv"]:
+        self._reader: Optional[TelemetryReader] = None
+        # canal en memoria compartida (source="shm"); SQLite/CSV como respaldo
+        self.shm_name = str(kwargs.get("shm_name", SHM_DEFAULT_NAME))
+        self._shm: Optional[TelemetryShmReader] = None
+        if source not in ["sqlite", "csv", "shm"]:
             raise ValueError(f"Invalid source: {source}")
         if source == "sqlite" and not db_path:
             raise ValueError("db_path required for sqlite source")
@@ -115,6 +121,19 @@ class ControlLoop:
 
     def read_telemetry(self):
         try:
+            if self.source == "shm":
+                data = self._read_from_shm()
+                if data and self._is_data_fresh(data):
+                    self.consecutive_failures = 0
+                    return data
+                # sin colector publicando (o datos viejos): respaldo SQLite/CSV
+                if data and self._shm is not None:
+                    self._shm.reopen()  # el colector pudo reiniciarse con otro bloque
+                if self.db_path:
+                    data = self._read_from_sqlite()
+                    if data and self._is_data_fresh(data):
+                        return data
+                return self._read_from_csv() if self.run_csv else None
             if self.source == "sqlite":
                 data = self._read_from_sqlite()
                 if data and self._is_data_fresh(data):
@@ -135,29 +154,28 @@ class ControlLoop:
             self.consecutive_failures += 1
             return None
 
+    def _read_from_shm(self):
+        if self._shm is None:
+            self._shm = TelemetryShmReader(self.shm_name)
+        return self._shm.latest()
+
     def _read_from_sqlite(self):
         if not self.db_path:
             self.logger.error("db_path not defined")
             return None
+        # conexión persistente de solo lectura (se abre una vez y se reutiliza)
+        if self._reader is None:
+            self._reader = TelemetryReader(self.db_path)
         try:
-            with sqlite3.connect(self.db_path, timeout=5.0) as conn:
-                cursor = conn.cursor()
-                recent_threshold = time.time() - self.stale_data_threshold
-                cursor.execute(
-                    "SELECT * FROM telemetry WHERE t_wall > ? ORDER BY rowid DESC LIMIT 1",
-                    (recent_threshold,),
-                )
-                row = cursor.fetchone()
-                if row:
-                    return dict(zip([desc[0] for desc in cursor.description], row))
-                cursor.execute("SELECT * FROM telemetry ORDER BY rowid DESC LIMIT 1")
-                row = cursor.fetchone()
-                if row:
-                    data = dict(zip([desc[0] for desc in cursor.description], row))
-                    age = time.time() - float(data.get("t_wall", 0))
-                    msg = f"Using stale data: {age:.1f}s old"
-                    self.logger.warning(msg)
-                    return data
+            sample = self._reader.latest()
+            if sample is None:
+                return None
+            data = sample.as_row()
+            age = time.time() - float(data.get("t_wall", 0))
+            if age > self.stale_data_threshold:
+                msg = f"Using stale data: {age:.1f}s old"
+                self.logger.warning(msg)
+            return data
         except sqlite3.OperationalError as e:
             if "database is locked" in str(e):
                 self.logger.warning(
@@ -170,7 +188,6 @@ class ControlLoop:
         except Exception as e:
             self.logger.error(f"Unexpected SQLite error: {e}")
             raise
-        return None
 
     def _read_from_csv(self):
         if not self.run_csv:
@@ -314,6 +331,9 @@ class ControlLoop:
             self.logger.error(f"Control loop error: {e}")
         finally:
             self.running = False
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
 
     def _process_control_data(self, data):
         speed = data.get("speed_kph", 0)
@@ -548,25 +568,8 @@ def tail_csv_last_row(
     return None
 
 
-def _to_float_loose(val: object) -> float:
-    """Convierte strings a float tolerando formato con miles '.' y decimales ','.
-    '', None o 'nan' -> NaN."""
-    if val is None:
-        return float("nan")
-    s = str(val).strip().strip('"').strip("'")
-    if s == "" or s.lower() == "nan":
-        return float("nan")
-    # si tiene coma, asumimos coma decimal; quitamos puntos como miles
-    if "," in s:
-        s = s.replace(".", "").replace(",", ".")
-    else:
-        # si hay >1 puntos, probablemente son miles -> quítalos
-        if s.count(".") > 1:
-            s = s.replace(".", "")
-    try:
-        return float(s)
-    except Exception:
-        return float("nan")
+# compat: la conversión tolerante vive ahora en runtime.parsing
+_to_float_loose = to_float_loose
 
 
 # --- utilidades físicas simples ---
@@ -607,6 +610,463 @@ def _map_a_req_to_brake(a_req: float, a_service: float) -> float:
     return val
 
 
+def build_config(
+    profile: Optional[str] = None,
+    *,
+    margin_kph: Optional[float] = None,
+    A: Optional[float] = None,
+    reaction: Optional[float] = None,
+) -> Tuple[BrakingConfig, Dict[str, object]]:
+    """BrakingConfig + extras del perfil con los overrides de CLI (``--margin-kph``, ``--A``, ``--reaction``)."""
+    cfg = BrakingConfig()
+    extras: Dict[str, object] = {}
+    if profile:
+        cfg = load_braking_profile(profile, base=cfg)
+        extras = load_profile_extras(profile)
+        # si el perfil tiene bloque 'braking', mapear claves conocidas a BrakingConfig
+        if (
+            isinstance(extras, dict)
+            and "braking" in extras
+            and isinstance(extras["braking"], dict)
+        ):
+            b = extras["braking"]
+            # keys posibles que podrían venir del bloque 'braking'
+            mapping_keys = {
+                "a_service_mps2": "max_service_decel",
+                "max_service_decel": "max_service_decel",
+                "t_react_s": "reaction_time_s",
+                "reaction_time_s": "reaction_time_s",
+                "margin_m": None,  # distancia, no es directamente mapeable en BrakingConfig
+                "v_margin_kph": "margin_kph",
+                "margin_kph": "margin_kph",
+            }
+            vals = {}
+            for src, dst in mapping_keys.items():
+                if src in b and dst is not None:
+                    try:
+                        vals[dst] = float(b[src])
+                    except Exception:
+                        pass
+            if vals:
+                cfg = replace(cfg, **vals)
+    if margin_kph is not None:
+        cfg = replace(cfg, margin_kph=float(margin_kph))
+    if A is not None:
+        cfg = replace(cfg, max_service_decel=float(A))
+    if reaction is not None:
+        cfg = replace(cfg, reaction_time_s=float(reaction))
+    return cfg, extras
+
+
+class ControlStepper:
+    """Un ciclo del control online (lo que hace ``main`` por cada muestra nueva).
+
+    Sin E/S ni reloj: el tiempo es el ``t_wall`` de cada fila, así que el mismo
+    código sirve para el bucle en vivo y para la reproducción offline
+    (``tools.replay_sim``), que lo ejecuta tan rápido como dé la CPU.
+
+    ``step(row)`` devuelve la fila de salida (PLAN) o ``None`` si la muestra
+    se descarta; ``skip`` dice por qué (``"dup"``: misma ``t_wall`` que la
+    última escrita). ``throttle_plan`` es la tracción del PID (modo ``full``).
+    """
+
+    def __init__(
+        self,
+        cfg: Optional[BrakingConfig] = None,
+        extras: Optional[Dict[str, object]] = None,
+        period: float = 0.2,
+        startup_gate_s: Optional[float] = None,
+        hold_s: Optional[float] = None,
+        rise_per_s: Optional[float] = None,
+        fall_per_s: Optional[float] = None,
+        derive_speed: bool = True,
+        emit_active_limit: bool = False,
+        verbose: bool = False,
+        debug: bool = False,
+    ) -> None:
+        self.cfg = cfg if cfg is not None else BrakingConfig()
+        self.extras: Dict[str, object] = extras if isinstance(extras, dict) else {}
+        self.period = float(period)
+        self.startup_gate_s = float(startup_gate_s) if startup_gate_s is not None else 4.0
+        self.hold_s = float(hold_s) if hold_s is not None else 0.5
+        self.rise_per_s = float(rise_per_s) if rise_per_s is not None else 1.2
+        self.fall_per_s = float(fall_per_s) if fall_per_s is not None else 2.0
+        self.derive_speed = bool(derive_speed)
+        self.emit_active_limit = bool(emit_active_limit)
+        self.verbose = bool(verbose)
+        self.debug = bool(debug)
+
+        self.rl_th = RateLimiter(max_delta_per_s=0.8)
+        self.jerk_br = JerkBrakeLimiter(max_rate_per_s=1.2, max_jerk_per_s2=3.0)
+        # PID instanciado una vez (no por cada iteración)
+        self.pid = SplitPID()
+        # suavizado ligero y flag de approach
+        self.v_filt_kph: Optional[float] = None
+        self.approach_active = False
+        # control de freno (histéresis + retención + rampa)
+        self.brake_on = False
+        self.brake_hold_until = 0.0
+        self.brake_cmd = 0.0
+        self.last_t_for_brake = 0.0
+        # próxima señal de límite
+        self.next_limit_kph: Optional[float] = None
+        self.anchor_dist_m: Optional[float] = None
+        self.anchor_odom_m: Optional[float] = None
+        self.last_limit_kph: Optional[float] = None
+        self.last_dist_m: Optional[float] = None
+        # FSM de límite activo (tras cruzar el hito)
+        self.active_limit_kph: Optional[float] = None
+        self.last_dist_next_m: Optional[float] = None
+        # última fase observada (CRUISE/COAST/BRAKE) — para detectar entrada en frenada
+        self.last_phase: Optional[str] = None
+        self.last_t_wall_written: Optional[float] = None
+        # memoria para derivar velocidad si falta
+        self.prev_t_wall: Optional[float] = None
+        self.prev_odom_m: Optional[float] = None
+        # tiempo de inicio según t_wall (para compuerta de arranque)
+        self.start_t_wall: Optional[float] = None
+        self.skip: Optional[str] = None
+        self.throttle_plan = 0.0
+
+    def on_event(self, ev: object, odom_m: Optional[float] = None) -> bool:
+        """Aplica un ``getdata_next_limit``; ``odom_m`` ancla la distancia (None: primera muestra)."""
+        if not isinstance(ev, dict) or ev.get("type") != "getdata_next_limit":
+            return False
+        kph = ev.get("kph") or ev.get("speed_kph") or ev.get("limit_kph")
+        dist = ev.get("dist_m") or ev.get("dist")
+        if kph is None or dist is None:
+            return False
+        self.next_limit_kph = float(kph)
+        self.anchor_dist_m = float(dist) if odom_m is not None else max(0.0, float(dist))
+        self.anchor_odom_m = odom_m
+        if self.verbose and odom_m is not None:
+            try:
+                print(f"[control] next_limit={self.next_limit_kph} kph  dist≈{self.anchor_dist_m} m")
+            except Exception:
+                pass
+        return True
+
+    def step(
+        self,
+        row: Dict[str, object],
+        ts_ctrl_read: object = "",
+        drain: Optional[Callable[[], Iterable[object]]] = None,
+    ) -> Optional[Dict[str, object]]:
+        """Procesa una fila de telemetría; ``drain`` da los eventos del bus a anclar en esta muestra."""
+        self.skip = None
+        period = self.period
+        cfg = self.cfg
+        t_wall = _to_float_loose(row.get("t_wall", ""))
+        odom_m = _to_float_loose(row.get("odom_m", ""))
+        # compat: speed_kph o v_kmh
+        v = row.get("speed_kph") or row.get("v_kmh") or row.get("SpeedometerKPH")
+        speed_kph = _to_float_loose(v)
+
+        # --- suavizado ligero para control (no para ocultar errores de sensado) ---
+        alpha = 0.25  # 0<alpha<=1; menor = más suave
+        if self.v_filt_kph is None:
+            self.v_filt_kph = float(speed_kph) if not math.isnan(speed_kph) else 0.0
+        else:
+            sf = float(speed_kph) if not math.isnan(speed_kph) else self.v_filt_kph
+            self.v_filt_kph = alpha * sf + (1 - alpha) * self.v_filt_kph
+        v_for_control_kph = self.v_filt_kph
+
+        if any(math.isnan(x) for x in (t_wall, odom_m)):
+            self.skip = "nan"
+            return None
+        # Derivar velocidad si falta y está habilitado
+        if math.isnan(speed_kph) and self.derive_speed:
+            if self.prev_t_wall is not None and self.prev_odom_m is not None:
+                dt = max(1e-3, t_wall - self.prev_t_wall)
+                dv = odom_m - self.prev_odom_m
+                speed_kph = max(0.0, (dv / dt) * 3.6)
+            else:
+                # aún no podemos derivar (primera muestra): guardamos y esperamos la siguiente
+                self.prev_t_wall, self.prev_odom_m = t_wall, odom_m
+                self.skip = "derive"
+                return None
+        self.prev_t_wall, self.prev_odom_m = t_wall, odom_m
+
+        # --- eventos del bus (getdata_next_limit), anclados al odómetro actual ---
+        if drain is not None:
+            for ev in drain():
+                self.on_event(ev, odom_m)
+        if math.isnan(speed_kph):
+            self.skip = "nan"
+            return None
+
+        # Evitar duplicados: si no hay nueva muestra, no escribimos
+        if self.last_t_wall_written is not None and abs(t_wall - self.last_t_wall_written) < 1e-6:
+            self.skip = "dup"
+            return None
+
+        # 3) calcular dist_next_limit_m por odómetro
+        dist_next_limit_m: Optional[float]
+        if self.next_limit_kph is None or self.anchor_dist_m is None:
+            dist_next_limit_m = None
+        else:
+            if self.anchor_odom_m is None:
+                self.anchor_odom_m = odom_m
+            traveled = max(0.0, odom_m - self.anchor_odom_m)
+            dist_raw = max(0.0, self.anchor_dist_m - traveled)
+            if (
+                self.last_limit_kph is not None
+                and self.next_limit_kph == self.last_limit_kph
+                and self.last_dist_m is not None
+                and dist_raw > self.last_dist_m
+            ):
+                dist_next_limit_m = self.last_dist_m
+            else:
+                dist_next_limit_m = dist_raw
+            self.last_dist_m = dist_next_limit_m
+            self.last_limit_kph = self.next_limit_kph
+
+        # --- FSM de límite activo -------------------------------------------------
+        # Si cruzamos la baliza del próximo límite (dist pasa de >0 a <=0), el
+        # límite activo pasa a ser el del próximo.
+        try:
+            dn = None if dist_next_limit_m is None else float(dist_next_limit_m)
+            nl = None if self.next_limit_kph is None else float(self.next_limit_kph)
+        except Exception:
+            dn, nl = None, None
+        if self.last_dist_next_m is not None and dn is not None:
+            if self.last_dist_next_m > 0.0 and dn <= 0.0 and nl is not None:
+                self.active_limit_kph = nl
+        self.last_dist_next_m = dn
+
+        # 3.1) Si ya estamos "en" el hito (distances cercanas a 0), promover el límite a 'activo'
+        if dist_next_limit_m is not None and dist_next_limit_m <= 2.0:
+            if self.next_limit_kph is not None:
+                self.active_limit_kph = float(self.next_limit_kph)
+            # limpiar el próximo límite y su anclaje
+            self.next_limit_kph = None
+            self.anchor_dist_m = None
+            self.anchor_odom_m = None
+            dist_next_limit_m = None
+            self.last_dist_m = None
+            self.last_limit_kph = None
+        next_limit_kph = self.next_limit_kph
+        active_limit_kph = self.active_limit_kph
+
+        # --- compuerta de arranque: sin próximo límite válido, no frenar ---
+        if self.start_t_wall is None:
+            self.start_t_wall = float(t_wall)
+        t_since = float(t_wall) - float(self.start_t_wall)
+        limits_valid = next_limit_kph is not None and dist_next_limit_m is not None
+        control_ready = (t_since >= self.startup_gate_s) and bool(limits_valid)
+
+        # 4) objetivo y PID (lógica 'approach' conservadora basada en distancia física)
+        # Resolver parámetros físicos y de perfil (compatibilidad con nombres antiguos)
+        v_margin_kph = float(getattr(cfg, "v_margin_kph", getattr(cfg, "margin_kph", 3.0)))
+        a_service = float(getattr(cfg, "a_service_mps2", getattr(cfg, "max_service_decel", 0.7)))
+        t_react = float(getattr(cfg, "t_react_s", getattr(cfg, "reaction_time_s", 0.6)))
+        margin_m = float(self.extras.get("margin_m", 0.0))  # type: ignore[arg-type]
+
+        # Crucero por defecto: si hay límite activo, lo usamos con margen; si no, mantenemos velocidad actual
+        cruise_kph = speed_kph
+        if active_limit_kph is not None:
+            cruise_kph = max(0.0, float(active_limit_kph) - v_margin_kph)
+
+        target_next_kph = None
+        if next_limit_kph is not None:
+            target_next_kph = max(0.0, float(next_limit_kph) - v_margin_kph)
+
+        if next_limit_kph is None or dist_next_limit_m is None:
+            # No hay siguiente límite -> mantén crucero del límite actual o velocidad actual
+            v_tgt = cruise_kph
+            phase = "CRUISE" if v_tgt >= speed_kph - 0.1 else "COAST"
+            self.approach_active = False
+        else:
+            # Distancia que necesitamos para llegar a target_next_kph con seguridad
+            tgt = float(target_next_kph if target_next_kph is not None else 0.0)
+            d_need = _brake_distance_m(float(v_for_control_kph), tgt, a_service, t_react) + margin_m
+
+            # Histeresis para evitar oscilaciones (10%)
+            if dist_next_limit_m < d_need * 0.9:
+                self.approach_active = True
+            elif dist_next_limit_m > d_need * 1.1:
+                self.approach_active = False
+
+            if self.approach_active:
+                v_tgt = tgt
+                phase = "BRAKE" if v_tgt < speed_kph - cfg.coast_band_kph else "COAST"
+            else:
+                v_tgt = cruise_kph
+                phase = "CRUISE" if v_tgt >= speed_kph - 0.1 else "COAST"
+
+        # Failsafe: si algo devolviera NaN, usar velocidad actual
+        if not (float(v_tgt) == float(v_tgt)):
+            v_tgt = float(speed_kph)
+            phase = "CRUISE"
+
+        # SplitPID.update espera (error, dt); aquí error = v_tgt - speed_kph
+        pid_out = self.pid.update(float(v_tgt) - float(speed_kph), period)
+        # Si el PID real devuelve una tupla (th, br), descomponer; si es float, usar como throttle y brake=0
+        if isinstance(pid_out, tuple) and len(pid_out) == 2:
+            th, br = pid_out
+        else:
+            th, br = pid_out, 0.0
+        # aplicar rate limiters
+        th = self.rl_th.step(th, period)
+        # overspeed guard (mínimo de freno) — contra el próximo límite si existe, si no contra el activo
+        og = overspeed_guard(
+            float(speed_kph),
+            (
+                float(next_limit_kph)
+                if next_limit_kph is not None
+                else (active_limit_kph if active_limit_kph is not None else 0.0)
+            ),
+        )
+
+        # 4.1) Guard FÍSICO por distancia (a_req > a_service -> pisar más freno)
+        try:
+            a_service = float(getattr(cfg, "a_service_mps2", 0.6))
+            if dist_next_limit_m is not None and next_limit_kph is not None:
+                vm = max(0.0, float(speed_kph)) / 3.6
+                vlim = max(0.0, float(next_limit_kph)) / 3.6
+                d = max(1.0, float(dist_next_limit_m))  # evita div/0
+                a_req = max(0.0, (vm * vm - vlim * vlim) / (2.0 * d))
+                if a_req > 0.70 * a_service:
+                    phase = "BRAKE"
+                    # mapear (a_req / a_service) a mando de freno (0..1), con ganancia suave
+                    br = max(br, _map_a_req_to_brake(a_req, a_service))
+        except Exception:
+            pass
+        # decidir si hemos entrado en fase de frenada recientemente
+        just_entered_brake = (phase == "BRAKE" and self.last_phase != "BRAKE") or og > 0.0
+        if just_entered_brake:
+            self.rl_th.reset(0.0)
+            # reset suave del limitador con reenganche
+            self.jerk_br.reset(self.jerk_br.step(0.0, 1e-3))
+            th = 0.0
+        br = self.jerk_br.step(br, period)
+        # aplicar overspeed como piso
+        br = max(br, og)
+        if br > 0:
+            th = 0.0
+        self.last_phase = phase
+        self.throttle_plan = float(th)
+
+        # 5) fila de salida (PLAN)
+        row_out: Dict[str, object] = {
+            "t_wall": float(t_wall),
+            "odom_m": float(odom_m),
+            "speed_kph": float(speed_kph),
+            "speed_filt_kph": float(v_for_control_kph),
+            "next_limit_kph": "" if next_limit_kph is None else float(next_limit_kph),
+            "next_limit_used_kph": "" if next_limit_kph is None else float(next_limit_kph),
+            "cur_limit_used_kph": float(active_limit_kph) if active_limit_kph is not None else float("nan"),
+            "dist_next_limit_m": "" if dist_next_limit_m is None else float(dist_next_limit_m),
+            "target_speed_kph": float(v_tgt),
+            "phase": phase,
+            "throttle": float(round(th, 3)),
+            "brake": float(round(br, 3)),
+            "control_ready": int(bool(control_ready)),
+            # sellos de latencia (runtime.latency); ingest/commit llegan con la fila si la fuente los trae
+            "ts_ingest": row.get("ts_ingest", ""),
+            "ts_commit": row.get("ts_commit", ""),
+            "ts_ctrl_read": ts_ctrl_read,
+            "ts_decision": "",
+            "ts_rd_send": "",
+            "ts_rd_ack": "",
+        }
+        row_out["approach_active"] = int(bool(self.approach_active))
+        if self.emit_active_limit:
+            row_out["active_limit_kph"] = active_limit_kph if active_limit_kph is not None else ""
+
+        # --- control de freno con histéresis + retención + rampa hacia "desired" ---
+        # desired_brake: lo que pide el PID/guard como mínimo efectivo
+        desired_brake = max(0.0, float(br))
+        # error respecto al objetivo (positivo => vamos "pasados")
+        err_kph = max(0.0, float(v_for_control_kph) - float(v_tgt))
+        on = self.brake_on
+        # Schmitt (evita aleteo): enciende con >0.7 kph; apaga con <0.3 kph
+        if err_kph > 0.7:
+            on = True
+        elif err_kph < 0.3:
+            on = False
+        # Si el guard/phys pide freno, lo consideramos "on"
+        if desired_brake > 0.05:
+            on = True
+        # no frenar en crucero si no estamos en aproximación y vamos por debajo de cruise + 0.3
+        # pero no cancelar el encendido si un guard físico/por distancia ya pide freno
+        if desired_brake <= 0.05 and (
+            not self.approach_active and float(v_for_control_kph) <= (float(cruise_kph) + 0.3)
+        ):
+            on = False
+        # compuerta de arranque: hasta que el control esté "ready" NO se permite
+        # frenar por control, pero si un guard físico/por distancia ya pide freno
+        # (desired_brake > 0.05) lo permitimos. Esto evita que la compuerta inicial
+        # suprima órdenes de emergencia o guardias físicos.
+        if not bool(control_ready) and desired_brake <= 0.05:
+            on = False
+
+        now = float(t_wall)
+        if on:
+            # al encender, garantizamos hold_s de retención mínima
+            self.brake_hold_until = max(self.brake_hold_until, now + self.hold_s)
+        if now < self.brake_hold_until:
+            on = True
+        self.brake_on = on
+
+        # rampa suave de mando hacia el objetivo (desired si on, 0 si off)
+        # Sin instante previo (valor inicial) o con un salto irracional (<=0 o >10 s),
+        # se usa el periodo de control para evitar saltos gigantes en la rampa.
+        raw_dt = now - self.last_t_for_brake
+        if self.last_t_for_brake <= 0.0 or raw_dt <= 0.0 or raw_dt > 10.0:
+            dt_br = period
+        else:
+            dt_br = raw_dt
+        dt_br = max(1e-3, float(dt_br))
+        self.last_t_for_brake = now
+        target_brake = desired_brake if on else 0.0
+        brake_cmd = self.brake_cmd
+        delta = target_brake - brake_cmd
+        if delta >= 0.0:
+            brake_cmd = min(1.0, brake_cmd + min(delta, self.rise_per_s * dt_br))
+        else:
+            brake_cmd = max(0.0, brake_cmd + max(delta, -self.fall_per_s * dt_br))
+        if self.debug:
+            self._trace(
+                {
+                    "t_wall": now,
+                    "err_kph": float(err_kph),
+                    "desired_brake": float(desired_brake),
+                    "on": bool(on),
+                    "approach_active": bool(self.approach_active),
+                    "v_for_control_kph": float(v_for_control_kph),
+                    "cruise_kph": float(cruise_kph),
+                    "control_ready": bool(control_ready),
+                    "hold_until": float(self.brake_hold_until),
+                    "last_t_for_brake": float(self.last_t_for_brake),
+                    "dt_br": float(dt_br),
+                    "brake_cmd_after": float(brake_cmd),
+                }
+            )
+        self.brake_cmd = brake_cmd
+
+        # aplicar en modo brake (la IA no toca throttle en brake/advisory)
+        row_out["throttle"] = 0.0
+        row_out["brake"] = float(round(brake_cmd, 3))
+        self.last_t_wall_written = t_wall
+        return row_out
+
+    @staticmethod
+    def _trace(cycle: Dict[str, object]) -> None:
+        # Trazas compactas por ciclo para diagnóstico (JSONL en data/ctrl_cycle.log)
+        try:
+            print(
+                f"[CTRL-DBG] t={cycle['t_wall']:.3f} err_kph={cycle['err_kph']:.3f} "
+                f"desired_brake(before_ramp)={cycle['desired_brake']:.3f} on={cycle['on']} "
+                f"brake_cmd(after_ramp)={cycle['brake_cmd_after']:.3f} dt_br={cycle['dt_br']:.3f}"
+            )
+            Path("data").mkdir(parents=True, exist_ok=True)
+            with Path("data/ctrl_cycle.log").open("a", encoding="utf-8") as _f:
+                _f.write(json.dumps(cycle) + "\n")
+        except Exception:
+            pass
+
+
 def main() -> None:
     p = argparse.ArgumentParser(
         description="Control online a partir de run.csv y eventos"
@@ -632,7 +1092,12 @@ def main() -> None:
         "Si es callable, se invoca sin args y se usa el retorno.",
     )
     p.add_argument("--db", default="data/run.db")
-    p.add_argument("--source", choices=["sqlite", "csv"], default="sqlite")
+    p.add_argument("--source", choices=["sqlite", "csv", "shm"], default="sqlite")
+    p.add_argument(
+        "--shm-name",
+        default=os.environ.get("TSC_SHM_NAME", SHM_DEFAULT_NAME),
+        help="Nombre del bloque de memoria compartida del colector (--source shm)",
+    )
     p.add_argument(
         "--no-csv-fallback",
         action="store_true",
@@ -701,8 +1166,6 @@ def main() -> None:
     )
     args = p.parse_args()
     mode_guard = ModeGuard(args.mode)
-    # declarar globals que mantienen estado entre iteraciones
-    global _active_limit_kph, _last_dist_next_m
     debug_trace(False, f"[control] mode={args.mode}")
     # Debug RD: reset de log salvo que se pida append
     debug_on = os.getenv("TSC_RD_DEBUG", "0") in ("1", "true", "True")
@@ -723,84 +1186,24 @@ def main() -> None:
     bus_path: Path = Path(args.bus)
 
     # Configuración de frenada
-    cfg = BrakingConfig()
-    extras = {}
-    if args.profile:
-        cfg = load_braking_profile(args.profile, base=cfg)
-        extras = load_profile_extras(args.profile)
-        # si el perfil tiene bloque 'braking', mapear claves conocidas a BrakingConfig
-        if (
-            isinstance(extras, dict)
-            and "braking" in extras
-            and isinstance(extras["braking"], dict)
-        ):
-            b = extras["braking"]
-            # keys posibles que podrían venir del bloque 'braking'
-            mapping_keys = {
-                "a_service_mps2": "max_service_decel",
-                "max_service_decel": "max_service_decel",
-                "t_react_s": "reaction_time_s",
-                "reaction_time_s": "reaction_time_s",
-                "margin_m": None,  # distancia, no es directamente mapeable en BrakingConfig
-                "v_margin_kph": "margin_kph",
-                "margin_kph": "margin_kph",
-            }
-            vals = {}
-            for src, dst in mapping_keys.items():
-                if src in b and dst is not None:
-                    try:
-                        vals[dst] = float(b[src])
-                    except Exception:
-                        pass
-            if vals:
-                cfg = replace(cfg, **vals)
-    if args.margin_kph is not None:
-        cfg = replace(cfg, margin_kph=float(args.margin_kph))
-    if args.A is not None:
-        cfg = replace(cfg, max_service_decel=float(args.A))
-    if args.reaction is not None:
-        cfg = replace(cfg, reaction_time_s=float(args.reaction))
+    cfg, extras = build_config(
+        args.profile, margin_kph=args.margin_kph, A=args.A, reaction=args.reaction
+    )
 
     era_curve_path = args.era_curve or extras.get("era_curve_csv")
-    curve = EraCurve.from_csv(era_curve_path) if era_curve_path else None
+    curve = load_era_curve(era_curve_path) if era_curve_path else None
 
-    # Estado de eventos y rate limiters
+    # Estado de eventos
     ev_stream = NonBlockingEventStream(
         events_path, from_end=bool(args.start_events_from_end)
     )
-    rl_th = RateLimiter(max_delta_per_s=0.8)
-    jerk_br = JerkBrakeLimiter(max_rate_per_s=1.2, max_jerk_per_s2=3.0)
-    # Estado para suavizado ligero y flag de approach (estado local, no usar self.* en función)
-    v_filt_kph_state: Optional[float] = None
-    approach_active: bool = False
-    # PID instanciado una vez (no por cada iteración)
-    pid = SplitPID()
-
-    # Estado para control de freno (histéresis + retención + rampa)
-    _brake_on: bool = False
-    _brake_hold_until: float = 0.0
-    _brake_cmd: float = 0.0
-    _last_t_for_brake: float = 0.0
-
-    # Estado de próxima señal de límite
-    next_limit_kph: Optional[float] = None
-    anchor_dist_m: Optional[float] = None
-    anchor_odom_m: Optional[float] = None
-    last_limit_kph: Optional[float] = None
-    last_dist_m: Optional[float] = None
-    # última fase observada (CRUISE/COAST/BRAKE) — necesario para detectar entrada en frenada
-    last_phase: Optional[str] = None
-    # EMA para suavizar speed solo a efectos de objetivo
-    speed_ema: Optional[float] = None
-    # Límite en vigor (tras cruzar el hito). Se usa para guard/vel objetivo si no hay "próximo límite"
-    active_limit_kph: Optional[float] = None
-    last_t_wall_written: Optional[float] = None
 
     # CSV salida con logger (coma, append seguro)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    writer = CSVLogger(
+    writer = CSVLogger.from_env(
         out_path,
         delimiter=",",
+        flush_rows=20,
         base_order=[
             "t_wall",
             "odom_m",
@@ -818,10 +1221,19 @@ def main() -> None:
             "control_ready",
         ],
     )
+    # volcar el buffer del CSV al salir (Ctrl+C incluido)
+    atexit.register(writer.close)
 
     # Fuente de datos opcional: SQLite
-    store = RunStore(args.db) if args.source == "sqlite" else None
+    # Lector incremental con conexión persistente (solo lectura, WAL)
+    store = TelemetryReader(args.db) if args.source in ("sqlite", "shm") else None
     last_rowid = 0
+    # --source shm: fila más reciente del anillo compartido; SQLite si el
+    # colector no publica o deja de hacerlo durante stale_data_threshold
+    shm_reader = TelemetryShmReader(args.shm_name) if args.source == "shm" else None
+    last_shm_seq = 0
+    shm_last_rx = -1e9
+    shm_retry_at = 0.0
     # fila actual leída (puede venir de SQLite o CSV). Tipada para mypy.
     row: Optional[Dict[str, object]] = None
     use_csv = args.source == "csv"
@@ -839,46 +1251,38 @@ def main() -> None:
         f"[control] source={args.source} db={args.db} "
         f"derive_speed_if_missing={derive_speed} no_csv_fallback={args.no_csv_fallback}"
     )
-    # memoria para derivar velocidad si falta
-    prev_t_wall: float | None = None
-    prev_odom_m: float | None = None
-    # tiempo de inicio según t_wall (para compuerta de arranque)
-    start_t_wall: float | None = None
-
     period = 1.0 / max(0.5, float(args.hz))
     t0 = time.perf_counter()
-    t_next = t0
+    # rejilla de plazos desde t0; TSC_CTRL_SCHED_POLICY=skip|catchup
+    policy = os.getenv("TSC_CTRL_SCHED_POLICY", "skip").strip().lower()
+    sched = DeadlineScheduler(period_s=period, policy=policy if policy in POLICIES else "skip")
+    sched.start(t0)
     # Control debug guard (set TSC_CTRL_DEBUG=1 to enable per-cycle debug prints)
     ctrl_debug = os.getenv("TSC_CTRL_DEBUG", "0") in ("1", "true", "True")
+    # lógica de un ciclo (compartida con la reproducción offline tools.replay_sim)
+    stepper = ControlStepper(
+        cfg,
+        extras,
+        period=period,
+        startup_gate_s=args.startup_gate_s,
+        hold_s=args.hold_s,
+        rise_per_s=args.rise_per_s,
+        fall_per_s=args.fall_per_s,
+        derive_speed=derive_speed,
+        emit_active_limit=bool(getattr(args, "emit_active_limit", False)),
+        verbose=True,
+        debug=ctrl_debug,
+    )
 
-    # Puntero para tail del bus (empezar desde el final si se pidió --start-events-from-end)
-    bus_pos = 0
-    try:
-        bus_pos = bus_path.stat().st_size if args.start_events_from_end else 0
-    except Exception:
-        bus_pos = 0
+    # Cursor del bus LUA (empezar desde el final si se pidió --start-events-from-end):
+    # handle abierto, lotes de líneas completas y JSON decodificado una sola vez
+    bus = BusCursor(bus_path, from_end=bool(args.start_events_from_end))
 
-    def _drain_bus_events(path: Path, pos: int):
-        if not path.exists():
-            return [], pos
+    def _drain_bus_events() -> list:
         try:
-            with path.open("r", encoding="utf-8", errors="ignore") as f:
-                f.seek(pos)
-                chunk = f.read()
-                pos = f.tell()
+            return bus.read_batch()
         except Exception:
-            return [], pos
-        evs = []
-        for ln in chunk.splitlines():
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                ev = json.loads(ln)
-            except Exception:
-                continue
-            evs.append(ev)
-        return evs, pos
+            return []
 
     while True:
         if args.duration and (time.perf_counter() - t0) >= float(args.duration):
@@ -892,16 +1296,28 @@ def main() -> None:
                 break
             except Exception:
                 break
-            if isinstance(ev, dict) and ev.get("type") == "getdata_next_limit":
-                kph = ev.get("kph") or ev.get("speed_kph") or ev.get("limit_kph")
-                dist = ev.get("dist_m") or ev.get("dist")
-                if kph is not None and dist is not None:
-                    next_limit_kph = float(kph)
-                    anchor_dist_m = max(0.0, float(dist))
-                    anchor_odom_m = None
+            stepper.on_event(ev)
 
         # 2) muestrear última fila de run.csv (fuente configurable)
-        if store is not None and not use_csv:
+        from_shm = False
+        if shm_reader is not None and not use_csv:
+            got = shm_reader.latest_since(last_shm_seq)
+            if got is not None:
+                last_shm_seq, row = got
+                shm_last_rx = time.perf_counter()
+                from_shm = True
+            elif time.perf_counter() - shm_last_rx < stale_data_threshold:
+                # canal vivo sin muestra nueva: esperar poco (sin tocar SQLite)
+                time.sleep(0.002)
+                continue
+            elif time.perf_counter() >= shm_retry_at:
+                # sin muestras: colector sin --shm o reiniciado (bloque nuevo)
+                shm_retry_at = time.perf_counter() + 1.0
+                if shm_reader.reopen():
+                    cur = shm_reader.latest_values()
+                    if cur is not None and cur[0] < last_shm_seq:
+                        last_shm_seq = 0  # bloque nuevo: la secuencia volvió a empezar
+        if store is not None and not use_csv and not from_shm:
             # Robustez: leer con detección de datos obsoletos y fallback
             try:
                 latest = store.latest_since(last_rowid)
@@ -960,433 +1376,19 @@ def main() -> None:
         if row is None:
             time.sleep(0.05)
             continue
-        t_wall = _to_float_loose(row.get("t_wall", ""))
-        odom_m = _to_float_loose(row.get("odom_m", ""))
-        # compat: speed_kph o v_kmh
-        v = row.get("speed_kph") or row.get("v_kmh") or row.get("SpeedometerKPH")
-        speed_kph = _to_float_loose(v)
-        # EMA con tau ~0.4 s => alpha ≈ dt / (tau + dt)
-        dt_real = (
-            period  # por defecto, pero si t_wall es confiable, usar diferencia real
-        )
-        if last_t_wall_written is not None and t_wall > last_t_wall_written:
-            dt_real = t_wall - last_t_wall_written
-        tau = 0.4
-        alpha = dt_real / (tau + dt_real) if dt_real > 0 else 0.2
-        speed_ema = (
-            speed_kph
-            if speed_ema is None
-            else (1 - alpha) * speed_ema + alpha * speed_kph
-        )
-        speed_for_target = speed_ema
-
-        # --- suavizado ligero para control (no para ocultar errores de sensado) ---
-        alpha = 0.25  # 0<alpha<=1; menor = más suave
-        if v_filt_kph_state is None:
-            v_filt_kph_state = (
-                float(speed_kph)
-                if (speed_kph is not None and not math.isnan(speed_kph))
-                else 0.0
-            )
-        else:
-            sf = (
-                float(speed_kph)
-                if (speed_kph is not None and not math.isnan(speed_kph))
-                else v_filt_kph_state
-            )
-            v_filt_kph_state = alpha * sf + (1 - alpha) * v_filt_kph_state
-        v_for_control_kph = v_filt_kph_state
-
-        if any(math.isnan(x) for x in (t_wall, odom_m)):
-            time.sleep(0.05)
-            continue
-        # Derivar velocidad si falta y está habilitado
-        if (math.isnan(speed_kph) or speed_kph is None) and derive_speed:
-            if prev_t_wall is not None and prev_odom_m is not None:
-                dt = max(1e-3, t_wall - prev_t_wall)
-                dv = odom_m - prev_odom_m
-                speed_kph = max(0.0, (dv / dt) * 3.6)
+        ts_ctrl_read = latency.now()
+        row_out = stepper.step(row, ts_ctrl_read, drain=_drain_bus_events)
+        if row_out is None:
+            if stepper.skip == "dup":
+                sched.wait()
             else:
-                # aún no podemos derivar (primera muestra): guardamos y esperamos la siguiente
-                prev_t_wall, prev_odom_m = t_wall, odom_m
-                # mantener la temporización del bucle
                 time.sleep(0.05)
-                continue
-        prev_t_wall, prev_odom_m = t_wall, odom_m
-
-        # --- LEER EVENTOS DEL BUS (getdata_next_limit) ---
-        evs, bus_pos = _drain_bus_events(bus_path, bus_pos)
-        for ev in evs:
-            et = ev.get("type")
-            if et == "getdata_next_limit":
-                kph = ev.get("kph") or ev.get("speed_kph") or ev.get("limit_kph")
-                dist = ev.get("dist_m") or ev.get("dist")
-                if kph is not None and dist is not None:
-                    next_limit_kph = float(kph)
-                    anchor_dist_m = float(dist)
-                    anchor_odom_m = odom_m
-                    try:
-                        print(
-                            f"[control] next_limit={next_limit_kph} kph  dist≈{anchor_dist_m} m"
-                        )
-                    except Exception:
-                        pass
-        if math.isnan(speed_kph):
-            time.sleep(0.05)
             continue
 
-        # Evitar duplicados: si no hay nueva muestra, no escribimos
-        if last_t_wall_written is not None and abs(t_wall - last_t_wall_written) < 1e-6:
-            t_next += period
-            delay = t_next - time.perf_counter()
-            if delay > 0:
-                time.sleep(delay)
-            else:
-                t_next = time.perf_counter()
-            continue
-
-        # 3) calcular dist_next_limit_m por odómetro
-        if next_limit_kph is None or anchor_dist_m is None:
-            dist_next_limit_m = None
-        else:
-            if anchor_odom_m is None:
-                anchor_odom_m = odom_m
-            traveled = max(0.0, odom_m - anchor_odom_m)
-            dist_raw = max(0.0, anchor_dist_m - traveled)
-            if (
-                last_limit_kph is not None
-                and next_limit_kph == last_limit_kph
-                and last_dist_m is not None
-                and dist_raw > last_dist_m
-            ):
-                dist_next_limit_m = last_dist_m
-            else:
-                dist_next_limit_m = dist_raw
-            last_dist_m = dist_next_limit_m
-            last_limit_kph = next_limit_kph
-
-        # --- FSM de límite activo -------------------------------------------------
-        # Si cruzamos la baliza del próximo límite (dist pasa de >0 a <=0), el
-        # límite activo pasa a ser el del próximo.
-        try:
-            dn = None if dist_next_limit_m is None else float(dist_next_limit_m)
-            nl = None if next_limit_kph is None else float(next_limit_kph)
-        except Exception:
-            dn, nl = None, None
-        if _last_dist_next_m is not None and dn is not None:
-            if _last_dist_next_m > 0.0 and dn <= 0.0 and nl is not None:
-                _active_limit_kph = nl
-        _last_dist_next_m = dn
-
-        # 3.1) Si ya estamos "en" el hito (distances cercanas a 0), promover el límite a 'activo'
-        if dist_next_limit_m is not None and dist_next_limit_m <= 2.0:
-            try:
-                # promover a variable de módulo persistente
-                _active_limit_kph = (
-                    float(next_limit_kph)
-                    if next_limit_kph is not None
-                    else _active_limit_kph
-                )
-            except Exception:
-                pass
-            # limpiar el próximo límite y su anclaje
-            next_limit_kph = None
-            anchor_dist_m = None
-            anchor_odom_m = None
-            dist_next_limit_m = None
-            last_dist_m = None
-            last_limit_kph = None
-
-        # --- compuerta de arranque: sin límites válidos, no frenar ---
-        # inicializar start_t_wall la primera vez que tengamos t_wall válido
-        if start_t_wall is None:
-            start_t_wall = float(t_wall)
-        t_since = float(t_wall) - float(start_t_wall)
-        limits_valid = (
-            active_limit_kph is not None and not math.isnan(float(active_limit_kph))
-        ) or (next_limit_kph is not None and dist_next_limit_m is not None)
-        # compuerta de arranque: puede sobreescribirse por CLI
-        startup_gate_s = (
-            float(args.startup_gate_s) if args.startup_gate_s is not None else 4.0
-        )
-        control_ready = (t_since >= startup_gate_s) and bool(limits_valid)
-
-        # 4) objetivo y PID (lógica 'approach' conservadora basada en distancia física)
-        # Resolver parámetros físicos y de perfil (compatibilidad con nombres antiguos)
-        v_margin_kph = float(
-            getattr(cfg, "v_margin_kph", getattr(cfg, "margin_kph", 3.0))
-        )
-        a_service = float(
-            getattr(cfg, "a_service_mps2", getattr(cfg, "max_service_decel", 0.7))
-        )
-        t_react = float(getattr(cfg, "t_react_s", getattr(cfg, "reaction_time_s", 0.6)))
-        margin_m = float(
-            extras.get("margin_m", 0.0) if isinstance(extras, dict) else 0.0
-        )
-
-        # Crucero por defecto: si hay límite activo, lo usamos con margen; si no, mantenemos velocidad actual
-        cruise_kph = speed_kph
-        if _active_limit_kph is not None:
-            cruise_kph = max(0.0, float(_active_limit_kph) - v_margin_kph)
-
-        target_next_kph = None
-        if next_limit_kph is not None:
-            target_next_kph = max(0.0, float(next_limit_kph) - v_margin_kph)
-
-        if next_limit_kph is None or dist_next_limit_m is None:
-            # No hay siguiente límite -> mantén crucero del límite actual o velocidad actual
-            v_tgt = cruise_kph
-            phase = (
-                "CRUISE"
-                if (speed_kph is not None and v_tgt >= speed_kph - 0.1)
-                else "COAST"
-            )
-            approach_active = False
-        else:
-            # Distancia que necesitamos para llegar a target_next_kph con seguridad
-            # Asegurar tipos válidos
-            v_use = float(
-                v_for_control_kph
-                if v_for_control_kph is not None
-                else (speed_kph if speed_kph is not None else 0.0)
-            )
-            tgt = float(target_next_kph if target_next_kph is not None else 0.0)
-            d_need = _brake_distance_m(v_use, tgt, a_service, t_react) + margin_m
-
-            # Histeresis para evitar oscilaciones (10%)
-            prev = approach_active
-            if dist_next_limit_m < d_need * 0.9:
-                approach = True
-            elif dist_next_limit_m > d_need * 1.1:
-                approach = False
-            else:
-                approach = prev
-            approach_active = approach
-
-            if approach:
-                v_tgt = target_next_kph if target_next_kph is not None else 0.0
-                phase = (
-                    "BRAKE"
-                    if (
-                        speed_kph is not None and v_tgt < speed_kph - cfg.coast_band_kph
-                    )
-                    else "COAST"
-                )
-            else:
-                v_tgt = cruise_kph
-                phase = (
-                    "CRUISE"
-                    if (speed_kph is not None and v_tgt >= speed_kph - 0.1)
-                    else "COAST"
-                )
-
-        # Failsafe: si algo devolviera NaN o None, usar velocidad actual
-        try:
-            if v_tgt is None or not (float(v_tgt) == float(v_tgt)):
-                raise ValueError
-        except Exception:
-            v_tgt = float(speed_kph) if (speed_kph is not None) else 0.0
-            phase = "CRUISE"
-
-        # SplitPID.update espera (error, dt); aquí error = v_tgt - speed_kph
-        # Asegurar que speed_kph y v_tgt son floats válidos
-        sp = (
-            float(speed_kph)
-            if (speed_kph is not None and not math.isnan(speed_kph))
-            else 0.0
-        )
-        tgt_err = float(v_tgt) - sp
-        pid_out = pid.update(tgt_err, period)
-        # Si el PID real devuelve una tupla (th, br), descomponer; si es float, usar como throttle y brake=0
-        if isinstance(pid_out, tuple) and len(pid_out) == 2:
-            th, br = pid_out
-        else:
-            th, br = pid_out, 0.0
-        # aplicar rate limiters
-        th = rl_th.step(th, period)
-        # overspeed guard (mínimo de freno) — aplicamos al próximo si existe, si no al activo
-        # overspeed_guard comparará contra next_limit_kph si está disponible, o bien contra _active_limit_kph
-        og = overspeed_guard(
-            float(speed_kph) if speed_kph is not None else 0.0,
-            (
-                float(next_limit_kph)
-                if next_limit_kph is not None
-                else (_active_limit_kph if _active_limit_kph is not None else 0.0)
-            ),
-        )
-
-        # 4.1) Guard FÍSICO por distancia (a_req > a_service -> pisar más freno)
-        try:
-            a_service = float(getattr(cfg, "a_service_mps2", 0.6))
-            if dist_next_limit_m is not None and next_limit_kph is not None:
-                v = max(0.0, float(speed_kph if speed_kph is not None else 0.0)) / 3.6
-                vlim = max(0.0, float(next_limit_kph)) / 3.6
-                d = max(1.0, float(dist_next_limit_m))  # evita div/0
-                a_req = max(0.0, (v * v - vlim * vlim) / (2.0 * d))
-                if a_req > 0.70 * a_service:
-                    phase = "BRAKE"
-                    # mapear (a_req / a_service) a mando de freno (0..1), con ganancia suave
-                    br = max(br, _map_a_req_to_brake(a_req, a_service))
-        except Exception:
-            pass
-        # decidir si hemos entrado en fase de frenada recientemente
-        just_entered_brake = (phase == "BRAKE" and last_phase != "BRAKE") or og > 0.0
-        if just_entered_brake:
-            rl_th.reset(0.0)
-            # reset suave del limitador con reenganche
-            jerk_br.reset(jerk_br.step(0.0, 1e-3))
-            th = 0.0
-        br = jerk_br.step(br, period)
-        # aplicar overspeed como piso
-        br = max(br, og)
-        if br > 0:
-            th = 0.0
-        last_phase = phase
-
-        # 5) registrar usando CSVLogger
-        row_out = {
-            "t_wall": float(t_wall),
-            "odom_m": float(odom_m),
-            "speed_kph": float(speed_kph),
-            "speed_filt_kph": float(v_for_control_kph),
-            "next_limit_kph": "" if next_limit_kph is None else float(next_limit_kph),
-            "next_limit_used_kph": (
-                "" if next_limit_kph is None else float(next_limit_kph)
-            ),
-            "cur_limit_used_kph": (
-                float(_active_limit_kph)
-                if _active_limit_kph is not None
-                else float("nan")
-            ),
-            "dist_next_limit_m": (
-                "" if dist_next_limit_m is None else float(dist_next_limit_m)
-            ),
-            "target_speed_kph": float(v_tgt),
-            "phase": phase,
-            "throttle": float(round(th, 3)),
-            "brake": float(round(br, 3)),
-            "control_ready": int(bool(control_ready)),
-        }
-        row_out["approach_active"] = int(bool(approach_active))
-        if getattr(args, "emit_active_limit", False):
-            row_out["active_limit_kph"] = (
-                _active_limit_kph if _active_limit_kph is not None else ""
-            )
-        # --- control de freno con histéresis + retención + rampa hacia "desired" ---
-        # desired_brake: lo que pide el PID/guard como mínimo efectivo
-        desired_brake = max(0.0, float(br))
-        # error respecto al objetivo (positivo => vamos "pasados")
-        err_kph = max(0.0, float(v_for_control_kph) - float(v_tgt))
-        on = _brake_on
-        # Schmitt (evita aleteo): enciende con >0.7 kph; apaga con <0.3 kph
-        if err_kph > 0.7:
-            on = True
-        elif err_kph < 0.3:
-            on = False
-        # Si el guard/phys pide freno, lo consideramos "on"
-        if desired_brake > 0.05:
-            on = True
-        # no frenar en crucero si no estamos en aproximación y vamos por debajo de cruise + 0.3
-        # pero no cancelar el encendido si un guard físico/por distancia ya pide freno
-        if desired_brake <= 0.05 and (
-            not approach_active
-            and float(v_for_control_kph) <= (float(cruise_kph) + 0.3)
-        ):
-            on = False
-        # compuerta de arranque: hasta que el control esté "ready" NO se permite
-        # frenar por control, pero si un guard físico/por distancia ya pide freno
-        # (desired_brake > 0.05) lo permitimos. Esto evita que la compuerta inicial
-        # suprima órdenes de emergencia o guardias físicos.
-        if not bool(control_ready) and desired_brake <= 0.05:
-            on = False
-
-        now = float(row_out["t_wall"])
-        hold_s = float(args.hold_s) if args.hold_s is not None else 0.5
-        hold_until = _brake_hold_until
-        if on:
-            # al encender, garantizamos 0.5 s de retención mínima
-            hold_until = max(hold_until, now + hold_s)
-        _brake_hold_until = hold_until
-        if now < hold_until:
-            on = True
-        _brake_on = on
-
-        # rampa suave de mando hacia el objetivo (desired si on, 0 si off)
-        brake_cmd_local = _brake_cmd
-        # Proteger contra _last_t_for_brake no inicializado o mezcla de orígenes de tiempo
-        # Si _last_t_for_brake <= 0 (valor inicial) o la diferencia es irracionalmente grande,
-        # usamos el periodo de control como fallback para evitar saltos gigantes en la rampa.
-        try:
-            if _last_t_for_brake is None or _last_t_for_brake <= 0.0:
-                dt_br = period
-            else:
-                raw_dt = now - _last_t_for_brake
-                # Si raw_dt es <=0 (muestras fuera de orden) o excesivamente grande (>10s), clamp
-                if raw_dt <= 0.0 or raw_dt > 10.0:
-                    dt_br = period
-                else:
-                    dt_br = raw_dt
-        except Exception:
-            dt_br = period
-        dt_br = max(1e-3, float(dt_br))
-        _last_t_for_brake = now
-        rise_per_s = float(args.rise_per_s) if args.rise_per_s is not None else 1.2
-        fall_per_s = float(args.fall_per_s) if args.fall_per_s is not None else 2.0
-        target_brake = desired_brake if on else 0.0
-        if ctrl_debug:
-            try:
-                print(
-                    f"[CTRL-DBG] t={now:.3f} err_kph={err_kph:.3f} "
-                    f"desired_brake(before_ramp)={desired_brake:.3f} on={on}"
-                )
-            except Exception:
-                pass
-        delta = target_brake - brake_cmd_local
-        if delta >= 0.0:
-            brake_cmd_local = min(1.0, brake_cmd_local + min(delta, rise_per_s * dt_br))
-        else:
-            brake_cmd_local = max(
-                0.0, brake_cmd_local + max(delta, -fall_per_s * dt_br)
-            )
-        if ctrl_debug:
-            try:
-                print(
-                    f"[CTRL-DBG] t={now:.3f} brake_cmd(after_ramp)={brake_cmd_local:.3f} "
-                    f"dt_br={dt_br:.3f}"
-                )
-            except Exception:
-                pass
-        # Trazas compactas por ciclo para diagnóstico (JSONL en data/ctrl_cycle.log)
-        if ctrl_debug:
-            try:
-                cycle = {
-                    "t_wall": now,
-                    "err_kph": float(err_kph),
-                    "desired_brake": float(desired_brake),
-                    "on": bool(on),
-                    "approach_active": bool(approach_active),
-                    "v_for_control_kph": float(v_for_control_kph),
-                    "cruise_kph": float(cruise_kph),
-                    "control_ready": bool(control_ready),
-                    "hold_until": float(_brake_hold_until),
-                    "last_t_for_brake": float(_last_t_for_brake),
-                    "dt_br": float(dt_br),
-                    "brake_cmd_after": float(brake_cmd_local),
-                }
-                Path("data").mkdir(parents=True, exist_ok=True)
-                with Path("data/ctrl_cycle.log").open("a", encoding="utf-8") as _f:
-                    _f.write(json.dumps(cycle) + "\n")
-            except Exception:
-                pass
-        _brake_cmd = brake_cmd_local
-
-        # aplicar en modo brake (la IA no toca throttle en brake/advisory)
-        row_out["throttle"] = 0.0
-        row_out["brake"] = float(round(brake_cmd_local, 3))
-
+        latency.stamp(row_out, "decision")
         # === Envío condicionado por el modo ===
-        throttle_cmd = th if mode_guard.mode == "full" else 0.0
-        brake_cmd = brake_cmd_local
+        throttle_cmd = stepper.throttle_plan if mode_guard.mode == "full" else 0.0
+        brake_cmd = stepper.brake_cmd
         t_send, b_send = mode_guard.clamp_outputs(throttle_cmd, brake_cmd)
         # RD: usa primero el provisto por --rd/TSC_RD; si no, intenta escaneo en locals/globals
         if rd_static is not None:
@@ -1408,7 +1410,9 @@ def main() -> None:
                     )
                 except Exception:
                     pass
+            latency.stamp(row_out, "rd_send")
             thr_ok, brk_ok, thr_m, brk_m = send_to_rd(rd_obj, t_send, b_send)
+            latency.stamp(row_out, "rd_ack")
             debug_trace(
                 debug_on,
                 f"RD={rd_name} mode={mode_guard.mode} "
@@ -1417,15 +1421,15 @@ def main() -> None:
             )
         # log CSV (PLAN): se mantiene igual, independientemente del modo de envío
         writer.write_row(row_out)
-        last_t_wall_written = t_wall
 
-        # 6) temporización de bucle
-        t_next += period
-        delay = t_next - time.perf_counter()
-        if delay > 0:
-            time.sleep(delay)
-        else:
-            t_next = time.perf_counter()
+        # 6) temporización de bucle (plazos absolutos, sin deriva)
+        sched.wait()
+
+    st = sched.stats
+    print(
+        f"[control] ciclos={st['cycles']} overruns={st['overruns']} "
+        f"saltados={st['skipped']} jitter_max={st['jitter_max_s'] * 1000:.1f} ms"
+    )
 
 
 if __name__ == "__main__":
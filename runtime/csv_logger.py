@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import csv
 import os
+import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import IO, Any, Dict, Iterable, List, Optional, Sequence
 
 
 class CSVLogger:
@@ -18,6 +19,17 @@ class CSVLogger:
     fichero entero cuando aparecen columnas nuevas (para evitar errores
     de bloqueo en Windows). Si aparece una fila con columnas no listadas
     en la cabecera, las columnas extra se ignoran al escribir.
+
+    Modos de escritura:
+      - ``persistent=False`` (por defecto): abre y cierra el fichero en cada
+        fila. Es lo más seguro en Windows si otra herramienta rota/mueve el CSV.
+      - ``persistent=True``: mantiene el handle abierto con un buffer de
+        ``buffering`` bytes y vuelca a disco cada ``flush_rows`` filas, cada
+        ``flush_s`` segundos o con ``flush()``/``close()``. Si el fichero
+        desaparece (rotado), se reabre con cabecera en el siguiente volcado.
+
+    Las filas se escriben como tuplas en el orden de ``fieldnames``;
+    ``write_values`` acepta tuplas ya ordenadas y evita construir el dict.
     """
 
     def __init__(
@@ -25,6 +37,10 @@ class CSVLogger:
         path: str | os.PathLike,
         delimiter: str = ";",
         base_order: Optional[Iterable[str]] = None,
+        persistent: bool = False,
+        flush_rows: int = 50,
+        flush_s: float = 1.0,
+        buffering: int = 64 * 1024,
     ) -> None:
         self.path = Path(path).resolve()
         self.delimiter = delimiter
@@ -32,68 +48,143 @@ class CSVLogger:
         self._base_order: List[str] = list(
             dict.fromkeys([str(x) for x in (base_order or [])])
         )
+        self.persistent = bool(persistent)
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_s = float(flush_s)
+        self.buffering = int(buffering)
+        self._fh: Optional[IO[str]] = None
+        self._writer: Any = None
+        self._pending = 0
+        self._flush_deadline = 0.0
         # prepare dir
         if self.path.parent:
             os.makedirs(self.path.parent, exist_ok=True)
 
-    def init_with_fields(self, fields: Iterable[str]) -> None:
-        """Establece la cabecera (superset conocido) y crea/abre el archivo en modo append."""
-        names = [str(x) for x in fields]
-        uniq = list(dict.fromkeys(names))
+    @classmethod
+    def from_env(
+        cls,
+        path: str | os.PathLike,
+        delimiter: str = ";",
+        base_order: Optional[Iterable[str]] = None,
+        flush_rows: int = 50,
+        flush_s: float = 1.0,
+    ) -> "CSVLogger":
+        """Construye el logger según ``TSC_CSV_MODE`` (``reopen`` por defecto, o
+        ``persistent`` como opción), ``TSC_CSV_FLUSH_ROWS`` y ``TSC_CSV_FLUSH_MS``;
+        los argumentos son los valores por defecto."""
+        mode = os.environ.get("TSC_CSV_MODE", "reopen").strip().lower()
+        try:
+            flush_rows = int(os.environ.get("TSC_CSV_FLUSH_ROWS", flush_rows))
+        except ValueError:
+            pass
+        try:
+            flush_s = float(os.environ["TSC_CSV_FLUSH_MS"]) / 1000.0
+        except (KeyError, ValueError):
+            pass
+        return cls(
+            path,
+            delimiter=delimiter,
+            base_order=base_order,
+            persistent=(mode == "persistent"),
+            flush_rows=flush_rows,
+            flush_s=flush_s,
+        )
+
+    def _order(self, names: Iterable[str]) -> List[str]:
+        uniq = list(dict.fromkeys(str(x) for x in names))
         prefix = [c for c in self._base_order if c in uniq]
         rest = [c for c in uniq if c not in self._base_order]
-        self.fieldnames = prefix + rest
-        # if file does not exist or empty, write header
-        if not self.path.exists() or self.path.stat().st_size == 0:
-            # mypy/ruff: asegurar que fieldnames no es None
-            fieldnames = self.fieldnames
-            assert fieldnames is not None
+        return prefix + rest
+
+    def _needs_header(self) -> bool:
+        return not self.path.exists() or self.path.stat().st_size == 0
+
+    def _open(self) -> Any:
+        """Handle persistente (lazy); escribe cabecera si el fichero está vacío."""
+        if self._writer is None:
+            header = self._needs_header()
+            self._fh = self.path.open(
+                "a", newline="", encoding="utf-8", buffering=self.buffering
+            )
+            self._writer = csv.writer(self._fh, delimiter=self.delimiter)
+            if header and self.fieldnames is not None:
+                self._writer.writerow(self.fieldnames)
+            self._flush_deadline = time.monotonic() + self.flush_s
+        return self._writer
+
+    def _write_header(self) -> None:
+        fieldnames = self.fieldnames
+        assert fieldnames is not None
+        if self.persistent:
+            # _open escribe la cabecera al crear el handle
+            self._open()
+            return
+        if self._needs_header():
             with self.path.open("a", newline="", encoding="utf-8") as f:
-                w = csv.DictWriter(
-                    f,
-                    fieldnames=fieldnames,
-                    delimiter=self.delimiter,
-                    extrasaction="ignore",
-                )
-                w.writeheader()
+                csv.writer(f, delimiter=self.delimiter).writerow(fieldnames)
+
+    def init_with_fields(self, fields: Iterable[str]) -> None:
+        """Establece la cabecera (superset conocido) y crea/abre el archivo en modo append."""
+        self.fieldnames = self._order(fields)
+        self._write_header()
 
     def write_row(self, row: Dict[str, Any]) -> None:
         """Escribe una fila usando solo las columnas conocidas (si faltan, se ignoran)."""
         if self.fieldnames is None:
             # Derivar cabecera mínima de la fila respetando base_order
-            keys_in = list(dict.fromkeys(list(row.keys())))
-            prefix = [c for c in self._base_order if c in keys_in]
-            rest = [c for c in keys_in if c not in self._base_order]
-            self.fieldnames = prefix + rest
-            # escribir header si archivo vacío
-            if not self.path.exists() or self.path.stat().st_size == 0:
-                fieldnames = self.fieldnames
-                assert fieldnames is not None
-                with self.path.open("a", newline="", encoding="utf-8") as f:
-                    w = csv.DictWriter(
-                        f,
-                        fieldnames=fieldnames,
-                        delimiter=self.delimiter,
-                        extrasaction="ignore",
-                    )
-                    w.writeheader()
-
-        # Open in append mode and write row mapping only known fields
-        assert self.fieldnames is not None
-        fieldnames = self.fieldnames
-        with self.path.open("a", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(
-                f,
-                fieldnames=fieldnames,
-                delimiter=self.delimiter,
-                extrasaction="ignore",
-            )
-            out = {k: row.get(k, "") for k in self.fieldnames}
-            w.writerow(out)
+            self.fieldnames = self._order(row.keys())
+            self._write_header()
+        get = row.get
+        self.write_values(tuple(get(k, "") for k in self.fieldnames))
+
+    def write_values(self, values: Sequence[Any]) -> None:
+        """Escribe una fila ya ordenada según ``fieldnames`` (ruta rápida)."""
+        assert self.fieldnames is not None, "init_with_fields() antes de write_values()"
+        if not self.persistent:
+            with self.path.open("a", newline="", encoding="utf-8") as f:
+                csv.writer(f, delimiter=self.delimiter).writerow(values)
+            return
+        self._open().writerow(values)
+        self._pending += 1
+        if self._pending >= self.flush_rows or time.monotonic() >= self._flush_deadline:
+            self.flush()
+
+    def flush(self) -> None:
+        """Vuelca el buffer a disco (modo persistente)."""
+        fh = self._fh
+        if fh is None:
+            return
+        try:
+            fh.flush()
+        finally:
+            self._pending = 0
+            self._flush_deadline = time.monotonic() + self.flush_s
+        # si el fichero fue rotado/borrado, reabrir en la siguiente escritura
+        if not self.path.exists():
+            self._close_handle()
+
+    def _close_handle(self) -> None:
+        fh, self._fh, self._writer = self._fh, None, None
+        if fh is not None:
+            try:
+                fh.close()
+            except Exception:
+                pass
 
     def close(self) -> None:
-        # No persistent handle to cerrar; placeholder para compatibilidad
-        return
+        if self._fh is not None:
+            try:
+                self._fh.flush()
+            except Exception:
+                pass
+        self._close_handle()
+        self._pending = 0
+
+    def __enter__(self) -> "CSVLogger":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
 
 
 # Compatibilidad hacia atrás: algunos módulos importan `CsvLogger`
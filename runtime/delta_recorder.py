@@ -0,0 +1,195 @@
+"""
+Grabación por cambios (delta) de la telemetría del colector.
+
+La mayoría de columnas de ``RDClient.stream()`` (luces, puertas, lámparas
+PZB, combustible...) casi nunca cambian entre ticks. En modo delta:
+
+- cada ``keyframe_s`` segundos se escribe un *keyframe* con todas las
+  columnas (``keyframe=1``);
+- entre keyframes, cada fila (``keyframe=0``) solo lleva las columnas que
+  cambiaron más que su banda muerta respecto al último valor ESCRITO (como
+  ``Listener._main_iteration`` compara con ``previous_data``), más las de
+  ``ALWAYS_FIELDS`` que necesita el control loop al leer la última fila.
+
+Una celda vacía en una fila delta significa "sin cambios". ``reconstruct``
+(DataFrame) y ``DeltaDecoder`` (fila a fila) rehacen las filas densas; un
+valor que desaparece solo se refleja en el siguiente keyframe.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+KEYFRAME_COL = "keyframe"
+
+# Siempre presentes en todas las filas (lectura de la última fila / latencias)
+ALWAYS_FIELDS = (
+    "t_wall",
+    "odom_m",
+    "speed_kph",
+    "v_ms",
+    "v_kmh",
+    "ts_ingest",
+)
+
+# Bandas muertas por defecto (unidades de cada control); el resto: cualquier cambio
+DEFAULT_DEADBANDS: Dict[str, float] = {
+    "SpeedometerKPH": 0.05,
+    "SpeedometerMPH": 0.03,
+    "Speedometer": 0.05,
+    "heading": 1e-4,
+    "heading_deg": 0.01,
+    "gradient": 1e-3,
+    "fuel_level": 1e-3,
+    "BrakePipePressureBAR": 0.01,
+    "TrainBrakeCylinderPressureBAR": 0.01,
+    "Ammeter": 1.0,
+}
+
+
+def _empty(v: Any) -> bool:
+    return v is None or v == "" or (isinstance(v, float) and math.isnan(v))
+
+
+def parse_deadbands(spec: str) -> Dict[str, float]:
+    """``"SpeedometerKPH=0.1,Ammeter=5"`` -> dict (entradas inválidas se ignoran)."""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        name, sep, val = part.partition("=")
+        if not sep:
+            continue
+        try:
+            out[name.strip()] = float(val)
+        except ValueError:
+            continue
+    return out
+
+
+class DeltaEncoder:
+    """Convierte filas densas en keyframes + deltas para el CSV del colector.
+
+    Las claves de la fila que no están en ``fields`` pasan sin tocar.
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[str],
+        keyframe_s: float = 10.0,
+        deadbands: Optional[Mapping[str, float]] = None,
+        always: Iterable[str] = ALWAYS_FIELDS,
+    ) -> None:
+        self.fields = [f for f in fields if f != KEYFRAME_COL]
+        self.keyframe_s = float(keyframe_s)
+        self.deadbands: Dict[str, float] = {**DEFAULT_DEADBANDS, **dict(deadbands or {})}
+        self.always = frozenset(always)
+        self._last: Dict[str, Any] = {}
+        self._next_kf: Optional[float] = None
+        self.stats = {"rows": 0, "keyframes": 0, "cells": 0, "cells_dense": 0}
+
+    @classmethod
+    def from_env(cls, fields: Iterable[str]) -> "DeltaEncoder":
+        """``TSC_DELTA_KEYFRAME_S`` y ``TSC_DELTA_DEADBANDS`` (``col=banda,...``)."""
+        try:
+            kf = float(os.environ.get("TSC_DELTA_KEYFRAME_S", "10"))
+        except ValueError:
+            kf = 10.0
+        return cls(fields, keyframe_s=kf, deadbands=parse_deadbands(os.environ.get("TSC_DELTA_DEADBANDS", "")))
+
+    def force_keyframe(self) -> None:
+        self._next_kf = None
+
+    def _changed(self, name: str, new: Any, old: Any) -> bool:
+        if old is None:
+            return True
+        try:
+            return abs(float(new) - float(old)) > self.deadbands.get(name, 0.0)
+        except (TypeError, ValueError):
+            return new != old
+
+    def encode(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        try:
+            t = float(row.get("t_wall"))  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            t = math.nan
+        is_kf = self._next_kf is None or not (t < self._next_kf)
+        out: Dict[str, Any] = {k: v for k, v in row.items() if k not in self.fields}
+        last = self._last
+        cells = dense = 0
+        for name in self.fields:
+            v = row.get(name)
+            if _empty(v):
+                continue
+            dense += 1
+            if is_kf or name in self.always or self._changed(name, v, last.get(name)):
+                out[name] = v
+                last[name] = v
+                cells += 1
+        if is_kf:
+            self._next_kf = t + self.keyframe_s if t == t else None
+            self.stats["keyframes"] += 1
+        out[KEYFRAME_COL] = 1 if is_kf else 0
+        self.stats["rows"] += 1
+        self.stats["cells"] += cells
+        self.stats["cells_dense"] += dense
+        return out
+
+
+class DeltaDecoder:
+    """Reconstrucción fila a fila (p. ej. al seguir un CSV en vivo)."""
+
+    def __init__(self) -> None:
+        self._state: Dict[str, Any] = {}
+
+    def decode(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        kf = row.get(KEYFRAME_COL)
+        try:
+            is_kf = float(kf) > 0  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            is_kf = False
+        if is_kf:
+            self._state = {}
+        for k, v in row.items():
+            if k != KEYFRAME_COL and not _empty(v):
+                self._state[k] = v
+        return dict(self._state)
+
+
+def is_delta(columns: Iterable[str]) -> bool:
+    return KEYFRAME_COL in set(columns)
+
+
+def reconstruct(df: pd.DataFrame, keep_marker: bool = False) -> pd.DataFrame:
+    """Filas densas a partir de keyframes + deltas (sin marcador: se devuelve tal cual).
+
+    Cada celda vacía hereda el último valor de su columna dentro del mismo
+    tramo keyframe -> siguiente keyframe; las filas previas al primer
+    keyframe (fichero recortado) forman su propio tramo.
+    """
+    if KEYFRAME_COL not in df.columns:
+        return df
+    kf = pd.to_numeric(df[KEYFRAME_COL], errors="coerce").fillna(0).to_numpy() > 0
+    seg = np.cumsum(kf)
+    cols = [c for c in df.columns if c != KEYFRAME_COL]
+    out = df.copy()
+    if cols and len(out):
+        out[cols] = out[cols].groupby(seg).ffill()
+    if not keep_marker:
+        out = out.drop(columns=[KEYFRAME_COL])
+    return out
+
+
+__all__ = [
+    "ALWAYS_FIELDS",
+    "DEFAULT_DEADBANDS",
+    "DeltaDecoder",
+    "DeltaEncoder",
+    "KEYFRAME_COL",
+    "is_delta",
+    "parse_deadbands",
+    "reconstruct",
+]
@@ -1,21 +1,36 @@
 from __future__ import annotations
 
-import copy
-from typing import Any, Dict
+import os
+from typing import Any, Callable, Dict, Optional
 
 # Normaliza eventos crudos (LUA o heurísticas) a un modelo estable v1
+#
+# ``raw`` (el evento de origen aplanado) ya no se incrusta siempre: duplicaba
+# cada evento dentro de events.jsonl. ``TSC_EVT_RAW`` decide:
+#   - ``unknown`` (por defecto): solo para tipos sin manejador propio (custom...)
+#   - ``all``: siempre (comportamiento anterior)
+#   - ``none``: nunca
+
+RAW_MODES = ("unknown", "all", "none")
+RAW_MODE = os.environ.get("TSC_EVT_RAW", "unknown").strip().lower()
+if RAW_MODE not in RAW_MODES:
+    RAW_MODE = "unknown"
+
+Handler = Callable[[Dict[str, Any], Dict[str, Any]], None]
 
 
 def _flatten_lua_payload(e: Dict[str, Any]) -> Dict[str, Any]:
     """
     Si viene como {"type":"custom", "payload":{"type":"..."}}, lo aplanamos.
     Conserva campos sellados por el collector (p.ej., odom_m/t_wall).
+
+    Copia superficial (sin deepcopy): el resultado comparte los valores
+    anidados con el evento de origen; ni aquí ni en ``normalize`` se modifican.
     """
-    if str(e.get("type")) == "custom":
+    if e.get("type") == "custom":
         payload = e.get("payload")
         if isinstance(payload, dict) and "type" in payload:
-            merged = copy.deepcopy(e)
-            merged.pop("payload", None)
+            merged = {k: v for k, v in e.items() if k != "payload"}
             for k, v in payload.items():
                 if k in ("t_wall", "odom_m"):
                     continue
@@ -24,7 +39,61 @@ def _flatten_lua_payload(e: Dict[str, Any]) -> Dict[str, Any]:
     return e
 
 
-def normalize(evt: Dict[str, Any]) -> Dict[str, Any]:
+def _speed_limit_change(e: Dict[str, Any], out: Dict[str, Any]) -> None:
+    out["limit_prev_kmh"] = e.get("prev")
+    out["limit_next_kmh"] = e.get("next")
+    out["dist_est_m"] = e.get("dist")
+    meta_in = e.get("meta") or {}
+    prev_v = e.get("prev") or meta_in.get("from") or e.get("from")
+    next_v = e.get("next") or meta_in.get("to") or e.get("to")
+    if prev_v is not None:
+        out["meta"]["from"] = float(prev_v)
+    if next_v is not None:
+        out["meta"]["to"] = float(next_v)
+
+
+def _limit_reached(e: Dict[str, Any], out: Dict[str, Any]) -> None:
+    out["limit_kmh"] = e.get("limit_kmh")
+    out["dist_m_travelled"] = e.get("dist_m_travelled")
+    out["odom_m"] = e.get("odom_m")
+
+
+def _getdata_next_limit(e: Dict[str, Any], out: Dict[str, Any]) -> None:
+    # Probe desde GetData.txt con próximo límite y distancia
+    kph = e.get("kph")
+    dist = e.get("dist_m")
+    out["limit_next_kmh"] = kph
+    out["dist_est_m"] = dist
+    # Añade meta.to/meta.dist_m para consumidores
+    try:
+        if kph is not None:
+            out["meta"]["to"] = float(kph)
+        if dist is not None:
+            out["meta"]["dist_m"] = float(dist)
+    except Exception:
+        pass
+
+
+def _stop(e: Dict[str, Any], out: Dict[str, Any]) -> None:
+    out["station"] = e.get("station")
+
+
+def _marker_pass(e: Dict[str, Any], out: Dict[str, Any]) -> None:
+    out["marker"] = e.get("name")
+
+
+# Tabla de despacho: tipo -> rellena campos específicos sobre ``out``
+HANDLERS: Dict[str, Handler] = {
+    "speed_limit_change": _speed_limit_change,
+    "limit_reached": _limit_reached,
+    "getdata_next_limit": _getdata_next_limit,
+    "stop_begin": _stop,
+    "stop_end": _stop,
+    "marker_pass": _marker_pass,
+}
+
+
+def normalize(evt: Dict[str, Any], raw: Optional[str] = None) -> Dict[str, Any]:
     """
     Esquema destino (retrocompatible con consumidores actuales):
       - t_ingame: float|None (acepta time/t_ingame/t_game_h de origen)
@@ -33,10 +102,13 @@ def normalize(evt: Dict[str, Any]) -> Dict[str, Any]:
       - limit_reached: type, limit_kmh, dist_m_travelled, odom_m
       - stop_begin/stop_end: type, station
       - marker_pass: type, marker
-      - otros: type="custom", payload=evento original aplanado
+      - otros: type="custom", raw=evento original aplanado
+    ``raw`` (``unknown``|``all``|``none``) sobrescribe ``TSC_EVT_RAW``.
+    ``evt`` no se modifica.
     """
-    e = _flatten_lua_payload(dict(evt))
+    e = _flatten_lua_payload(evt)
     etype = str(e.get("type") or "custom")
+    handler = HANDLERS.get(etype)
 
     out: Dict[str, Any] = {
         "type": etype,
@@ -46,55 +118,19 @@ def normalize(evt: Dict[str, Any]) -> Dict[str, Any]:
         "odom_m": e.get("odom_m"),
         "t_wall": e.get("t_wall"),
         "meta": {},
-        "raw": e,
     }
+    mode = RAW_MODE if raw is None else raw
+    if mode == "all" or (mode == "unknown" and handler is None):
+        # copia superficial solo si ``e`` es el propio evento de entrada
+        out["raw"] = dict(e) if e is evt else e
+    if handler is not None:
+        handler(e, out)
+    return out
 
-    if etype == "speed_limit_change":
-        out.update(
-            {
-                "type": "speed_limit_change",
-                "limit_prev_kmh": e.get("prev"),
-                "limit_next_kmh": e.get("next"),
-                "dist_est_m": e.get("dist"),
-            }
-        )
-        prev_v = e.get("prev") or (e.get("meta") or {}).get("from") or e.get("from")
-        next_v = e.get("next") or (e.get("meta") or {}).get("to") or e.get("to")
-        if prev_v is not None:
-            out["meta"]["from"] = float(prev_v)
-        if next_v is not None:
-            out["meta"]["to"] = float(next_v)
-    elif etype == "limit_reached":
-        out.update(
-            {
-                "type": "limit_reached",
-                "limit_kmh": e.get("limit_kmh"),
-                "dist_m_travelled": e.get("dist_m_travelled"),
-                "odom_m": e.get("odom_m"),
-            }
-        )
-    elif etype == "getdata_next_limit":
-        # Probe desde GetData.txt con próximo límite y distancia
-        out.update(
-            {
-                "type": "getdata_next_limit",
-                "limit_next_kmh": e.get("kph"),
-                "dist_est_m": e.get("dist_m"),
-            }
-        )
-        # Añade meta.to/meta.dist_m para consumidores
-        try:
-            kph = e.get("kph")
-            dist = e.get("dist_m")
-            if kph is not None:
-                out["meta"]["to"] = float(kph)
-            if dist is not None:
-                out["meta"]["dist_m"] = float(dist)
-        except Exception:
-            pass
-    elif etype in ("stop_begin", "stop_end"):
-        out.update({"station": e.get("station")})
-    elif etype == "marker_pass":
-        out.update({"marker": e.get("name")})
 
-    return out
+def normalize_lean(evt: Dict[str, Any]) -> Dict[str, Any]:
+    """``normalize`` sin ``raw`` (para consumidores en memoria)."""
+    return normalize(evt, raw="none")
+
+
+__all__ = ["HANDLERS", "RAW_MODE", "RAW_MODES", "normalize", "normalize_lean"]
@@ -0,0 +1,112 @@
+"""
+Sellos de latencia por etapa a lo largo de la cadena
+
+    GetData -> bus LUA -> colector -> almacenamiento -> control -> RailDriver
+
+Cada etapa estampa ``ts_<etapa>`` con ``time.perf_counter()``: monótono y
+común a todos los procesos de la máquina (QueryPerformanceCounter en
+Windows, CLOCK_MONOTONIC en Linux), así que los sellos de procesos distintos
+se pueden restar. No es una hora: solo sirve para diferencias.
+
+Dos cadenas comparten etapas:
+  - eventos:    bridge_read -> bus_write -> ingest -> write  (events.jsonl; ``write``
+    lo pone el hilo de ``AsyncEventWriter`` al escribir el lote, tras la espera
+    en cola; un sello posterior a la escritura no cabe en la propia línea)
+  - telemetría: ingest -> commit -> ctrl_read -> decision -> rd_send -> rd_ack
+    (run.csv aporta ingest; commit sale de la tabla ``commits`` de run.db, sellada
+    por RunStore tras el COMMIT real; la salida del control el resto, unidas por t_wall)
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence
+
+import numpy as np
+
+STAGES = (
+    "bridge_read",  # getdata_bridge leyó GetData.txt
+    "bus_write",  # getdata_bridge escribió la línea en el bus
+    "ingest",  # colector: muestra RD leída / evento drenado del bus
+    "write",  # AsyncEventWriter: lote de eventos escrito en events.jsonl (sello previo al write)
+    "commit",  # RunStore: COMMIT de la fila en SQLite devuelto
+    "ctrl_read",  # control loop: muestra leída
+    "decision",  # control loop: freno/tracción calculados
+    "rd_send",  # control loop: antes de send_to_rd
+    "rd_ack",  # control loop: send_to_rd devolvió (RailDriver aceptó la orden)
+)
+COLUMNS = tuple("ts_" + s for s in STAGES)
+
+now = time.perf_counter
+
+
+def stamp(d: MutableMapping[str, Any], stage: str, t: Optional[float] = None) -> float:
+    """Escribe ``ts_<stage>`` en ``d`` (ahora, o ``t``) y lo devuelve."""
+    val = now() if t is None else float(t)
+    d["ts_" + stage] = val
+    return val
+
+
+def carry(src: Mapping[str, Any], dst: MutableMapping[str, Any]) -> None:
+    """Copia los sellos ``ts_*`` de ``src`` a ``dst`` sin pisar los existentes."""
+    for c in COLUMNS:
+        v = src.get(c)
+        if v is not None and c not in dst:
+            dst[c] = v
+
+
+def stage_latencies_ms(
+    table: Mapping[str, Sequence[Any]], stages: Iterable[str] = STAGES
+) -> Dict[str, np.ndarray]:
+    """Latencias (ms) entre etapas consecutivas presentes en ``table``.
+
+    ``table`` es columna -> valores (un DataFrame sirve). Si falta una etapa
+    intermedia se mide contra la siguiente que exista (``ingest->ctrl_read``).
+    Se añade ``total`` (primera -> última etapa de cada fila). Los pares con
+    algún NaN o diferencia negativa se descartan.
+    """
+    present = [s for s in stages if "ts_" + s in table]
+    cols = {s: np.asarray(table["ts_" + s], dtype=float) for s in present}
+    out: Dict[str, np.ndarray] = {}
+    for a, b in zip(present, present[1:]):
+        d = (cols[b] - cols[a]) * 1000.0
+        out[f"{a}->{b}"] = d[np.isfinite(d) & (d >= 0)]
+    if len(present) >= 2:
+        mat = np.column_stack([cols[s] for s in present])
+        first = np.full(mat.shape[0], np.nan)
+        last = np.full(mat.shape[0], np.nan)
+        for j in range(mat.shape[1]):
+            col = mat[:, j]
+            first = np.where(np.isnan(first), col, first)
+            last = np.where(np.isnan(col), last, col)
+        d = (last - first) * 1000.0
+        out["total"] = d[np.isfinite(d) & (d > 0)]
+    return out
+
+
+def summarize(
+    lat_ms: Mapping[str, np.ndarray], quantiles: Sequence[float] = (50, 95, 99)
+) -> List[Dict[str, Any]]:
+    """Tabla n/mean/pXX/max por tramo (filas listas para CSV/JSON)."""
+    rows: List[Dict[str, Any]] = []
+    for name, vals in lat_ms.items():
+        row: Dict[str, Any] = {"segment": name, "n": int(vals.size)}
+        if vals.size:
+            qs = np.percentile(vals, list(quantiles))
+            row["mean_ms"] = float(vals.mean())
+            for q, v in zip(quantiles, qs):
+                row[f"p{int(q)}_ms"] = float(v)
+            row["max_ms"] = float(vals.max())
+        rows.append(row)
+    return rows
+
+
+__all__ = [
+    "COLUMNS",
+    "STAGES",
+    "carry",
+    "now",
+    "stage_latencies_ms",
+    "stamp",
+    "summarize",
+]
@@ -0,0 +1,64 @@
+"""
+Conversión numérica tolerante compartida (antes duplicada en control_loop,
+migrate_run_csv_to_sqlite y varios tools).
+
+Acepta coma decimal (``"1.234,5"`` -> 1234.5), puntos de miles
+(``"1.234.567"`` -> 1234567) y comillas. ``''``, ``None`` o ``'nan'`` -> NaN.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any
+
+
+def sniff_delimiter(head: str) -> str:
+    """Delimitador más frecuente en una línea de cabecera (',' si no hay ninguno)."""
+    counts = {d: head.count(d) for d in (";", ",", "\t", "|")}
+    best = max(counts, key=lambda d: counts[d])
+    return best if counts[best] > 0 else ","
+
+
+def to_float_loose(val: Any) -> float:
+    """Escalar: string/número -> float; NaN si no es convertible."""
+    if val is None:
+        return float("nan")
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return float(val)
+    s = str(val).strip().strip('"').strip("'")
+    if s == "" or s.lower() == "nan":
+        return float("nan")
+    # si tiene coma, asumimos coma decimal; quitamos puntos como miles
+    if "," in s:
+        s = s.replace(".", "").replace(",", ".")
+    else:
+        # si hay >1 puntos, probablemente son miles -> quítalos
+        if s.count(".") > 1:
+            s = s.replace(".", "")
+    try:
+        return float(s)
+    except Exception:
+        return float("nan")
+
+
+def to_float_or_none(val: Any) -> float | None:
+    """Como ``to_float_loose`` pero devuelve ``None`` en lugar de NaN."""
+    x = to_float_loose(val)
+    return None if math.isnan(x) else x
+
+
+def to_float_loose_series(s: Any) -> Any:
+    """Versión vectorizada para ``pandas.Series`` (devuelve float64)."""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        return s.astype("float64")
+    txt = s.astype("string").str.strip().str.strip("\"'")
+    has_comma = txt.str.contains(",", regex=False).fillna(False)
+    many_dots = (txt.str.count(r"\.") > 1).fillna(False)
+    txt = txt.where(~(has_comma | many_dots), txt.str.replace(".", "", regex=False))
+    txt = txt.where(~has_comma, txt.str.replace(",", ".", regex=False))
+    return pd.to_numeric(txt, errors="coerce").astype("float64")
+
+
+__all__ = ["sniff_delimiter", "to_float_loose", "to_float_loose_series", "to_float_or_none"]
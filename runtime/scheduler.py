@@ -0,0 +1,126 @@
+"""
+Planificador periódico sin deriva, con plazos absolutos en ``perf_counter``.
+
+``time.sleep(period)`` tras el trabajo da una frecuencia real de
+``1/(period + trabajo)``; aquí el plazo ``k`` es ``t0 + k*period`` y se duerme
+solo lo que falta hasta él, así que la frecuencia media es la configurada.
+
+Si un ciclo se pasa de su plazo (overrun):
+  - ``policy="skip"`` (por defecto): se descartan los plazos perdidos y se
+    sigue en la rejilla original (siguiente plazo futuro). Sin ráfagas.
+  - ``policy="catchup"``: se ejecutan seguidos los ciclos atrasados (hasta
+    ``max_catchup``) para conservar el número total de muestras.
+
+``stats`` lleva ciclos, overruns, plazos saltados y el jitter (retraso del
+despertar respecto al plazo) medio/máximo; ``jitter_percentiles()`` da p50/p95/p99.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+POLICIES = ("skip", "catchup")
+
+
+class DeadlineScheduler:
+    def __init__(
+        self,
+        hz: Optional[float] = None,
+        period_s: Optional[float] = None,
+        policy: str = "skip",
+        max_catchup: int = 5,
+        jitter_window: int = 1024,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if period_s is None:
+            if not hz or hz <= 0:
+                raise ValueError("hz or period_s must be > 0")
+            period_s = 1.0 / float(hz)
+        if period_s <= 0:
+            raise ValueError("period_s must be > 0")
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.period = float(period_s)
+        self.policy = policy
+        self.max_catchup = max(0, int(max_catchup))
+        self._clock = clock
+        self._sleep = sleep
+        self._next: Optional[float] = None
+        self._jitter: Deque[float] = deque(maxlen=max(1, int(jitter_window)))
+        self.stats: Dict[str, Any] = {
+            "cycles": 0,
+            "overruns": 0,
+            "skipped": 0,
+            "jitter_mean_s": 0.0,
+            "jitter_max_s": 0.0,
+        }
+
+    @property
+    def hz(self) -> float:
+        return 1.0 / self.period
+
+    def start(self, now: Optional[float] = None) -> float:
+        """Fija el origen de la rejilla (primer plazo = ahora)."""
+        self._next = self._clock() if now is None else float(now)
+        return self._next
+
+    def reset(self) -> None:
+        """Reinicia la rejilla en el próximo ``wait()`` (p. ej. tras una pausa)."""
+        self._next = None
+
+    def wait(self) -> float:
+        """Duerme hasta el plazo siguiente y devuelve el retraso (s) del despertar.
+
+        La primera llamada arranca la rejilla y vuelve de inmediato.
+        """
+        if self._next is None:
+            self.start()
+            self.stats["cycles"] += 1
+            return 0.0
+        deadline = self._next + self.period
+        now = self._clock()
+        if now > deadline:
+            # overrun: el trabajo del ciclo se comió el plazo
+            self.stats["overruns"] += 1
+            missed = int((now - deadline) // self.period)
+            if self.policy == "catchup" and missed < self.max_catchup:
+                self._next = deadline  # ejecutar ya el atrasado, sin dormir
+            else:
+                # saltar a la rejilla: último plazo <= ahora
+                self.stats["skipped"] += missed
+                self._next = deadline + missed * self.period
+            late = now - self._next
+        else:
+            delay = deadline - now
+            if delay > 0:
+                self._sleep(delay)
+            self._next = deadline
+            late = max(0.0, self._clock() - deadline)
+        self._note(late)
+        return late
+
+    def _note(self, late: float) -> None:
+        st = self.stats
+        st["cycles"] += 1
+        self._jitter.append(late)
+        n = st["cycles"] - 1  # el primer ciclo no tiene jitter
+        st["jitter_mean_s"] += (late - st["jitter_mean_s"]) / max(1, n)
+        if late > st["jitter_max_s"]:
+            st["jitter_max_s"] = late
+
+    def jitter_percentiles(self) -> Dict[str, float]:
+        """p50/p95/p99 (s) del retraso de despertar sobre la ventana reciente."""
+        vals = sorted(self._jitter)
+        if not vals:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+        def q(p: float) -> float:
+            return vals[min(len(vals) - 1, int(round(p * (len(vals) - 1))))]
+
+        return {"p50": q(0.50), "p95": q(0.95), "p99": q(0.99)}
+
+
+__all__ = ["DeadlineScheduler", "POLICIES"]
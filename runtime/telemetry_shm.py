@@ -0,0 +1,281 @@
+"""
+Canal de telemetría en memoria compartida (colector -> control loop).
+
+Anillo de ``slots`` filas de float64 con disposición fija en un bloque
+``multiprocessing.shared_memory`` y un contador de secuencia por slot
+(seqlock). Un único escritor (el colector) publica cada fila; los lectores
+leen la más reciente sin locks ni syscalls, en microsegundos, en lugar de
+consultar SQLite o re-leer el CSV.
+
+Disposición (little-endian)::
+
+    0   magic b"TSHM" | version u32 | slots u32 | nfields u32 | names_len u32 | pad u32
+    24  write_seq u64                 (secuencia de la última fila completa)
+    32  nombres de columnas (JSON utf-8), alineado a 8
+    ..  slot[i] = seq u64 + nfields float64
+
+Protocolo del escritor para la fila ``n``: ``slot.seq = 2n-1`` (impar: en
+escritura), copia de valores, ``slot.seq = 2n``, ``write_seq = n``. El lector
+toma ``n = write_seq``, copia el slot ``n % slots`` y acepta la copia solo si
+``slot.seq`` vale ``2n`` antes y después; si no, reintenta.
+
+Solo valores numéricos: textos (provider/product/...) y ausentes van como NaN.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import struct
+import sys
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_NAME = "trainsim_telemetry"
+MAGIC = b"TSHM"
+VERSION = 1
+_HDR = struct.Struct("<4sIIIII")
+_SEQ_OFF = 24
+_NAMES_OFF = 32
+
+# Columnas que el control loop necesita siempre: van primero en el anillo
+CORE_FIELDS = ("t_wall", "odom_m", "speed_kph")
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _f64(x: Any) -> float:
+    if x is None or x == "":
+        return math.nan
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Abre un bloque existente sin que el resource_tracker lo borre al salir."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    shm = shared_memory.SharedMemory(name=name)
+    if sys.platform != "win32":  # pragma: no cover - depende de la plataforma
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        except Exception:
+            pass
+    return shm
+
+
+class _Ring:
+    """Vistas numpy sobre el bloque compartido."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, fields: List[str]) -> None:
+        self.shm = shm
+        self.slots = slots
+        self.fields = fields
+        names_len = len(json.dumps(fields).encode("utf-8"))
+        data_off = _NAMES_OFF + _align8(names_len)
+        slot_bytes = 8 * (1 + len(fields))
+        buf = shm.buf
+        self.write_seq = np.ndarray((1,), dtype="<u8", buffer=buf, offset=_SEQ_OFF)
+        self.slot_seq = np.ndarray(
+            (slots,), dtype="<u8", buffer=buf, offset=data_off, strides=(slot_bytes,)
+        )
+        self.values = np.ndarray(
+            (slots, len(fields)),
+            dtype="<f8",
+            buffer=buf,
+            offset=data_off + 8,
+            strides=(slot_bytes, 8),
+        )
+
+    @staticmethod
+    def size_for(slots: int, fields: List[str]) -> int:
+        names_len = len(json.dumps(fields).encode("utf-8"))
+        return _NAMES_OFF + _align8(names_len) + slots * 8 * (1 + len(fields))
+
+    def release(self) -> None:
+        # soltar las vistas antes de cerrar el bloque (si no, BufferError)
+        self.write_seq = self.slot_seq = self.values = None  # type: ignore[assignment]
+
+
+class TelemetryShmWriter:
+    """Publicador (un solo proceso escritor) de filas en el anillo compartido."""
+
+    def __init__(
+        self, fields: Iterable[str], name: str = DEFAULT_NAME, slots: int = 64
+    ) -> None:
+        cols = list(dict.fromkeys([*CORE_FIELDS, *(str(f) for f in fields)]))
+        self.fields = cols
+        self.name = name
+        self.slots = max(2, int(slots))
+        size = _Ring.size_for(self.slots, cols)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # bloque huérfano de una ejecución anterior: recrear con este esquema
+            old = _attach(name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        names = json.dumps(cols).encode("utf-8")
+        self.shm.buf[_NAMES_OFF:_NAMES_OFF + len(names)] = names
+        self._ring = _Ring(self.shm, self.slots, cols)
+        self._ring.write_seq[0] = 0
+        self._ring.slot_seq[:] = 0
+        # cabecera al final: un lector que vea el magic ya encuentra todo listo
+        self.shm.buf[:_HDR.size] = _HDR.pack(MAGIC, VERSION, self.slots, len(cols), len(names), 0)
+        self._seq = 0
+        self._buf = np.empty(len(cols), dtype="<f8")
+
+    def publish(self, row: Dict[str, Any]) -> int:
+        """Publica ``row`` (dict) y devuelve su número de secuencia."""
+        get = row.get
+        buf = self._buf
+        for i, c in enumerate(self.fields):
+            buf[i] = _f64(get(c))
+        return self.publish_values(buf)
+
+    def publish_values(self, values: Any) -> int:
+        """Publica valores ya ordenados según ``fields``."""
+        ring = self._ring
+        n = self._seq + 1
+        k = n % self.slots
+        ring.slot_seq[k] = 2 * n - 1
+        ring.values[k] = values
+        ring.slot_seq[k] = 2 * n
+        ring.write_seq[0] = n
+        self._seq = n
+        return n
+
+    def close(self, unlink: bool = True) -> None:
+        if self.shm is None:
+            return
+        self._ring.release()
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.shm = None  # type: ignore[assignment]
+
+    def __enter__(self) -> "TelemetryShmWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class TelemetryShmReader:
+    """Lector sin locks de la fila más reciente (se conecta de forma perezosa).
+
+    Misma interfaz que ``storage.TelemetryReader``: ``latest()`` y
+    ``latest_since(seq)`` -> ``(seq, fila)`` o ``None`` si no hay nada nuevo.
+    Si el bloque no existe (colector sin ``--shm``) devuelve ``None``: el
+    llamador decide el fallback (SQLite/CSV). Las columnas NaN (ausentes o de
+    texto) se omiten de la fila, como una celda vacía en el CSV.
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME, retries: int = 8) -> None:
+        self.name = name
+        self.retries = max(1, int(retries))
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self._ring: Optional[_Ring] = None
+        self.fields: List[str] = []
+        self.torn_reads = 0
+        self.last_seq = 0
+
+    def _connect(self) -> bool:
+        if self._ring is not None:
+            return True
+        try:
+            shm = _attach(self.name)
+        except (FileNotFoundError, OSError, ValueError):
+            return False
+        magic, version, slots, nfields, names_len, _ = _HDR.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            return False
+        fields = json.loads(bytes(shm.buf[_NAMES_OFF:_NAMES_OFF + names_len]).decode("utf-8"))
+        self.shm = shm
+        self.fields = list(fields)
+        self._ring = _Ring(shm, int(slots), self.fields)
+        return True
+
+    @property
+    def available(self) -> bool:
+        return self._connect()
+
+    def latest_values(self) -> Optional[Tuple[int, np.ndarray]]:
+        """``(seq, copia de los valores)`` de la última fila publicada."""
+        if not self._connect():
+            return None
+        ring = self._ring
+        assert ring is not None
+        for _ in range(self.retries):
+            n = int(ring.write_seq[0])
+            if n == 0:
+                return None
+            k = n % ring.slots
+            if int(ring.slot_seq[k]) != 2 * n:
+                # el escritor ya está reutilizando el slot: releer write_seq
+                self.torn_reads += 1
+                continue
+            vals = ring.values[k].copy()
+            if int(ring.slot_seq[k]) == 2 * n:
+                return n, vals
+            self.torn_reads += 1
+        return None
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        got = self.latest_values()
+        if got is None:
+            return None
+        self.last_seq = got[0]
+        return self._row(got[1])
+
+    def _row(self, vals: np.ndarray) -> Dict[str, float]:
+        # las columnas NaN (sin valor en la fila) no se devuelven
+        keep = (~np.isnan(vals)).tolist()
+        return {c: v for c, v, ok in zip(self.fields, vals.tolist(), keep) if ok}
+
+    def latest_since(self, last_seq: int = 0) -> Optional[Tuple[int, Dict[str, float]]]:
+        got = self.latest_values()
+        if got is None or got[0] <= int(last_seq):
+            return None
+        self.last_seq = got[0]
+        return got[0], self._row(got[1])
+
+    def reopen(self) -> bool:
+        """Vuelve a conectarse (el colector se reinició y creó otro bloque)."""
+        self.close()
+        return self._connect()
+
+    def close(self) -> None:
+        if self._ring is not None:
+            self._ring.release()
+            self._ring = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+
+    def __enter__(self) -> "TelemetryShmReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+__all__ = [
+    "CORE_FIELDS",
+    "DEFAULT_NAME",
+    "TelemetryShmReader",
+    "TelemetryShmWriter",
+]
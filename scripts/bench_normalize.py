@@ -0,0 +1,75 @@
+"""
+Microbenchmark de ``runtime.events_bus.normalize``.
+
+Mide µs/evento y bytes JSON/evento con una mezcla de eventos típica del bus
+(límites, probes de GetData, marcadores, paradas y custom anidados) para cada
+modo de ``raw`` (``all`` = comportamiento anterior, ``unknown``, ``none``).
+
+Usage (local):
+    python scripts/bench_normalize.py --n 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+if __package__ in (None, ""):
+    # ejecutado como script (python scripts/bench_normalize.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from runtime.events_bus import RAW_MODES, normalize  # noqa: E402
+
+
+def sample_events() -> List[Dict[str, Any]]:
+    base = {"time": 18.1, "lat": 51.11, "lon": 13.61, "odom_m": 1234.5, "t_wall": 1.7e9}
+    return [
+        {**base, "type": "speed_limit_change", "prev": 120, "next": 80, "dist": 950},
+        {**base, "type": "getdata_next_limit", "kph": 80.0, "dist_m": 812.0, "ts_bridge_read": 1.0},
+        {**base, "type": "marker_pass", "name": "Esig 12"},
+        {**base, "type": "stop_begin", "station": "Dresden Hbf"},
+        {
+            **base,
+            "type": "custom",
+            "payload": {"type": "pzb_event", "state": {"lamps": [1, 0, 0], "mode": "O"}},
+        },
+    ]
+
+
+def _legacy(evt: Dict[str, Any]) -> Dict[str, Any]:
+    # coste de referencia de la versión anterior: dict() + deepcopy de custom + raw siempre
+    e = dict(evt)
+    if e.get("type") == "custom":
+        e = copy.deepcopy(e)
+    return normalize(e, raw="all")
+
+
+def bench(n: int) -> List[Dict[str, Any]]:
+    evs = sample_events()
+    rows = []
+    cases = [("legacy", _legacy)] + [(m, lambda e, m=m: normalize(e, raw=m)) for m in RAW_MODES]
+    for name, fn in cases:
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(evs[i % len(evs)])
+        dt = time.perf_counter() - t0
+        size = sum(len(json.dumps(fn(e), ensure_ascii=False)) + 1 for e in evs) / len(evs)
+        rows.append({"mode": name, "us_per_event": dt / n * 1e6, "bytes_per_event": size})
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50000, help="Eventos por caso")
+    args = ap.parse_args()
+    for r in bench(args.n):
+        print(f"{r['mode']:>8}: {r['us_per_event']:6.2f} us/evento  {r['bytes_per_event']:6.0f} B/evento")
+
+
+if __name__ == "__main__":
+    main()
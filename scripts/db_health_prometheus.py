@@ -8,6 +8,8 @@ import time
 from pathlib import Path
 
 from storage import db_check
+from storage.wal_checkpoint import (default_status_path, read_status,
+                                    wal_size_bytes)
 
 
 def _read_control_status(path: str | Path) -> dict:
@@ -20,7 +22,11 @@ def _read_control_status(path: str | Path) -> dict:
         return {}
 
 
-def render_prom_file(db_path: str | Path, out_path: str | Path) -> None:
+def render_prom_file(
+    db_path: str | Path,
+    out_path: str | Path,
+    wal_status_path: str | Path | None = None,
+) -> None:
     out = Path(out_path)
     out.parent.mkdir(parents=True, exist_ok=True)
     res = db_check.run_all_checks(db_path)
@@ -52,6 +58,39 @@ def render_prom_file(db_path: str | Path, out_path: str | Path) -> None:
         )
         f.write("# TYPE trainsim_db_retry_count_total counter\n")
         f.write(f'trainsim_db_retry_count_total{{db="{db_path}"}} {retries}\n')
+        # WAL: tamaño actual (siempre) + métricas del WalCheckpointer si las hay
+        f.write("# HELP trainsim_db_wal_bytes Current size of the -wal file (bytes)\n")
+        f.write("# TYPE trainsim_db_wal_bytes gauge\n")
+        f.write(f'trainsim_db_wal_bytes{{db="{db_path}"}} {wal_size_bytes(db_path)}\n')
+        ws = read_status(wal_status_path or default_status_path(db_path))
+        wal_metrics = (
+            ("wal_bytes_max", "trainsim_db_wal_bytes_max", "gauge",
+             "Largest -wal size seen by the checkpointer (bytes)"),
+            ("checkpoints_total", "trainsim_db_wal_checkpoints_total", "counter",
+             "WAL checkpoints run by the checkpointer"),
+            ("busy_total", "trainsim_db_wal_checkpoint_busy_total", "counter",
+             "Checkpoints that could not complete because of readers/writers"),
+            ("last_duration_s", "trainsim_db_wal_checkpoint_duration_seconds", "gauge",
+             "Duration of the last checkpoint (s)"),
+            ("last_log_frames", "trainsim_db_wal_checkpoint_log_frames", "gauge",
+             "Frames in the WAL at the last checkpoint"),
+            ("last_checkpointed_frames", "trainsim_db_wal_checkpointed_frames", "gauge",
+             "Frames copied back to the DB at the last checkpoint"),
+            ("last_checkpoint_time", "trainsim_db_wal_last_checkpoint_timestamp", "gauge",
+             "Epoch timestamp of the last checkpoint (s)"),
+        )
+        for key, name, kind, help_txt in wal_metrics:
+            val = ws.get(key)
+            if val is None:
+                continue
+            # convertir antes de escribir: nunca una cabecera HELP/TYPE sin muestra
+            try:
+                num = float(val)
+            except (TypeError, ValueError):
+                continue
+            f.write(f"# HELP {name} {help_txt}\n")
+            f.write(f"# TYPE {name} {kind}\n")
+            f.write(f'{name}{{db="{db_path}"}} {num}\n')
         # Export control status metrics if available
         cs = _read_control_status(Path("data/control_status.json"))
         if cs:
@@ -162,8 +201,13 @@ def main(argv: list[str] | None = None) -> int:
         default="/var/lib/node_exporter/textfile_collector/trainsim_db.prom",
         help="Output file for Prometheus textfile collector",
     )
+    p.add_argument(
+        "--wal-status",
+        default=None,
+        help="JSON de métricas del WalCheckpointer (por defecto <db>.walstats.json)",
+    )
     args = p.parse_args(argv)
-    render_prom_file(args.db, args.out)
+    render_prom_file(args.db, args.out, args.wal_status)
     # exit code 0 always (metrics file reflects state)
     return 0
 
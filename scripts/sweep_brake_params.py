@@ -12,6 +12,9 @@ Notas:
 Uso:
   python scripts/sweep_brake_params.py
 
+Para barridos grandes, ``python -m tools.sweep`` evalúa las combinaciones con la
+reproducción offline (sin tiempo real), en paralelo y con caché.
+
 """
 
 import csv
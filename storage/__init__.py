@@ -8,7 +8,8 @@ This file is intentionally small — concrete implementations live in
 """
 
 from .run_store_sqlite import RunStore
+from .telemetry_reader import TelemetryReader, TelemetrySample
 
-__all__ = ["RunStore"]
+__all__ = ["RunStore", "TelemetryReader", "TelemetrySample"]
 # Storage package for TrainSimAI (SQLite/WAL)
 # Storage package for TrainSimAI
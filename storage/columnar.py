@@ -0,0 +1,184 @@
+"""
+Formato columnar binario para runs (alternativa rápida a run.csv).
+
+- ``<base>.f64``: filas de float64 little-endian, una tras otra (append-only).
+- ``<base>.f64.json``: esquema lateral con el orden de columnas y metadatos.
+
+Los valores no numéricos se guardan como NaN (los textos de sesión como
+provider/product/engine van una sola vez al esquema, en ``meta``). Una fila
+a medio escribir (corte de luz) se descarta al leer: solo se usan filas completas.
+Leer un run de horas es un ``np.memmap`` + ``reshape``: milisegundos.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+SUFFIX = ".f64"
+DTYPE = "<f8"
+
+# Campos de texto que no caben en float64: se guardan en el esquema
+TEXT_FIELDS = ("provider", "product", "engine")
+
+
+def schema_path(path: str | Path) -> Path:
+    p = Path(path)
+    return p.with_name(p.name + ".json")
+
+
+def columnar_path_for(csv_path: str | Path) -> Path:
+    """``data/runs/run.csv`` -> ``data/runs/run.f64``."""
+    return Path(csv_path).with_suffix(SUFFIX)
+
+
+def _to_f64(x: Any) -> float:
+    if x is None or x == "":
+        return float("nan")
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class ColumnarRunWriter:
+    """Escritor append-only de filas float64 con esquema lateral.
+
+    Las columnas se fijan al crear el fichero (``columns``; típicamente
+    ``RDClient.schema()``). Si el fichero ya existe con el mismo esquema, se
+    continúa añadiendo; si el esquema difiere, se rota a ``<base>_<n>.f64``.
+    Con ``fresh=True`` se empieza de cero (se descartan las filas previas): el
+    colector lo usa cuando el CSV que acompaña al ``.f64`` es nuevo (rotado).
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        columns: Iterable[str],
+        flush_rows: int = 50,
+        fresh: bool = False,
+    ) -> None:
+        cols = [str(c) for c in dict.fromkeys(columns) if c not in TEXT_FIELDS]
+        self.columns: List[str] = cols
+        self.flush_rows = max(1, int(flush_rows))
+        self.path = self._resolve_path(Path(path))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._buf = array("d")
+        self._pending = 0
+        self._meta: Dict[str, Any] = {}
+        self._fh = self.path.open("ab")
+        if fresh:
+            self._fh.truncate(0)
+        # descartar una fila incompleta al final antes de seguir añadiendo
+        row_bytes = 8 * max(1, len(self.columns))
+        size = self.path.stat().st_size
+        if size % row_bytes:
+            self._fh.truncate(size - size % row_bytes)
+        if fresh or not schema_path(self.path).exists():
+            self._write_schema()
+
+    def _resolve_path(self, path: Path) -> Path:
+        n = 1
+        candidate = path
+        while schema_path(candidate).exists():
+            try:
+                schema = json.loads(schema_path(candidate).read_text(encoding="utf-8"))
+            except Exception:
+                schema = {}
+            if schema.get("columns") == self.columns:
+                return candidate
+            candidate = path.with_name(f"{path.stem}_{n}{path.suffix}")
+            n += 1
+        return candidate
+
+    def _write_schema(self) -> None:
+        sp = schema_path(self.path)
+        tmp = sp.with_name(sp.name + ".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "version": FORMAT_VERSION,
+                    "dtype": DTYPE,
+                    "columns": self.columns,
+                    "meta": self._meta,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp, sp)
+
+    def write_row(self, row: Dict[str, Any]) -> None:
+        if not self._meta:
+            meta = {k: row.get(k) for k in TEXT_FIELDS if row.get(k) not in (None, "")}
+            if meta:
+                self._meta = {k: str(v) for k, v in meta.items()}
+                self._write_schema()
+        get = row.get
+        self._buf.extend(_to_f64(get(c)) for c in self.columns)
+        self._pending += 1
+        if self._pending >= self.flush_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self._buf.tofile(self._fh)  # type: ignore[arg-type]
+            self._buf = array("d")
+            self._pending = 0
+        self._fh.flush()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._fh.close()
+
+    def __enter__(self) -> "ColumnarRunWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def read_schema(path: str | Path) -> Dict[str, Any]:
+    return json.loads(schema_path(path).read_text(encoding="utf-8"))
+
+
+def read_columnar(
+    path: str | Path, columns: Optional[Sequence[str]] = None
+) -> Tuple[List[str], np.ndarray]:
+    """Devuelve ``(columnas, matriz n_filas x n_columnas)``.
+
+    Sin ``columns`` la matriz es una vista ``memmap`` de solo lectura; con
+    ``columns`` se devuelve una copia contigua solo con esas columnas.
+    """
+    p = Path(path)
+    schema = read_schema(p)
+    all_cols: List[str] = list(schema["columns"])
+    ncols = len(all_cols)
+    size = p.stat().st_size if p.exists() else 0
+    itemsize = np.dtype(schema.get("dtype", DTYPE)).itemsize
+    nrows = size // (itemsize * ncols) if ncols else 0
+    if nrows == 0:
+        mat = np.empty((0, ncols), dtype=DTYPE)
+    else:
+        mat = np.memmap(p, dtype=schema.get("dtype", DTYPE), mode="r", shape=(nrows, ncols))
+    if columns is None:
+        return all_cols, mat
+    idx = [all_cols.index(c) for c in columns if c in all_cols]
+    return [all_cols[i] for i in idx], np.ascontiguousarray(mat[:, idx])
+
+
+__all__ = [
+    "ColumnarRunWriter",
+    "columnar_path_for",
+    "read_columnar",
+    "read_schema",
+    "schema_path",
+]
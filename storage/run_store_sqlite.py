@@ -1,27 +1,128 @@
 from __future__ import annotations
 
 import json
+import logging
+import re
 import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from queue import Empty, Full, Queue
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .wal_checkpoint import WalCheckpointer
+
+_CORE_COLUMNS = ("t_wall", "odom_m", "speed_kph", "next_limit_kph", "dist_next_limit_m")
+
+_INSERT_SQL = (
+    "INSERT INTO telemetry(t_wall, odom_m, speed_kph, next_limit_kph, "
+    "dist_next_limit_m, meta_json) VALUES(?,?,?,?,?,?)"
+)
+
+_COMMIT_LOG_SQL = "INSERT INTO commits(run_id, t_first, t_last, n, ts_commit) VALUES(?,?,?,?,?)"
+
+# Versión de esquema (PRAGMA user_version).
+#   v2 = tabla runs + telemetry.run_id
+#   v3 = runs.archive_path (partición donde quedaron archivadas las filas)
+#   v4 = tabla commits (sello ts_commit tomado tras cada COMMIT)
+SCHEMA_VERSION = 4
+
+# Modo autocommit: entradas de la tabla commits que se acumulan antes de escribirlas
+COMMIT_LOG_ROWS = 200
+
+# Campos de texto de sesión: van a la tabla runs, no como columna por fila
+_RUN_INFO_FIELDS = ("provider", "product", "engine")
+
+# Políticas cuando la cola del escritor por lotes está llena
+ON_FULL_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Centinela para parar el hilo escritor
+_STOP = object()
 
 
 class RunStore:
-    """SQLite store para telemetría en vivo (WAL, 1 writer + N readers)."""
+    """SQLite store para telemetría en vivo (WAL, 1 writer + N readers).
+
+    Modo por defecto: autocommit, una transacción por ``insert_row``.
+
+    Modo por lotes (``batch_rows > 0``): ``insert_row`` solo encola la fila y un
+    hilo de fondo la escribe con ``executemany`` dentro de una única transacción
+    cada ``batch_rows`` filas o cada ``batch_ms`` milisegundos (lo que ocurra
+    antes). La cola está acotada (``queue_max``); si se llena se aplica
+    ``on_full``:
+
+    - ``drop_oldest``: descarta la fila más antigua en cola (preferimos datos frescos).
+    - ``drop_newest``: descarta la fila entrante.
+    - ``block``: espera hasta ``block_timeout_s`` (backpressure) y, si sigue llena, descarta.
+
+    Los reintentos ante ``database is locked`` se hacen en el hilo escritor, no en
+    el bucle de muestreo. ``flush()`` fuerza la escritura de lo pendiente y
+    ``close()`` vacía la cola antes de cerrar la conexión.
+
+    Esquema proyectado: ``begin_run(columns)`` abre una fila en ``runs`` y añade
+    (``ALTER TABLE ... ADD COLUMN``) una columna ``REAL`` por cada control
+    conocido, de modo que las herramientas de análisis puedan consultarlos con
+    SQL sin parsear ``meta_json``. Las filas posteriores llevan ``run_id``.
+
+    Particionado (``archive_dir``): la base viva solo guarda la sesión actual.
+    Al abrir una sesión nueva, las filas de sesiones anteriores se mueven a un
+    fichero por sesión (``archive_dir/run_<run_id>.db``, vía ``ATTACH``). Un hilo
+    de mantenimiento rota además la sesión en curso si la base supera
+    ``rotate_max_mb`` o pasan ``rotate_max_s`` segundos (conserva las últimas
+    ``keep_live_rows`` filas) y aplica la retención (``retention_days`` /
+    ``retention_keep`` particiones). Tras mover filas se hace
+    ``incremental_vacuum`` y ``wal_checkpoint(TRUNCATE)``.
+
+    Checkpoints (``checkpoint_s`` / ``checkpoint_wal_mb``): un ``WalCheckpointer``
+    compañero lanza ``wal_checkpoint(PASSIVE)`` periódicamente o por tamaño del WAL
+    (``TRUNCATE`` si crece por encima de ``checkpoint_truncate_mb``) en su propia
+    conexión, sin tomar el lock del escritor, y publica sus métricas en
+    ``wal_status_path`` para el exportador Prometheus.
+
+    Latencia de commit: tras cada ``COMMIT`` (lote, o ``insert_row`` en modo
+    autocommit) se toma ``time.perf_counter()`` (el reloj de ``runtime.latency``)
+    y se anota en la tabla ``commits`` (``t_first``..``t_last`` de las filas
+    confirmadas y ``ts_commit``). Las anotaciones viajan en la transacción del
+    lote siguiente (o cada ``COMMIT_LOG_ROWS`` en autocommit) y en ``close()``.
+    """
 
     def __init__(
         self,
         db_path: str | Path = "data/run.db",
         busy_timeout_ms: int = 5000,
         synchronous: int | str = "NORMAL",
+        batch_rows: int = 0,
+        batch_ms: float = 250.0,
+        queue_max: int = 5000,
+        on_full: str = "drop_oldest",
+        block_timeout_s: float = 0.05,
+        archive_dir: str | Path | None = None,
+        rotate_max_mb: float = 0.0,
+        rotate_max_s: float = 0.0,
+        keep_live_rows: int = 1000,
+        retention_days: float = 0.0,
+        retention_keep: int = 0,
+        maintenance_s: float = 30.0,
+        checkpoint_s: float = 0.0,
+        checkpoint_wal_mb: float = 0.0,
+        checkpoint_truncate_mb: float = 64.0,
+        wal_status_path: str | Path | None = None,
     ) -> None:
         self.path = Path(db_path)
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger("storage.run_store")
         # abrir con check_same_thread=False para permitir accesos desde hilos diferentes
         self.con = sqlite3.connect(
             self.path.as_posix(), isolation_level=None, check_same_thread=False
         )
+        # serializa el uso de la conexión entre el hilo escritor y los lectores
+        self._lock = threading.RLock()
         # aplicar pragmas de robustez
+        # auto_vacuum incremental: solo surte efecto en bases nuevas (antes de crear tablas)
+        try:
+            self.con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        except Exception:
+            pass
         # journal_mode: preferimos WAL para múltiples lectores concurrentes
         try:
             self.con.execute("PRAGMA journal_mode=WAL")
@@ -41,15 +142,82 @@ class RunStore:
         except Exception:
             pass
         self._ensure_schema()
+        # sesión actual (begin_run) y sentencia INSERT activa
+        self.run_id: Optional[int] = None
+        self._insert_sql = _INSERT_SQL
+        self._projection: List[Tuple[str, str]] = []
+
+        # --- escritor por lotes (opcional) ---
+        if on_full not in ON_FULL_POLICIES:
+            raise ValueError(f"on_full must be one of {ON_FULL_POLICIES}")
+        self.batch_rows = max(0, int(batch_rows))
+        self.batch_s = max(0.001, float(batch_ms) / 1000.0)
+        self.on_full = on_full
+        self.block_timeout_s = float(block_timeout_s)
+        self.stats: Dict[str, int] = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed": 0,
+        }
+        # sellos de COMMIT pendientes de anotar en la tabla commits
+        self._commit_log: List[Tuple[Any, ...]] = []
+        self._queue: Optional[Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if self.batch_rows > 0:
+            self._queue = Queue(maxsize=max(1, int(queue_max)))
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="runstore-writer", daemon=True
+            )
+            self._writer.start()
+
+        # --- particionado / rotación / retención (opcional) ---
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.rotate_max_bytes = int(float(rotate_max_mb) * 1024 * 1024)
+        self.rotate_max_s = float(rotate_max_s)
+        self.keep_live_rows = max(1, int(keep_live_rows))
+        self.retention_days = float(retention_days)
+        self.retention_keep = max(0, int(retention_keep))
+        self._last_rotation = time.monotonic()
+        self._stop_maint = threading.Event()
+        self._maint: Optional[threading.Thread] = None
+        if self.archive_dir is not None:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            if self.rotate_max_bytes or self.rotate_max_s or self.retention_days or self.retention_keep:
+                self._maint = threading.Thread(
+                    target=self._maintenance_loop,
+                    args=(max(0.05, float(maintenance_s)),),
+                    name="runstore-maint",
+                    daemon=True,
+                )
+                self._maint.start()
+
+        # --- checkpoints del WAL (opcional) ---
+        self.checkpointer: Optional[WalCheckpointer] = None
+        if checkpoint_s > 0 or checkpoint_wal_mb > 0:
+            self.checkpointer = WalCheckpointer(
+                self.path,
+                interval_s=checkpoint_s,
+                wal_max_mb=checkpoint_wal_mb,
+                truncate_mb=checkpoint_truncate_mb,
+                status_path=wal_status_path,
+            ).start()
+
+    @property
+    def batched(self) -> bool:
+        return self._queue is not None
 
     def get_pragmas(self) -> Dict[str, Any]:
         """Leer algunos pragmas de la conexión para pruebas/diagnóstico."""
-        cur = self.con.execute("PRAGMA journal_mode")
-        journal = cur.fetchone()[0] if cur is not None else None
-        cur = self.con.execute("PRAGMA synchronous")
-        sync = cur.fetchone()[0] if cur is not None else None
-        cur = self.con.execute("PRAGMA busy_timeout")
-        busy = cur.fetchone()[0] if cur is not None else None
+        with self._lock:
+            cur = self.con.execute("PRAGMA journal_mode")
+            journal = cur.fetchone()[0] if cur is not None else None
+            cur = self.con.execute("PRAGMA synchronous")
+            sync = cur.fetchone()[0] if cur is not None else None
+            cur = self.con.execute("PRAGMA busy_timeout")
+            busy = cur.fetchone()[0] if cur is not None else None
         return {"journal_mode": journal, "synchronous": sync, "busy_timeout": busy}
 
     def _ensure_schema(self) -> None:
@@ -68,33 +236,489 @@ class RunStore:
         self.con.execute(
             "CREATE INDEX IF NOT EXISTS ix_telemetry_twall ON telemetry(t_wall)"
         )
+        self._migrate()
 
-    def insert_row(self, row: Dict[str, Any]) -> None:
+    def _migrate(self) -> None:
+        """Migraciones incrementales guiadas por ``PRAGMA user_version``."""
+        version = int(self.con.execute("PRAGMA user_version").fetchone()[0])
+        if version >= SCHEMA_VERSION:
+            return
+        if version < 2:
+            self.con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                  run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  started_at REAL NOT NULL,
+                  ended_at REAL,
+                  provider TEXT,
+                  product TEXT,
+                  engine TEXT,
+                  columns_json TEXT
+                )
+                """
+            )
+            if "run_id" not in self._table_columns("telemetry"):
+                self.con.execute(
+                    "ALTER TABLE telemetry ADD COLUMN run_id INTEGER REFERENCES runs(run_id)"
+                )
+            self.con.execute(
+                "CREATE INDEX IF NOT EXISTS ix_telemetry_run ON telemetry(run_id)"
+            )
+        if version < 3 and "archive_path" not in self._table_columns("runs"):
+            self.con.execute("ALTER TABLE runs ADD COLUMN archive_path TEXT")
+        if version < 4:
+            self.con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS commits (
+                  run_id INTEGER,
+                  t_first REAL NOT NULL,
+                  t_last REAL NOT NULL,
+                  n INTEGER,
+                  ts_commit REAL NOT NULL
+                )
+                """
+            )
+            self.con.execute(
+                "CREATE INDEX IF NOT EXISTS ix_commits_tfirst ON commits(t_first)"
+            )
+        self.con.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _table_columns(self, table: str, schema: str = "main") -> List[str]:
+        return [r[1] for r in self.con.execute(f"PRAGMA {schema}.table_info({table})")]
+
+    def begin_run(self, columns: Iterable[str] = (), **info: Any) -> int:
+        """Abre una sesión nueva y proyecta ``columns`` a columnas numéricas.
+
+        ``columns`` suele ser ``RDClient.schema()``. Los campos de texto de sesión
+        (provider/product/engine) se guardan en ``runs`` vía ``info``. Devuelve el
+        ``run_id`` asignado.
+        """
+        # las filas en cola se escriben con la sentencia anterior
+        self.flush()
+        with self._lock:
+            existing = {c.lower() for c in self._table_columns("telemetry")}
+            projection: List[Tuple[str, str]] = []
+            seen = {c.lower() for c in _CORE_COLUMNS} | {"meta_json", "run_id"}
+            for key in columns:
+                if key in _RUN_INFO_FIELDS:
+                    continue
+                col = _sanitize_column(key)
+                if col.lower() in seen:
+                    continue
+                seen.add(col.lower())
+                if col.lower() not in existing:
+                    self.con.execute(f'ALTER TABLE telemetry ADD COLUMN "{col}" REAL')
+                    existing.add(col.lower())
+                projection.append((key, col))
+            if self.run_id is not None:
+                self._end_run()
+            if self.archive_dir is not None:
+                # partición por sesión: la base viva arranca solo con la sesión nueva
+                self._archive_previous_runs()
+            cur = self.con.execute(
+                "INSERT INTO runs(started_at, provider, product, engine, columns_json) "
+                "VALUES(?,?,?,?,?)",
+                (
+                    time.time(),
+                    info.get("provider"),
+                    info.get("product"),
+                    info.get("engine"),
+                    json.dumps([c for _, c in projection], ensure_ascii=False),
+                ),
+            )
+            self.run_id = int(cur.lastrowid)
+            self._projection = projection
+            cols = list(_CORE_COLUMNS) + ["meta_json", "run_id"]
+            cols += [f'"{c}"' for _, c in projection]
+            self._insert_sql = (
+                f"INSERT INTO telemetry({', '.join(cols)}) "
+                f"VALUES({','.join('?' * len(cols))})"
+            )
+        return self.run_id
+
+    def update_run(self, **info: Any) -> None:
+        """Completa provider/product/engine de la sesión actual (p. ej. al primer tick)."""
+        if self.run_id is None:
+            return
+        sets = [(k, info[k]) for k in _RUN_INFO_FIELDS if info.get(k) is not None]
+        if not sets:
+            return
+        with self._lock:
+            self.con.execute(
+                f"UPDATE runs SET {', '.join(f'{k}=?' for k, _ in sets)} WHERE run_id=?",
+                [str(v) for _, v in sets] + [self.run_id],
+            )
+
+    def _end_run(self) -> None:
+        self.con.execute(
+            "UPDATE runs SET ended_at=? WHERE run_id=?", (time.time(), self.run_id)
+        )
+
+    # --- particionado ---
+    def partition_path(self, run_id: Optional[int]) -> Path:
+        assert self.archive_dir is not None
+        name = "run_legacy.db" if run_id is None else f"run_{int(run_id):06d}.db"
+        return self.archive_dir / name
+
+    def _archive_previous_runs(self) -> int:
+        moved = 0
+        ids = [r[0] for r in self.con.execute("SELECT DISTINCT run_id FROM telemetry")]
+        for rid in ids:
+            if rid is not None and rid == self.run_id:
+                continue
+            moved += self._archive_rows(rid, None)
+        if moved:
+            self._compact()
+        return moved
+
+    def _archive_rows(self, run_id: Optional[int], upto_rowid: Optional[int]) -> int:
+        """Mueve filas de ``run_id`` (hasta ``upto_rowid``) a su partición. Requiere el lock."""
+        part = self.partition_path(run_id)
+        cond = "run_id IS NULL" if run_id is None else "run_id = ?"
+        params: List[Any] = [] if run_id is None else [run_id]
+        if upto_rowid is not None:
+            cond += " AND rowid <= ?"
+            params.append(int(upto_rowid))
+        # ATTACH/DETACH no pueden ir dentro de una transacción
+        self.con.execute("ATTACH DATABASE ? AS part", (part.as_posix(),))
+        try:
+            self.con.execute("BEGIN")
+            try:
+                cols = self._sync_partition_schema()
+                collist = ", ".join(f'"{c}"' for c in cols)
+                n = self.con.execute(
+                    f"INSERT INTO part.telemetry({collist}) "
+                    f"SELECT {collist} FROM main.telemetry WHERE {cond}",
+                    params,
+                ).rowcount
+                self.con.execute(f"DELETE FROM main.telemetry WHERE {cond}", params)
+                if run_id is not None:
+                    self.con.execute(
+                        "UPDATE main.runs SET archive_path=? WHERE run_id=?",
+                        (part.as_posix(), run_id),
+                    )
+                    run_cols = ", ".join(f'"{c}"' for c in self._table_columns("runs"))
+                    self.con.execute("DELETE FROM part.runs WHERE run_id=?", (run_id,))
+                    self.con.execute(
+                        f"INSERT INTO part.runs({run_cols}) "
+                        f"SELECT {run_cols} FROM main.runs WHERE run_id=?",
+                        (run_id,),
+                    )
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        finally:
+            self.con.execute("DETACH DATABASE part")
+        self.stats["archived"] = self.stats.get("archived", 0) + max(0, n)
+        return max(0, n)
+
+    def _sync_partition_schema(self) -> List[str]:
+        """Crea/amplía las tablas de la partición para que acepten las columnas vivas."""
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS part.telemetry AS SELECT * FROM main.telemetry WHERE 0"
+        )
+        self.con.execute(
+            "CREATE INDEX IF NOT EXISTS part.ix_telemetry_twall ON telemetry(t_wall)"
+        )
+        self.con.execute("CREATE TABLE IF NOT EXISTS part.runs AS SELECT * FROM main.runs WHERE 0")
+        for table in ("telemetry", "runs"):
+            have = {c.lower() for c in self._table_columns(table, "part")}
+            for c in self._table_columns(table):
+                if c.lower() not in have:
+                    self.con.execute(f'ALTER TABLE part.{table} ADD COLUMN "{c}"')
+        return self._table_columns("telemetry")
+
+    def _compact(self) -> None:
+        for pragma in ("PRAGMA incremental_vacuum", "PRAGMA wal_checkpoint(TRUNCATE)"):
+            try:
+                self.con.execute(pragma).fetchall()
+            except Exception:
+                pass
+
+    def _db_bytes(self) -> int:
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += Path(self.path.as_posix() + suffix).stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def rotate(self) -> int:
+        """Archiva la sesión en curso salvo sus últimas ``keep_live_rows`` filas."""
+        if self.archive_dir is None:
+            return 0
+        self.flush()
+        with self._lock:
+            r = self.con.execute(
+                "SELECT rowid FROM telemetry ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                (self.keep_live_rows,),
+            ).fetchone()
+            moved = 0
+            if r is not None:
+                ids = [x[0] for x in self.con.execute("SELECT DISTINCT run_id FROM telemetry")]
+                for rid in ids:
+                    moved += self._archive_rows(rid, r[0])
+            if moved:
+                self._compact()
+            self._last_rotation = time.monotonic()
+        if moved:
+            self.logger.info("rotated %d rows into %s", moved, self.archive_dir)
+        return moved
+
+    def apply_retention(self, now: Optional[float] = None) -> List[Path]:
+        """Borra particiones antiguas según ``retention_days`` / ``retention_keep``."""
+        if self.archive_dir is None or not (self.retention_days or self.retention_keep):
+            return []
+        current = self.partition_path(self.run_id) if self.run_id is not None else None
+        parts = sorted(
+            (p for p in self.archive_dir.glob("run_*.db") if p != current),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        now = time.time() if now is None else now
+        doomed: List[Path] = []
+        for i, p in enumerate(parts):
+            too_many = self.retention_keep and i >= self.retention_keep
+            too_old = self.retention_days and (now - p.stat().st_mtime) > self.retention_days * 86400
+            if too_many or too_old:
+                doomed.append(p)
+        for p in doomed:
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                try:
+                    Path(p.as_posix() + suffix).unlink()
+                except OSError:
+                    pass
+            with self._lock:
+                self.con.execute(
+                    "DELETE FROM runs WHERE archive_path=?", (p.as_posix(),)
+                )
+        return doomed
+
+    def maintain(self) -> None:
+        """Un paso de mantenimiento: rotación por tamaño/tiempo y retención."""
+        due_size = self.rotate_max_bytes and self._db_bytes() >= self.rotate_max_bytes
+        due_time = self.rotate_max_s and (
+            time.monotonic() - self._last_rotation >= self.rotate_max_s
+        )
+        if due_size or due_time:
+            self.rotate()
+        self.apply_retention()
+
+    def _maintenance_loop(self, period_s: float) -> None:
+        while not self._stop_maint.wait(period_s):
+            try:
+                self.maintain()
+            except Exception as e:
+                self.logger.warning("maintenance failed: %s", e)
+
+    def _row_params(self, row: Dict[str, Any]) -> Tuple[Any, ...]:
         meta = row.get("meta") or {}
         t = row.get("t_wall")
         if t is None:
             # t_wall es obligatorio; evita insertar filas sin sello de tiempo
             raise ValueError("t_wall is required")
-        self.con.execute(
-            "INSERT INTO telemetry(t_wall, odom_m, speed_kph, next_limit_kph, "
-            "dist_next_limit_m, meta_json) VALUES(?,?,?,?,?,?)",
-            (
-                float(t),
-                _f(row.get("odom_m")),
-                _f(row.get("speed_kph")),
-                _f(row.get("next_limit_kph")),
-                _f(row.get("dist_next_limit_m")),
-                json.dumps(meta, ensure_ascii=False),
-            ),
+        params: Tuple[Any, ...] = (
+            float(t),
+            _f(row.get("odom_m")),
+            _f(row.get("speed_kph")),
+            _f(row.get("next_limit_kph")),
+            _f(row.get("dist_next_limit_m")),
+            json.dumps(meta, ensure_ascii=False),
         )
+        if self.run_id is None:
+            return params
+        return params + (self.run_id,) + tuple(_f(row.get(k)) for k, _ in self._projection)
+
+    def insert_row(self, row: Dict[str, Any]) -> None:
+        params = self._row_params(row)
+        if self._queue is None:
+            with self._lock:
+                self.con.execute(self._insert_sql, params)
+                # autocommit: la fila ya está confirmada al volver execute()
+                self._log_commit([params], time.perf_counter())
+                if len(self._commit_log) >= COMMIT_LOG_ROWS:
+                    self._write_commit_log()
+            return
+        self._enqueue(params)
+
+    # --- escritor por lotes ---
+    def _enqueue(self, params: Tuple[Any, ...]) -> None:
+        q = self._queue
+        assert q is not None
+        try:
+            if self.on_full == "block":
+                q.put(params, timeout=self.block_timeout_s)
+            else:
+                q.put_nowait(params)
+            self.stats["queued"] += 1
+            return
+        except Full:
+            pass
+        if self.on_full == "drop_oldest":
+            try:
+                q.get_nowait()
+                self.stats["dropped"] += 1
+            except Empty:
+                pass
+            try:
+                q.put_nowait(params)
+                self.stats["queued"] += 1
+                return
+            except Full:
+                pass
+        self.stats["dropped"] += 1
+
+    def _writer_loop(self) -> None:
+        q = self._queue
+        assert q is not None
+        pending: List[Tuple[Any, ...]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if pending else None
+            try:
+                item = q.get(timeout=timeout)
+            except Empty:
+                item = None
+            if item is _STOP:
+                self._write_batch(pending)
+                return
+            if isinstance(item, threading.Event):
+                # flush explícito: escribir lo pendiente y avisar
+                self._write_batch(pending)
+                pending = []
+                item.set()
+                continue
+            if item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.batch_s
+                pending.append(item)
+            if pending and (
+                len(pending) >= self.batch_rows or time.monotonic() >= deadline
+            ):
+                self._write_batch(pending)
+                pending = []
+
+    def _write_batch(
+        self, rows: List[Tuple[Any, ...]], attempts: int = 3, delay_s: float = 0.05
+    ) -> None:
+        if not rows:
+            return
+        for attempt in range(attempts):
+            try:
+                with self._lock:
+                    log = self._commit_log
+                    self.con.execute("BEGIN")
+                    try:
+                        self.con.executemany(self._insert_sql, rows)
+                        # sellos de los lotes anteriores: sin transacción extra
+                        if log:
+                            self.con.executemany(_COMMIT_LOG_SQL, log)
+                        self.con.execute("COMMIT")
+                    except Exception:
+                        self.con.execute("ROLLBACK")
+                        raise
+                    # sello tomado cuando COMMIT ha vuelto (filas ya visibles/durables)
+                    ts_commit = time.perf_counter()
+                    if log:
+                        self._commit_log = []
+                    self._log_commit(rows, ts_commit)
+                self.stats["written"] += len(rows)
+                self.stats["batches"] += 1
+                return
+            except sqlite3.OperationalError as e:
+                if attempt < attempts - 1:
+                    self.stats["retries"] += 1
+                    time.sleep(delay_s * (2**attempt))
+                    continue
+                self.logger.error(
+                    "batch insert failed after %d attempts (%d rows): %s",
+                    attempts,
+                    len(rows),
+                    e,
+                )
+            except Exception as e:
+                self.logger.error("batch insert failed (%d rows): %s", len(rows), e)
+                break
+        self.stats["failed"] += len(rows)
+
+    def _log_commit(self, rows: List[Tuple[Any, ...]], ts_commit: float) -> None:
+        """Anota el sello de COMMIT de ``rows`` (parámetros de INSERT). Requiere el lock."""
+        ts = [r[0] for r in rows]
+        run_id = rows[0][6] if len(rows[0]) > 6 else None
+        self._commit_log.append((run_id, min(ts), max(ts), len(rows), ts_commit))
+
+    def _write_commit_log(self) -> None:
+        """Escribe las anotaciones pendientes de la tabla commits. Requiere el lock."""
+        log, self._commit_log = self._commit_log, []
+        if not log:
+            return
+        try:
+            self.con.execute("BEGIN")
+            try:
+                self.con.executemany(_COMMIT_LOG_SQL, log)
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            self.logger.warning("commit log write failed (%d entries): %s", len(log), e)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Fuerza la escritura de las filas en cola. Devuelve True si terminó a tiempo.
+
+        Nunca espera más de ``timeout``: si el hilo escritor ha muerto (o muere
+        mientras tanto) las filas en cola se escriben aquí, de forma síncrona.
+        """
+        q, writer = self._queue, self._writer
+        if q is None:
+            return True
+        if writer is None or not writer.is_alive():
+            self._drain_sync()
+            return True
+        deadline = time.monotonic() + max(0.0, float(timeout))
+        done = threading.Event()
+        try:
+            q.put(done, timeout=max(0.0, float(timeout)))
+        except Full:
+            # cola llena y el escritor no la vacía
+            if not writer.is_alive():
+                self._drain_sync()
+                return True
+            return False
+        while not done.wait(min(0.05, max(0.0, deadline - time.monotonic()))):
+            if not writer.is_alive():
+                self._drain_sync()
+                return True
+            if time.monotonic() >= deadline:
+                return False
+        return True
+
+    def _drain_sync(self) -> None:
+        """Escribe en este hilo lo que quede en cola (solo sin hilo escritor vivo)."""
+        q = self._queue
+        assert q is not None
+        rows: List[Tuple[Any, ...]] = []
+        while True:
+            try:
+                item = q.get_nowait()
+            except Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                rows.append(item)
+        self._write_batch(rows)
 
     def latest_since(self, last_rowid: int = 0) -> Optional[Tuple[int, Dict[str, Any]]]:
-        cur = self.con.execute(
-            "SELECT rowid, t_wall, odom_m, speed_kph, next_limit_kph, dist_next_limit_m "
-            "FROM telemetry WHERE rowid > ? ORDER BY rowid DESC LIMIT 1",
-            (int(last_rowid),),
-        )
-        r = cur.fetchone()
+        with self._lock:
+            cur = self.con.execute(
+                "SELECT rowid, t_wall, odom_m, speed_kph, next_limit_kph, dist_next_limit_m "
+                "FROM telemetry WHERE rowid > ? ORDER BY rowid DESC LIMIT 1",
+                (int(last_rowid),),
+            )
+            r = cur.fetchone()
         if not r:
             return None
         rowid, t, od, sp, lim, dist = r
@@ -106,13 +730,47 @@ class RunStore:
             "dist_next_limit_m": _f(dist),
         }
 
-    def close(self) -> None:
+    def close(self, timeout: float = 5.0) -> None:
+        if self.checkpointer is not None:
+            self.checkpointer.stop(timeout)
+        self._stop_maint.set()
+        if self._maint is not None:
+            self._maint.join(timeout)
+        if self._queue is not None and self._writer is not None:
+            try:
+                if self._writer.is_alive():
+                    self._queue.put(_STOP, timeout=timeout)
+                    self._writer.join(timeout)
+            except Exception:
+                pass
+            if not self._writer.is_alive():
+                # escritor parado o muerto: lo que quede en cola se escribe aquí
+                self._drain_sync()
+        try:
+            with self._lock:
+                self._write_commit_log()
+        except Exception:
+            pass
+        if self.run_id is not None:
+            try:
+                with self._lock:
+                    self._end_run()
+            except Exception:
+                pass
         try:
             self.con.close()
         except Exception:
             pass
 
 
+def _sanitize_column(name: str) -> str:
+    """Nombre de control -> identificador SQL seguro (``[A-Za-z0-9_]``)."""
+    col = re.sub(r"\W", "_", str(name)).strip("_") or "col"
+    if col[0].isdigit():
+        col = "c_" + col
+    return col
+
+
 def _f(x: Any) -> Optional[float]:
     try:
         return None if x is None else float(x)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Columnas que el lazo de control necesita; orden fijo = tuplas tipadas estables
+_COLUMNS = ("t_wall", "odom_m", "speed_kph", "next_limit_kph", "dist_next_limit_m")
+_SELECT = "SELECT rowid, " + ", ".join(_COLUMNS) + " FROM telemetry"
+_SQL_LATEST = _SELECT + " ORDER BY rowid DESC LIMIT 1"
+_SQL_LATEST_SINCE = _SELECT + " WHERE rowid > ? ORDER BY rowid DESC LIMIT 1"
+_SQL_NEW = _SELECT + " WHERE rowid > ? ORDER BY rowid ASC LIMIT ?"
+_SQL_MAX_ROWID = "SELECT max(rowid) FROM telemetry"
+
+
+class TelemetrySample(NamedTuple):
+    rowid: int
+    t_wall: float
+    odom_m: Optional[float]
+    speed_kph: Optional[float]
+    next_limit_kph: Optional[float]
+    dist_next_limit_m: Optional[float]
+
+    def as_row(self) -> Dict[str, Any]:
+        """Dict sin ``rowid`` (formato de fila que consume el lazo de control)."""
+        d = self._asdict()
+        d.pop("rowid", None)
+        return d
+
+
+class TelemetryReader:
+    """Lector incremental de ``telemetry`` con conexión persistente de solo lectura.
+
+    Mantiene abierta una única conexión ``mode=ro`` (WAL permite leer mientras el
+    colector escribe) y usa siempre las mismas sentencias SQL, que ``sqlite3``
+    reutiliza desde su caché de sentencias preparadas. Recuerda el último
+    ``rowid`` visto para devolver solo filas nuevas.
+
+    Si la base no existe todavía o la conexión falla, las lecturas devuelven
+    ``None``/``[]`` y se reintenta la conexión en la siguiente llamada. Los errores
+    ``database is locked`` se propagan para que el llamador decida (fallback a CSV).
+
+    Si ``RunStore`` archiva la sesión anterior y la tabla queda vacía, SQLite
+    reinicia los rowid; el lector lo detecta (``max(rowid)`` menor que el último
+    visto) y vuelve a empezar desde 0.
+    """
+
+    def __init__(self, db_path: str | Path, busy_timeout_ms: int = 200) -> None:
+        self.path = Path(db_path)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.last_rowid = 0
+        self.reconnects = 0
+        self.logger = logging.getLogger("storage.telemetry_reader")
+        self._con: Optional[sqlite3.Connection] = None
+
+    # --- conexión ---
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._con is not None:
+            return self._con
+        if not self.path.exists():
+            return None
+        uri = f"file:{self.path.resolve().as_posix()}?mode=ro"
+        try:
+            con = sqlite3.connect(
+                uri,
+                uri=True,
+                timeout=self.busy_timeout_ms / 1000.0,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            con.execute("PRAGMA query_only=1")
+        except sqlite3.Error as e:
+            self.logger.debug("cannot open %s read-only: %s", self.path, e)
+            return None
+        self._con = con
+        return con
+
+    def _drop(self) -> None:
+        con, self._con = self._con, None
+        if con is not None:
+            try:
+                con.close()
+            except Exception:
+                pass
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        """Ejecuta ``sql``; ante errores no transitorios reconecta una vez."""
+        for attempt in range(2):
+            con = self._connect()
+            if con is None:
+                return []
+            try:
+                return con.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                msg = str(e).lower()
+                if "locked" in msg or "busy" in msg:
+                    raise
+                if "no such table" in msg:
+                    # el colector aún no ha creado el esquema
+                    return []
+                self._drop()
+                self.reconnects += 1
+                if attempt:
+                    raise
+            except sqlite3.DatabaseError:
+                self._drop()
+                self.reconnects += 1
+                if attempt:
+                    raise
+        return []
+
+    def _rewound(self, last_rowid: int) -> bool:
+        if last_rowid <= 0:
+            return False
+        rows = self._query(_SQL_MAX_ROWID)
+        top = rows[0][0] if rows else None
+        return top is not None and int(top) < last_rowid
+
+    # --- lecturas ---
+    def latest(self) -> Optional[TelemetrySample]:
+        """Última fila disponible (aunque ya se haya leído antes)."""
+        rows = self._query(_SQL_LATEST)
+        if not rows:
+            return None
+        s = _sample(rows[0])
+        self.last_rowid = max(self.last_rowid, s.rowid)
+        return s
+
+    def read_new(self, limit: int = 1000) -> List[TelemetrySample]:
+        """Filas con ``rowid`` posterior a la última vista, en orden ascendente."""
+        rows = self._query(_SQL_NEW, (self.last_rowid, int(limit)))
+        if not rows and self._rewound(self.last_rowid):
+            self.last_rowid = 0
+            rows = self._query(_SQL_NEW, (0, int(limit)))
+        out = [_sample(r) for r in rows]
+        if out:
+            self.last_rowid = out[-1].rowid
+        return out
+
+    def latest_since(self, last_rowid: int = 0) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Compatible con ``RunStore.latest_since``: la fila más reciente con rowid > last_rowid."""
+        rows = self._query(_SQL_LATEST_SINCE, (int(last_rowid),))
+        if not rows and self._rewound(int(last_rowid)):
+            self.last_rowid = 0
+            rows = self._query(_SQL_LATEST_SINCE, (0,))
+        if not rows:
+            return None
+        s = _sample(rows[0])
+        self.last_rowid = max(self.last_rowid, s.rowid)
+        return s.rowid, s.as_row()
+
+    def close(self) -> None:
+        self._drop()
+
+    def __enter__(self) -> "TelemetryReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _sample(r: Tuple[Any, ...]) -> TelemetrySample:
+    rowid, t, od, sp, lim, dist = r
+    return TelemetrySample(int(rowid), float(t), _f(od), _f(sp), _f(lim), _f(dist))
+
+
+def _f(x: Any) -> Optional[float]:
+    try:
+        return None if x is None else float(x)
+    except Exception:
+        return None
+
+
+__all__ = ["TelemetryReader", "TelemetrySample"]
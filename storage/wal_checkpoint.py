@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def default_status_path(db_path: str | Path) -> Path:
+    """Fichero JSON con las métricas WAL que lee ``db_health_prometheus``."""
+    return Path(str(db_path) + ".walstats.json")
+
+
+def wal_size_bytes(db_path: str | Path) -> int:
+    try:
+        return Path(str(db_path) + "-wal").stat().st_size
+    except OSError:
+        return 0
+
+
+def read_status(path: str | Path) -> Dict[str, Any]:
+    p = Path(path)
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+class WalCheckpointer:
+    """Hilo compañero que gestiona los checkpoints del WAL de una base SQLite.
+
+    Cada ``poll_s`` mira el tamaño de ``<db>-wal``. Lanza un checkpoint cuando
+    pasan ``interval_s`` segundos desde el anterior o cuando el WAL supera
+    ``wal_max_mb``. El modo es ``PASSIVE`` (no bloquea a lectores ni escritor);
+    si el WAL supera ``truncate_mb`` se intenta ``TRUNCATE`` para recuperar disco.
+
+    Usa su propia conexión, sin el lock del escritor, y con ``busy_timeout_ms``
+    (0 por defecto): un ``TRUNCATE`` con lectores activos no espera a que
+    suelten el WAL (SQLite devuelve ``busy`` y se reintenta en el siguiente
+    tick), así que nunca deja al escritor parado detrás del checkpoint. Tras
+    cada checkpoint guarda ``stats`` en ``status_path`` (JSON) para que
+    ``scripts/db_health_prometheus.render_prom_file`` lo publique.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        interval_s: float = 60.0,
+        wal_max_mb: float = 16.0,
+        truncate_mb: float = 64.0,
+        poll_s: float = 1.0,
+        status_path: str | Path | None = None,
+        busy_timeout_ms: int = 0,
+    ) -> None:
+        self.db_path = Path(db_path)
+        # conexión propia: el hilo de checkpoint no comparte lock con el escritor
+        self.con = sqlite3.connect(
+            self.db_path.as_posix(), isolation_level=None, check_same_thread=False
+        )
+        self.con.execute(f"PRAGMA busy_timeout={max(0, int(busy_timeout_ms))}")
+        self._con_lock = threading.Lock()
+        self.interval_s = float(interval_s)
+        self.wal_max_bytes = int(float(wal_max_mb) * 1024 * 1024)
+        self.truncate_bytes = int(float(truncate_mb) * 1024 * 1024)
+        self.poll_s = max(0.01, float(poll_s))
+        self.status_path = (
+            Path(status_path) if status_path else default_status_path(self.db_path)
+        )
+        self.logger = logging.getLogger("storage.wal_checkpoint")
+        self.stats: Dict[str, Any] = {
+            "checkpoints_total": 0,
+            "busy_total": 0,
+            "errors_total": 0,
+            "wal_bytes": 0,
+            "wal_bytes_max": 0,
+            "last_mode": None,
+            "last_duration_s": None,
+            "last_log_frames": None,
+            "last_checkpointed_frames": None,
+            "last_checkpoint_time": None,
+        }
+        self._last = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "WalCheckpointer":
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="wal-checkpoint", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._con_lock:
+            try:
+                self.con.close()
+            except Exception:
+                pass
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.tick()
+            except Exception as e:
+                self.stats["errors_total"] += 1
+                self.logger.warning("checkpoint failed: %s", e)
+
+    def tick(self) -> Optional[str]:
+        """Decide y ejecuta (si toca) un checkpoint. Devuelve el modo usado."""
+        size = wal_size_bytes(self.db_path)
+        self._note_size(size)
+        mode = None
+        if self.truncate_bytes and size >= self.truncate_bytes:
+            mode = "TRUNCATE"
+        elif self.wal_max_bytes and size >= self.wal_max_bytes:
+            mode = "PASSIVE"
+        elif self.interval_s and time.monotonic() - self._last >= self.interval_s:
+            mode = "PASSIVE"
+        if mode is not None:
+            self.checkpoint(mode)
+        return mode
+
+    def checkpoint(self, mode: str = "PASSIVE") -> Dict[str, Any]:
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"mode must be one of {CHECKPOINT_MODES}")
+        t0 = time.perf_counter()
+        with self._con_lock:
+            row = self.con.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        dur = time.perf_counter() - t0
+        busy, log_frames, ckpt_frames = (row or (0, -1, -1))[:3]
+        self._last = time.monotonic()
+        self.stats["checkpoints_total"] += 1
+        if busy:
+            self.stats["busy_total"] += 1
+        self.stats.update(
+            {
+                "last_mode": mode,
+                "last_duration_s": dur,
+                "last_log_frames": log_frames,
+                "last_checkpointed_frames": ckpt_frames,
+                "last_checkpoint_time": time.time(),
+            }
+        )
+        self._note_size(wal_size_bytes(self.db_path))
+        self.write_status()
+        return dict(self.stats)
+
+    def _note_size(self, size: int) -> None:
+        self.stats["wal_bytes"] = size
+        if size > self.stats["wal_bytes_max"]:
+            self.stats["wal_bytes_max"] = size
+
+    def write_status(self) -> None:
+        # escritura atómica: tmp + replace
+        try:
+            self.status_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.status_path.with_name(self.status_path.name + ".tmp")
+            tmp.write_text(json.dumps(self.stats), encoding="utf-8")
+            os.replace(tmp, self.status_path)
+        except Exception as e:
+            self.logger.debug("cannot write %s: %s", self.status_path, e)
+
+
+__all__ = [
+    "WalCheckpointer",
+    "default_status_path",
+    "read_status",
+    "wal_size_bytes",
+]
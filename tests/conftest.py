@@ -13,6 +13,12 @@ def fake_rd():
     return FakeRailDriver()
 
 
+@pytest.fixture(autouse=True)
+def _rd_controls_cache(tmp_path, monkeypatch):
+    """La caché de controles por loco va a un tmp (no a data/ del repo)."""
+    monkeypatch.setenv("TSC_RD_CONTROLS_CACHE", str(tmp_path / "rd_controls.json"))
+
+
 @pytest.fixture
 def make_client(fake_rd):
     """Factory that returns an RDClient with the fake driver attached."""
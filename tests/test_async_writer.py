@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from runtime.async_writer import AsyncEventWriter
+
+
+def _lines(p: Path):
+    return [json.loads(x) for x in p.read_text(encoding="utf-8").splitlines()]
+
+
+def test_events_are_batched_and_flushed_in_order(tmp_path: Path):
+    p = tmp_path / "events.jsonl"
+    w = AsyncEventWriter(p)
+    for i in range(500):
+        w.write({"type": "marker_pass", "i": i, "name": "Señal"})
+    assert w.flush(2.0)
+    evs = _lines(p)
+    assert [e["i"] for e in evs] == list(range(500))
+    assert evs[0]["name"] == "Señal"
+    assert w.stats["batches"] < 500
+    w.close()
+
+
+def test_heartbeat_is_coalesced(tmp_path: Path):
+    hb = tmp_path / ".hb"
+    w = AsyncEventWriter(tmp_path / "e.jsonl", heartbeat_path=hb, heartbeat_s=10.0)
+    for i in range(100):
+        w.heartbeat(1000.0 + i)
+    time.sleep(0.05)
+    w.close()
+    # a lo sumo el primero dentro del periodo + el último al cerrar
+    assert w.stats["heartbeats"] <= 2
+    assert hb.read_text(encoding="utf-8") == "1099.0"
+
+
+def test_close_writes_pending_and_sync_mode(tmp_path: Path):
+    p = tmp_path / "e.jsonl"
+    w = AsyncEventWriter(p)
+    w.write({"a": 1})
+    w.close()
+    assert _lines(p) == [{"a": 1}]
+
+    s = AsyncEventWriter(p, threaded=False)
+    assert not s.threaded
+    s.write({"a": 2})
+    assert _lines(p)[-1] == {"a": 2}
+    s.close()
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path: Path):
+    import threading
+
+    p = tmp_path / "e.jsonl"
+    w = AsyncEventWriter(p, queue_max=3, batch_max=1)
+    # disco parado: el hilo escritor se queda dentro de _append
+    stalled, release = threading.Event(), threading.Event()
+    real_append = w._append
+
+    def slow_append(events):
+        stalled.set()
+        release.wait(5.0)
+        real_append(events)
+
+    w._append = slow_append
+    w.write({"i": 0})
+    assert stalled.wait(2.0)
+    t0 = time.perf_counter()
+    for i in range(1, 11):
+        w.write({"i": i})
+    assert w.flush(timeout=0.2) is False
+    assert time.perf_counter() - t0 < 1.0
+    assert w.stats["dropped"] == 7
+    release.set()
+    w.close()
+    assert [e["i"] for e in _lines(p)] == [0, 1, 2, 3]
+
+
+def test_write_stamp_taken_by_writer_thread(tmp_path: Path):
+    from runtime import latency
+
+    p = tmp_path / "e.jsonl"
+    w = AsyncEventWriter(p)
+    ev = {"type": "stop_begin"}
+    latency.stamp(ev, "ingest")
+    w.write(ev)
+    w.write({"type": "marker_pass"})  # sin sellos: se escribe tal cual
+    w.close()
+    first, second = _lines(p)
+    assert first["ts_write"] >= first["ts_ingest"]
+    assert "ts_write" not in second
@@ -13,3 +13,108 @@ def test_era_distance_monotonic(tmp_path: Path):
     d_far = curve.braking_distance(120.0, 80.0)
     d_near = curve.braking_distance(90.0, 80.0)
     assert d_far > d_near
+
+
+def _reference_distance(curve: EraCurve, v0_kph: float, vlim_kph: float, dv: float = 0.001) -> float:
+    # integración directa (punto medio) de d = ∫ v/a(v) dv
+    v_hi, vlim, d = v0_kph / 3.6, vlim_kph / 3.6, 0.0
+    while v_hi > vlim + 1e-12:
+        v_lo = max(vlim, v_hi - dv)
+        v_mid = 0.5 * (v_hi + v_lo)
+        d += (v_hi - v_lo) * v_mid / curve.a_of_v(v_mid)
+        v_hi = v_lo
+    return d
+
+
+def test_table_distance_matches_integration_and_inverse():
+    import numpy as np
+    import pytest
+
+    curve = EraCurve([0.0, 20.0, 40.0, 60.0], [0.9, 0.7, 0.5, 0.45])
+    for v0, vl in [(120.0, 80.0), (90.0, 80.0), (300.0, 0.0), (450.0, 100.0)]:
+        assert curve.braking_distance(v0, vl) == pytest.approx(_reference_distance(curve, v0, vl), rel=1e-4)
+    assert curve.braking_distance(50.0, 60.0) == 0.0
+
+    v = curve.v_safe_for_distance(800.0, 80.0)
+    assert curve.braking_distance(v, 80.0) == pytest.approx(800.0, rel=1e-6)
+    assert curve.v_safe_for_distance(0.0, 80.0) == pytest.approx(80.0)
+    assert curve.v_safe_for_distance(1e7, 80.0, vmax_kph=250.0) == pytest.approx(250.0)
+
+    d = np.array([0.0, 200.0, 800.0, 5000.0])
+    vl = np.array([80.0, 60.0, 80.0, 0.0])
+    arr = curve.v_safe_for_distance_array(d, vl)
+    assert arr.tolist() == pytest.approx([curve.v_safe_for_distance(a, b) for a, b in zip(d, vl)])
+    dist = curve.braking_distance_array(arr, vl)
+    assert dist.tolist() == pytest.approx(d.tolist(), rel=1e-6, abs=1e-6)
+
+
+def test_array_target_matches_scalar_for_both_paths():
+    import numpy as np
+    import pytest
+
+    from runtime.braking_era import PHASES, compute_target_speed_kph_era, compute_target_speed_kph_era_array
+
+    curve = EraCurve([0.0, 20.0, 40.0, 60.0], [0.9, 0.7, 0.5, 0.45])
+    rng = np.random.default_rng(1)
+    n = 400
+    v = rng.uniform(0.0, 200.0, n)
+    lim = rng.choice([40.0, 80.0, 120.0, np.nan], n)
+    dist = rng.uniform(-50.0, 3000.0, n)
+    dist[::7] = np.nan
+    for c in (None, curve):
+        tgt, ph = compute_target_speed_kph_era_array(v, lim, dist, curve=c)
+        assert tgt.shape == (n,) and ph.dtype == np.int8
+        for i in range(n):
+            exp_t, exp_ph = compute_target_speed_kph_era(
+                float(v[i]),
+                None if np.isnan(lim[i]) else float(lim[i]),
+                None if np.isnan(dist[i]) else float(dist[i]),
+                curve=c,
+            )
+            assert PHASES[ph[i]] == exp_ph
+            if np.isnan(exp_t):
+                assert np.isnan(tgt[i])
+            else:
+                assert tgt[i] == pytest.approx(exp_t)
+    # sin límites: mantener velocidad
+    tgt, ph = compute_target_speed_kph_era_array(v, None, dist, curve=curve)
+    assert np.array_equal(tgt, v) and not ph.any()
+
+
+def test_gradient_family_interpolates_between_bins(tmp_path: Path):
+    import numpy as np
+    import pytest
+
+    from runtime.braking_era import EraCurveFamily, compute_target_speed_kph_era_array, load_era_curve
+
+    p = tmp_path / "family.csv"
+    lines = ["speed_kph,decel_service_mps2,gradient_pct"]
+    for g, a in ((-2.0, 0.5), (0.0, 0.7), (2.0, 0.9)):
+        lines += [f"0,{a},{g}", f"200,{a},{g}"]
+    p.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    fam = load_era_curve(p)
+    assert isinstance(fam, EraCurveFamily)
+    assert fam.gradients.tolist() == [-2.0, 0.0, 2.0]
+
+    flat = fam.v_safe_for_distance(800.0, 80.0, gradient_pct=0.0)
+    up = fam.v_safe_for_distance(800.0, 80.0, gradient_pct=2.0)
+    down = fam.v_safe_for_distance(800.0, 80.0, gradient_pct=-2.0)
+    assert down < flat < up
+    mid = fam.v_safe_for_distance(800.0, 80.0, gradient_pct=1.0)
+    assert mid == pytest.approx(0.5 * (flat + up))
+    # fuera de rango: la curva del extremo; NaN -> pendiente 0
+    assert fam.v_safe_for_distance(800.0, 80.0, gradient_pct=9.0) == pytest.approx(up)
+    assert fam.v_safe_for_distance_array(800.0, 80.0, gradient_pct=np.nan) == pytest.approx(flat)
+    assert fam.braking_distance(120.0, 80.0, gradient_pct=2.0) < fam.braking_distance(120.0, 80.0)
+
+    g = np.array([-2.0, 0.0, 1.0, 2.0])
+    tgt, _ = compute_target_speed_kph_era_array(
+        np.full(4, 200.0), np.full(4, 80.0), np.full(4, 800.0), curve=fam, gradient_pct=g
+    )
+    assert np.all(np.diff(tgt) > 0)
+    # memo por (bin, límite)
+    assert (1, 80.0) in fam._memo
+
+    single = tmp_path / "single.csv"
+    single.write_text("speed_kph,decel_service_mps2\n0,0.7\n200,0.7\n", encoding="utf-8")
+    assert isinstance(load_era_curve(single), EraCurve)
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from ingestion.bus_cursor import BusCursor, load_offset, shared_cursor
+from ingestion.lua_eventbus import LuaEventBus
+
+
+def _emit(path: Path, *events) -> None:
+    with path.open("a", encoding="utf-8") as f:
+        for e in events:
+            f.write((e if isinstance(e, str) else json.dumps(e)) + "\n")
+
+
+def test_cursor_persists_offset_and_resumes(tmp_path: Path):
+    bus = tmp_path / "lua_eventbus.jsonl"
+    state = tmp_path / ".lua_bus.offset"
+    _emit(bus, {"type": "a"}, "garbage", {"type": "b"})
+    cur = BusCursor(bus, state_path=state)
+    assert [e["type"] for e in cur.read_batch()] == ["a", "b"]
+    assert cur.stats["bad_lines"] == 1
+    assert load_offset(state) == bus.stat().st_size
+    cur.close()
+
+    _emit(bus, {"type": "c"})
+    cur2 = BusCursor(bus, state_path=state, from_end=True)  # el estado manda
+    assert [e["type"] for e in cur2.read_batch()] == ["c"]
+    cur2.close()
+
+
+def test_cursor_publishes_one_read_to_all_subscribers(tmp_path: Path):
+    bus = tmp_path / "lua_eventbus.jsonl"
+    bus.write_text("", encoding="utf-8")
+    cur = shared_cursor(bus, from_end=True)
+    assert shared_cursor(bus) is cur
+    sub = cur.subscribe()
+    seen = []
+    cur.subscribe(seen.extend)
+    # el colector consume con LuaEventBus sobre el mismo cursor
+    lua = LuaEventBus(str(bus), cursor=cur)
+    _emit(bus, {"type": "x", "i": 1}, {"type": "y", "i": 2})
+    assert [e["i"] for e in lua.poll_batch()] == [1, 2]
+    assert [e["i"] for e in sub.drain()] == [1, 2]
+    assert sub.drain() == []
+    assert [e["i"] for e in seen] == [1, 2]
+    assert cur.stats["batches"] == 1
+    lua.close()
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import csv
+import os
 from pathlib import Path
 from typing import List, cast
 
+import pytest
+
 from runtime.csv_logger import CSVLogger, CsvLogger
 
 
@@ -66,3 +69,45 @@ def test_csv_header_and_extension(tmp_path: Path):
     assert set(fields).issubset(set(cols))
     assert rows[-1]["Regulator"] == "0.25"
     assert rows[-1]["VirtualBrake"] == "0.0"
+
+
+def test_csv_persistent_buffered_flush(tmp_path: Path):
+    f = tmp_path / "p.csv"
+    log = CSVLogger(f, delimiter=",", base_order=["a", "b"], persistent=True, flush_rows=3, flush_s=60)
+    log.init_with_fields(["a", "b"])
+    log.write_row({"a": 1, "b": 2})
+    log.write_values((3, 4))
+    # aún en buffer: solo la cabecera (o nada) en disco
+    assert len(f.read_text(encoding="utf-8").splitlines()) <= 1
+    log.write_row({"a": 5, "b": 6, "extra": 9})
+    # flush_rows=3 alcanzado
+    assert f.read_text(encoding="utf-8").splitlines() == ["a,b", "1,2", "3,4", "5,6"]
+    log.write_row({"a": 7})
+    log.close()
+    assert f.read_text(encoding="utf-8").splitlines()[-1] == "7,"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Windows no permite renombrar un fichero abierto")
+def test_csv_persistent_reopens_after_rotation(tmp_path: Path):
+    f = tmp_path / "r.csv"
+    log = CSVLogger(f, delimiter=",", persistent=True, flush_rows=1)
+    log.write_row({"a": 1})
+    rotated = tmp_path / "r_old.csv"
+    f.rename(rotated)
+    log.write_row({"a": 2})  # aún va al handle abierto; el flush detecta la rotación
+    log.write_row({"a": 3})
+    log.close()
+    assert f.read_text(encoding="utf-8").splitlines() == ["a", "3"]
+
+
+def test_csv_from_env_reopen_mode(tmp_path: Path, monkeypatch):
+    # por defecto: una apertura por fila (persistent es opcional)
+    monkeypatch.delenv("TSC_CSV_MODE", raising=False)
+    assert CSVLogger.from_env(tmp_path / "e.csv").persistent is False
+    monkeypatch.setenv("TSC_CSV_MODE", "reopen")
+    log = CSVLogger.from_env(tmp_path / "e.csv")
+    assert log.persistent is False
+    monkeypatch.setenv("TSC_CSV_MODE", "persistent")
+    monkeypatch.setenv("TSC_CSV_FLUSH_ROWS", "7")
+    log = CSVLogger.from_env(tmp_path / "e.csv")
+    assert log.persistent is True and log.flush_rows == 7
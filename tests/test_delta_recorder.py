@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from runtime.csv_logger import CSVLogger
+from runtime.delta_recorder import KEYFRAME_COL, DeltaDecoder, DeltaEncoder, reconstruct
+from tools.run_loader import clear_cache, load_run
+
+FIELDS = ["t_wall", "odom_m", "v_kmh", "Headlights", "SpeedometerKPH", "engine"]
+
+
+def _rows(n=50):
+    for i in range(n):
+        yield {
+            "t_wall": 100.0 + 0.1 * i,
+            "odom_m": 2.0 * i,
+            "v_kmh": 72.0,
+            "Headlights": 1.0 if i >= 30 else 0.0,
+            # ruido por debajo de la banda muerta (0.05)
+            "SpeedometerKPH": 72.0 + (0.01 if i % 2 else 0.0),
+            "engine": "BR146",
+        }
+
+
+def test_encoder_writes_only_changes_between_keyframes():
+    enc = DeltaEncoder(FIELDS, keyframe_s=2.0)
+    out = [enc.encode(r) for r in _rows()]
+    kfs = [i for i, r in enumerate(out) if r[KEYFRAME_COL] == 1]
+    assert kfs == [0, 20, 40]
+    assert set(out[1]) == {"t_wall", "odom_m", "v_kmh", KEYFRAME_COL}
+    assert out[30]["Headlights"] == 1.0 and "Headlights" not in out[31]
+    assert all("SpeedometerKPH" not in r for i, r in enumerate(out) if i not in kfs)
+    assert enc.stats["cells"] < enc.stats["cells_dense"]
+
+
+def test_decoder_and_reconstruct_rebuild_dense_rows():
+    enc = DeltaEncoder(FIELDS, keyframe_s=2.0)
+    dense = list(_rows())
+    recs = [enc.encode(r) for r in dense]
+    dec = DeltaDecoder()
+    rebuilt = [dec.decode(r) for r in recs]
+    for r, d in zip(rebuilt, dense):
+        assert r["Headlights"] == d["Headlights"]
+        assert r["engine"] == "BR146"
+        assert abs(r["SpeedometerKPH"] - d["SpeedometerKPH"]) <= 0.05
+
+    df = reconstruct(pd.DataFrame(recs))
+    assert KEYFRAME_COL not in df.columns
+    assert df["Headlights"].tolist() == [d["Headlights"] for d in dense]
+    assert df["engine"].isna().sum() == 0
+
+
+def test_reconstruct_does_not_cross_keyframes():
+    df = pd.DataFrame(
+        {
+            "t_wall": [1.0, 2.0, 3.0],
+            "x": [5.0, None, None],
+            KEYFRAME_COL: [1, 0, 1],
+        }
+    )
+    out = reconstruct(df)
+    # el keyframe sin valor significa "ausente", no "sin cambios"
+    assert out["x"].tolist()[:2] == [5.0, 5.0] and pd.isna(out["x"].iloc[2])
+
+
+def test_load_run_reconstructs_delta_csv(tmp_path: Path):
+    p = tmp_path / "run.csv"
+    log = CSVLogger(p)
+    log.init_with_fields([*FIELDS, KEYFRAME_COL])
+    enc = DeltaEncoder(FIELDS, keyframe_s=2.0)
+    for r in _rows():
+        log.write_row(enc.encode(r))
+    log.close()
+    clear_cache()
+    df = load_run(p)
+    assert len(df) == 50 and KEYFRAME_COL not in df.columns
+    assert df["Headlights"].tolist() == [d["Headlights"] for d in _rows()]
+    sub = load_run(p, ["t_wall", "Headlights"])
+    assert list(sub.columns) == ["t_wall", "Headlights"]
+    assert sub["Headlights"].isna().sum() == 0
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.dist_next_limit import (checkpoint_path, compute_distances,
+                                   run_incremental)
+
+
+def _append_rows(path: Path, rows, header: bool = False) -> None:
+    with path.open("a", encoding="utf-8") as f:
+        if header:
+            f.write("t_wall;odom_m;speed_kph\n")
+        for t, od, v in rows:
+            f.write(f"{t};{od};{v}\n")
+
+
+def _append_events(path: Path, events) -> None:
+    with path.open("a", encoding="utf-8") as f:
+        for e in events:
+            f.write(json.dumps(e) + "\n")
+
+
+def test_incremental_matches_full_and_advances_checkpoint(tmp_path: Path):
+    run = tmp_path / "run.csv"
+    ev = tmp_path / "events.jsonl"
+    out = tmp_path / "run.dist.csv"
+
+    rows1 = [(float(t), 10.0 * t, 36.0) for t in range(0, 10)]
+    rows2 = [(float(t), 10.0 * t, 36.0) for t in range(10, 20)]
+    events1 = [
+        {"type": "speed_limit_change", "t_wall": 1.0, "odom_m": 50.0, "next": 80},
+        {"type": "speed_limit_change", "t_wall": 2.0, "odom_m": 150.0, "next": 60},
+        {"type": "marker", "t_wall": 12.0},
+    ]
+    events2 = [
+        # sin odómetro: se casa por tiempo con la fila t=18 (odom=180)
+        {"type": "speed_limit_change", "t_wall": 18.0, "next": 40},
+        {"type": "marker", "t_wall": 30.0},
+    ]
+
+    _append_rows(run, rows1, header=True)
+    _append_events(ev, events1)
+    n1 = run_incremental(run, ev, out)
+    # todas las filas tienen t <= 12 (horizonte) y odom < 150 (último límite)
+    assert n1 == 10
+    ck1 = json.loads(checkpoint_path(out).read_text(encoding="utf-8"))
+    assert ck1["run_offset"] == run.stat().st_size
+
+    # línea a medio escribir: no se consume
+    with run.open("a", encoding="utf-8") as f:
+        f.write("10;100;36")
+    assert run_incremental(run, ev, out) == 0
+    with run.open("a", encoding="utf-8") as f:
+        f.write("\n")
+    _append_rows(run, rows2[1:])
+    _append_events(ev, events2)
+    run_incremental(run, ev, out)
+    run_incremental(run, ev, out, finalize=True)
+    ck2 = json.loads(checkpoint_path(out).read_text(encoding="utf-8"))
+    assert ck2["run_offset"] == run.stat().st_size
+
+    inc = pd.read_csv(out)
+    assert len(inc) == 20
+    full, _, _ = compute_distances(
+        pd.read_csv(run, sep=";"), events1 + events2
+    )
+    np.testing.assert_allclose(
+        inc["dist_next_limit_m"].to_numpy(), full["dist_next_limit_m"].to_numpy()
+    )
+    np.testing.assert_allclose(
+        inc["next_limit_kph"].to_numpy(), full["next_limit_kph"].to_numpy()
+    )
+
+
+def test_incremental_holds_rows_beyond_event_horizon(tmp_path: Path):
+    run = tmp_path / "run.csv"
+    ev = tmp_path / "events.jsonl"
+    out = tmp_path / "run.dist.csv"
+    _append_rows(run, [(float(t), 10.0 * t, 36.0) for t in range(5)], header=True)
+    _append_events(
+        ev, [{"type": "speed_limit_change", "t_wall": 2.0, "odom_m": 500.0, "next": 60}]
+    )
+    # t > 2.0 aún puede recibir eventos anteriores en odómetro: se retienen
+    assert run_incremental(run, ev, out) == 3
+    assert run_incremental(run, ev, out) == 0
+    assert run_incremental(run, ev, out, finalize=True) == 2
+    assert pd.read_csv(out)["dist_next_limit_m"].tolist() == pytest.approx(
+        [500.0, 490.0, 480.0, 470.0, 460.0]
+    )
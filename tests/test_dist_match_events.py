@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from tools.dist_next_limit import match_events_without_odom, nearest_time_index
+
+
+def _argmin_reference(t_arr, te):
+    return np.array([int(np.argmin(np.abs(t_arr - x))) for x in te])
+
+
+def test_nearest_time_index_matches_argmin_including_ties():
+    rng = np.random.default_rng(0)
+    # t ordenado (como un run), con repetidos y empates exactos a mitad de camino
+    t = np.sort(np.round(rng.uniform(0, 100, 500), 1))
+    te = np.concatenate([rng.uniform(-5, 105, 300), (t[:50] + t[50:100]) / 2, t[:20]])
+    np.testing.assert_array_equal(nearest_time_index(t, te), _argmin_reference(t, te))
+
+
+def test_nearest_time_index_tie_prefers_earlier_row():
+    t = np.array([0.0, 1.0, 2.0, 2.0, 3.0])
+    assert nearest_time_index(t, np.array([0.5, 2.0, 2.5])).tolist() == [0, 2, 2]
+    # desordenado: el empate lo decide el tiempo, no la posición
+    t = np.array([3.0, 1.0])
+    assert nearest_time_index(t, np.array([2.0])).tolist() == [1]
+
+
+def test_nearest_time_index_ignores_nan_and_rejects_gap():
+    t = np.array([np.nan, 10.0, 20.0, np.nan])
+    assert nearest_time_index(t, np.array([0.0, 14.0, np.nan])).tolist() == [1, 1, -1]
+    assert nearest_time_index(t, np.array([0.0, 14.0]), max_gap_s=5.0).tolist() == [-1, 1]
+
+
+def test_match_events_without_odom_batched():
+    df_t = pd.Series([0.0, 1.0, 2.0, 3.0])
+    df_odom = pd.Series([0.0, 10.0, 20.0, 30.0])
+    events = [
+        {"type": "speed_limit_change", "t_wall": 2.1},
+        {"type": "marker", "t_wall": 0.0},
+        {"type": "speed_limit_change", "odom_m": 99.0},
+        {"type": "speed_limit_change", "t_game": 50.0},
+        {"type": "speed_limit_change"},
+    ]
+    e_odom = np.array([np.nan, 99.0, np.nan, np.nan])
+    out = match_events_without_odom(e_odom, df_t, df_odom, events)
+    assert out[:3].tolist() == [20.0, 99.0, 30.0]
+    assert np.isnan(out[3])
+    out = match_events_without_odom(e_odom, df_t, df_odom, events, max_gap_s=1.0)
+    assert out[0] == 20.0 and np.isnan(out[2])
@@ -18,3 +18,24 @@ def test_normalize_stop():
     n = normalize({"type": "stop_begin", "station": "X", "time": 3.0})
     assert n["type"] in ("stop_begin", "stop_end")
     assert n["station"] == "X"
+
+
+def test_raw_only_for_unknown_types_by_default():
+    n = normalize({"type": "marker_pass", "name": "A"}, raw="unknown")
+    assert "raw" not in n
+    c = normalize({"type": "custom", "payload": {"type": "pzb", "lamp": 1}}, raw="unknown")
+    assert c["type"] == "pzb" and c["raw"]["lamp"] == 1
+    assert "raw" in normalize({"type": "marker_pass", "name": "A"}, raw="all")
+    assert "raw" not in normalize({"type": "weird"}, raw="none")
+
+
+def test_normalize_does_not_mutate_input():
+    nested = {"type": "pzb", "state": {"lamps": [1, 0]}, "t_wall": 9.0}
+    evt = {"type": "custom", "payload": nested, "t_wall": 1.0, "odom_m": 5.0}
+    n = normalize(evt, raw="all")
+    assert evt["payload"] is nested and evt["type"] == "custom"
+    # sellos del colector mandan sobre los del payload
+    assert n["t_wall"] == 1.0 and n["odom_m"] == 5.0
+    assert n["raw"]["state"] == {"lamps": [1, 0]}
+    plain = {"type": "stop_end", "station": "X"}
+    assert normalize(plain, raw="all")["raw"] is not plain
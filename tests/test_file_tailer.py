@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from ingestion.file_tailer import FileTailer
+from ingestion.lua_eventbus import LuaEventBus
+
+
+def _append(path: Path, data: bytes) -> None:
+    with path.open("ab") as f:
+        f.write(data)
+
+
+def test_tailer_keeps_partial_line_until_complete(tmp_path: Path):
+    p = tmp_path / "bus.jsonl"
+    p.write_bytes(b"old\n")
+    t = FileTailer(p, from_end=True)
+    assert t.read_lines() == []
+    _append(p, b"a\nb\r\nc")
+    assert t.read_lines() == [b"a", b"b"]
+    assert t.offset == p.stat().st_size - 1
+    _append(p, b"d\n")
+    assert t.read_lines() == [b"cd"]
+    t.close()
+
+
+def test_tailer_reads_more_than_buffer_in_one_call(tmp_path: Path):
+    p = tmp_path / "bus.jsonl"
+    p.write_bytes(b"")
+    t = FileTailer(p, from_end=False, chunk_size=1024)
+    lines = [b"x" * 100 + str(i).encode() for i in range(200)]
+    _append(p, b"\n".join(lines) + b"\n")
+    assert t.read_lines() == lines
+    t.close()
+
+
+def test_tailer_detects_truncation(tmp_path: Path):
+    p = tmp_path / "bus.jsonl"
+    p.write_bytes(b"")
+    t = FileTailer(p, from_end=False)
+    _append(p, b"one\ntwo\n")
+    assert t.read_lines() == [b"one", b"two"]
+    p.write_bytes(b"x\n")  # truncado y reescrito más corto
+    assert t.read_lines() == [b"x"]
+    assert t.rotations == 1
+    t.close()
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="rename con handle abierto")
+def test_tailer_detects_rotation_and_drains_old_tail(tmp_path: Path):
+    p = tmp_path / "bus.jsonl"
+    p.write_bytes(b"")
+    t = FileTailer(p, from_end=False)
+    _append(p, b"a\n")
+    assert t.read_lines() == [b"a"]
+    _append(p, b"b\n")
+    os.replace(p, tmp_path / "bus.jsonl.1")
+    p.write_bytes(b"c\nd\n")
+    assert t.read_lines() == [b"b", b"c", b"d"]
+    assert t.rotations == 1
+    t.close()
+
+
+def test_tailer_wait_times_out_and_wakes(tmp_path: Path):
+    p = tmp_path / "bus.jsonl"
+    p.write_bytes(b"")
+    t = FileTailer(p, from_end=True)
+    assert t.wait(0.05) is False
+
+    def writer():
+        time.sleep(0.05)
+        _append(p, b"hi\n")
+
+    th = threading.Thread(target=writer)
+    th.start()
+    assert t.wait(2.0) is True
+    th.join()
+    assert t.read_lines() == [b"hi"]
+    t.close()
+
+
+def test_lua_eventbus_poll_batch_drains_everything(tmp_path: Path):
+    p = tmp_path / "data" / "lua_eventbus.jsonl"
+    bus = LuaEventBus(str(p), from_end=True)
+    with p.open("a", encoding="utf-8") as f:
+        for i in range(25):
+            f.write(json.dumps({"type": "marker", "i": i}) + "\n")
+        f.write("no-json\n")
+        f.write('{"type": "partial"')
+    batch = bus.poll_batch()
+    assert [e["i"] for e in batch] == list(range(25))
+    assert bus.poll() is None
+    with p.open("a", encoding="utf-8") as f:
+        f.write("}\n")
+    assert bus.poll() == {"type": "partial"}
+    bus.close()
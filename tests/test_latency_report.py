@@ -0,0 +1,103 @@
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from runtime.latency import carry, stage_latencies_ms, stamp, summarize
+from tools.latency_report import report, telemetry_table
+
+
+def test_stage_latencies_skip_missing_stage_and_total():
+    table = {
+        "ts_ingest": [0.0, 1.0, np.nan],
+        "ts_ctrl_read": [0.010, 1.020, 2.0],
+        "ts_rd_ack": [0.015, 1.030, 2.001],
+    }
+    lat = stage_latencies_ms(table)
+    assert list(lat) == ["ingest->ctrl_read", "ctrl_read->rd_ack", "total"]
+    assert lat["ingest->ctrl_read"] == pytest.approx([10.0, 20.0])
+    # la fila sin ingest cuenta desde su primera etapa presente
+    assert lat["total"] == pytest.approx([15.0, 30.0, 1.0])
+    rows = summarize(lat)
+    assert rows[0]["n"] == 2 and rows[0]["p50_ms"] == pytest.approx(15.0)
+
+
+def test_stamp_and_carry_do_not_overwrite():
+    src = {}
+    t = stamp(src, "ingest")
+    dst = {"ts_ingest": 1.0}
+    carry(src, dst)
+    assert dst["ts_ingest"] == 1.0 and src["ts_ingest"] == t
+
+
+def test_report_joins_run_stamps_by_t_wall(tmp_path: Path):
+    n = 100
+    t_wall = 1_700_000_000.0 + np.arange(n) * 0.1
+    base = np.arange(n) * 0.1
+    run = pd.DataFrame(
+        {"t_wall": t_wall, "ts_ingest": base, "ts_commit": base + 0.001}
+    )
+    run.to_csv(tmp_path / "run.csv", sep=";", index=False)
+    ctrl = pd.DataFrame(
+        {
+            "t_wall": t_wall,
+            "ts_ingest": "",  # fuente SQLite: sin sellos del colector
+            "ts_commit": "",
+            "ts_ctrl_read": base + 0.011,
+            "ts_decision": base + 0.012,
+            "ts_rd_send": base + 0.012,
+            "ts_rd_ack": base + 0.017,
+        }
+    )
+    ctrl.to_csv(tmp_path / "ctrl.csv", index=False)
+    with (tmp_path / "events.jsonl").open("w", encoding="utf-8") as f:
+        for i in range(10):
+            raw = {"ts_bridge_read": i, "ts_bus_write": i + 0.002}
+            ev = {"type": "getdata_next_limit", "raw": raw, "ts_ingest": i + 0.052, "ts_write": i + 0.053}
+            f.write(json.dumps(ev) + "\n")
+
+    rep = report(tmp_path / "ctrl.csv", tmp_path / "run.csv", tmp_path / "events.jsonl")
+    tel = {r["segment"]: r for r in rep["telemetry"]}
+    assert tel["ingest->commit"]["n"] == n
+    assert tel["commit->ctrl_read"]["p50_ms"] == pytest.approx(10.0, abs=1e-3)
+    assert tel["rd_send->rd_ack"]["p99_ms"] == pytest.approx(5.0, abs=1e-3)
+    assert tel["total"]["p95_ms"] == pytest.approx(17.0, abs=1e-3)
+    ev = {r["segment"]: r for r in rep["events"]}
+    assert ev["bus_write->ingest"]["p50_ms"] == pytest.approx(50.0, abs=1e-3)
+
+
+def test_commit_stamp_taken_after_batch_commit(tmp_path: Path):
+    from storage.run_store_sqlite import RunStore
+
+    db = tmp_path / "run.db"
+    rs = RunStore(db, batch_rows=10, batch_ms=50)
+    n = 30
+    t_wall = 1_700_000_000.0 + np.arange(n) * 0.1
+    ingest = []
+    for t in t_wall:
+        ingest.append(time.perf_counter())
+        rs.insert_row({"t_wall": float(t), "odom_m": 0.0})
+    queued_at = time.perf_counter()
+    rs.close()
+
+    ctrl = pd.DataFrame(
+        {
+            "t_wall": t_wall,
+            "ts_ingest": ingest,
+            "ts_commit": "",
+            "ts_ctrl_read": time.perf_counter() + 0.01,
+        }
+    )
+    ctrl.to_csv(tmp_path / "ctrl.csv", index=False)
+    table = telemetry_table(tmp_path / "ctrl.csv", db_path=db)
+    # el sello es el del COMMIT del lote, no el del encolado de la fila
+    assert table["ts_commit"].notna().all()
+    assert (table["ts_commit"] >= table["ts_ingest"]).all()
+    assert table["ts_commit"].iloc[-1] >= queued_at
+    rep = report(tmp_path / "ctrl.csv", db_path=db)
+    tel = {r["segment"]: r for r in rep["telemetry"]}
+    assert tel["ingest->commit"]["n"] == n
+    assert tel["commit->ctrl_read"]["n"] == n
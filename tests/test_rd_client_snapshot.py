@@ -0,0 +1,92 @@
+from collections import Counter
+
+from ingestion.rd_fake import FakeRailDriver
+
+
+class CountingRD(FakeRailDriver):
+    """Fake que cuenta llamadas al driver (sin lectura por lotes)."""
+
+    get_current_controller_values = None  # fuerza la lectura individual
+
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    def get_current_controller_value(self, index_or_name):
+        self.calls[("ctrl", index_or_name)] += 1
+        return super().get_current_controller_value(index_or_name)
+
+    def get_current_coordinates(self):
+        self.calls["coords"] += 1
+        return super().get_current_coordinates()
+
+    def get_current_heading(self):
+        self.calls["heading"] += 1
+        return super().get_current_heading()
+
+
+def _client(rd):
+    from ingestion.rd_client import RDClient
+
+    return RDClient(poll_dt=0.01, rd=rd)
+
+
+def test_read_tick_reads_each_field_once():
+    rd = CountingRD()
+    cli = _client(rd)
+    names = cli._common_controls()
+    rd.calls.clear()
+    row = cli.read_tick(names)
+    ctrl_calls = {k: v for k, v in rd.calls.items() if isinstance(k, tuple)}
+    assert set(ctrl_calls) == {("ctrl", cli.ctrl_index_by_name[n]) for n in names}
+    assert all(v == 1 for v in ctrl_calls.values())
+    assert rd.calls["coords"] == 1 and rd.calls["heading"] == 1
+    for n in names:
+        assert n in row
+    assert row["engine"] == "DB BR146.0"
+    assert "lat" in row and "heading_deg" in row and "time_ingame" in row
+
+
+def test_read_tick_matches_legacy_path():
+    rd = FakeRailDriver()
+    cli = _client(rd)
+    names = cli._common_controls()
+    legacy = cli.read_specials()
+    legacy.update(cli.read_controls(names))
+    row = cli.read_tick(names)
+    assert set(row) == set(legacy)
+    for k in ("Regulator", "VirtualBrake", "VirtualEngineBrakeControl", "provider", "engine"):
+        assert row[k] == legacy[k]
+
+
+def test_control_table_is_reused_and_failures_are_nan():
+    rd = CountingRD()
+    cli = _client(rd)
+    names = ["Regulator", "Reverser", "NoSuchControl"]
+    sel, buf = cli.read_controls_into(names)
+    assert sel == ["Regulator", "Reverser"]
+    sel2, buf2 = cli.read_controls_into(names)
+    assert buf2 is buf
+
+    def boom(idx):
+        raise RuntimeError("dll")
+
+    rd.get_current_controller_value = boom
+    _, vals = cli.read_controls_into(names)
+    assert all(v != v for v in vals)
+
+
+def test_batched_driver_call_is_used():
+    rd = FakeRailDriver()
+    cli = _client(rd)
+    seen = []
+    orig = rd.get_current_controller_values
+
+    def batch(idxs):
+        seen.append(list(idxs))
+        return orig(idxs)
+
+    rd.get_current_controller_values = batch
+    sel, vals = cli.read_controls_into(["Regulator", "Reverser"])
+    assert seen == [[cli.ctrl_index_by_name["Regulator"], cli.ctrl_index_by_name["Reverser"]]]
+    assert list(vals) == [0.3, 1.0]
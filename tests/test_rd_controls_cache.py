@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from ingestion import rd_client
+from ingestion.rd_fake import FakeRailDriver
+
+
+@pytest.fixture(autouse=True)
+def _fresh_memory_cache(monkeypatch):
+    monkeypatch.setattr(rd_client, "_RESOLVED", {})
+
+
+def _count_computes(monkeypatch):
+    calls = {"n": 0}
+    orig = rd_client.RDClient._compute_common_controls
+
+    def counting(self):
+        calls["n"] += 1
+        return orig(self)
+
+    monkeypatch.setattr(rd_client.RDClient, "_compute_common_controls", counting)
+    return calls
+
+
+def test_resolution_is_computed_once_and_persisted(tmp_path, monkeypatch):
+    calls = _count_computes(monkeypatch)
+    cli = rd_client.RDClient(rd=FakeRailDriver())
+    ctrls = cli._common_controls()
+    schema = cli.schema()
+    assert cli._common_controls() == ctrls
+    assert calls["n"] == 1
+    assert set(ctrls) <= set(schema) and "t_wall" in schema
+
+    data = json.loads((tmp_path / "rd_controls.json").read_text(encoding="utf-8"))
+    entry = data["locos"]["DTG.Dresden.DB BR146.0"]
+    assert entry["controls"] == ctrls
+    assert entry["index"] == {n: cli.ctrl_index_by_name[n] for n in ctrls}
+
+    # "reinicio": sin caché en memoria, sale del disco sin recalcular
+    monkeypatch.setattr(rd_client, "_RESOLVED", {})
+    cli2 = rd_client.RDClient(rd=FakeRailDriver())
+    assert cli2.schema() == schema
+    assert calls["n"] == 1
+
+
+def test_changed_controller_list_invalidates(monkeypatch):
+    calls = _count_computes(monkeypatch)
+    cli = rd_client.RDClient(rd=FakeRailDriver())
+    before = cli._common_controls()
+    rd = cli.rd
+    rd._controls_order.append((len(rd._controls_order), "PZB_85"))
+    assert cli.refresh_loco() == "DTG.Dresden.DB BR146.0"
+    after = cli._common_controls()
+    assert "PZB_85" in after and "PZB_85" not in before
+    assert calls["n"] == 2
+
+
+def test_cache_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("TSC_RD_CONTROLS_CACHE", "0")
+    cli = rd_client.RDClient(rd=FakeRailDriver())
+    assert cli.schema()
+    assert not (tmp_path / "rd_controls.json").exists()
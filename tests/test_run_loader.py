@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from storage.columnar import ColumnarRunWriter, columnar_path_for, read_columnar
+from tools.run_loader import detect_delimiter, detect_format, load_run
+
+
+def test_columnar_roundtrip_and_partial_row(tmp_path: Path):
+    p = tmp_path / "run.f64"
+    w = ColumnarRunWriter(p, ["t_wall", "provider", "v_kmh", "Sifa"], flush_rows=2)
+    w.write_row({"t_wall": 1.0, "provider": "DTG", "v_kmh": "36.5", "Sifa": True})
+    w.write_row({"t_wall": 2.0, "v_kmh": "x"})
+    w.write_row({"t_wall": 3.0, "v_kmh": 40})
+    w.close()
+    # fila incompleta (corte a mitad de escritura) se ignora al leer
+    with p.open("ab") as f:
+        f.write(b"\x00" * 5)
+    cols, mat = read_columnar(p)
+    assert cols == ["t_wall", "v_kmh", "Sifa"]
+    assert mat.shape == (3, 3)
+    assert mat[0].tolist() == [1.0, 36.5, 1.0]
+    assert np.isnan(mat[1, 1])
+    # reabrir con el mismo esquema continúa el fichero (y recorta la fila rota)
+    w = ColumnarRunWriter(p, ["t_wall", "provider", "v_kmh", "Sifa"])
+    w.write_row({"t_wall": 4.0})
+    w.close()
+    _, mat = read_columnar(p, ["t_wall"])
+    assert mat[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_schema_change_rotates_file(tmp_path: Path):
+    p = tmp_path / "run.f64"
+    ColumnarRunWriter(p, ["a"]).close()
+    w = ColumnarRunWriter(p, ["a", "b"])
+    w.close()
+    assert w.path.name == "run_1.f64"
+
+
+def test_load_run_prefers_fresh_columnar(tmp_path: Path):
+    csv = tmp_path / "run.csv"
+    csv.write_text("t_wall;v_kmh\n1.0;10\n2.0;20\n", encoding="utf-8")
+    assert detect_delimiter(csv) == ";"
+    df = load_run(csv)
+    assert df["v_kmh"].tolist() == [10, 20]
+
+    w = ColumnarRunWriter(columnar_path_for(csv), ["t_wall", "v_kmh"])
+    for t, v in ((1.0, 10.0), (2.0, 20.0), (3.0, 30.0)):
+        w.write_row({"t_wall": t, "v_kmh": v})
+    w.close()
+    df = load_run(csv)
+    assert df["v_kmh"].tolist() == [10.0, 20.0, 30.0]
+    assert load_run(csv, prefer_columnar=False).shape[0] == 2
+
+    # CSV regenerado después: manda el CSV
+    future = time.time() + 60
+    os.utime(csv, (future, future))
+    assert load_run(csv).shape[0] == 2
+
+
+def test_second_session_after_csv_rotation(tmp_path: Path):
+    csv = tmp_path / "run.csv"
+    f64 = columnar_path_for(csv)
+
+    def session(ts, fresh=False):
+        csv.write_text("t_wall;v_kmh\n" + "".join(f"{t};{t * 10}\n" for t in ts), encoding="utf-8")
+        w = ColumnarRunWriter(f64, ["t_wall", "v_kmh"], fresh=fresh)
+        for t in ts:
+            w.write_row({"t_wall": t, "v_kmh": t * 10})
+        w.close()
+
+    session([1.0, 2.0])
+    # segunda sesión: run.csv rotado y recreado, pero el .f64 sigue acumulando
+    session([100.0, 101.0, 102.0])
+    assert read_columnar(f64)[1].shape[0] == 5
+    assert load_run(csv)["t_wall"].tolist() == [100.0, 101.0, 102.0]
+
+    # con fresh=True (CSV nuevo en el colector) el .f64 vuelve a coincidir
+    session([200.0, 201.0], fresh=True)
+    assert read_columnar(f64)[1].shape[0] == 2
+    assert detect_format(csv).kind == "columnar"
+    assert load_run(csv)["t_wall"].tolist() == [200.0, 201.0]
+
+
+def test_load_run_comma_csv_usecols(tmp_path: Path):
+    csv = tmp_path / "ctrl.csv"
+    csv.write_text("t_wall,speed_kph,phase\n1,50,CRUISE\n", encoding="utf-8")
+    df = load_run(csv, columns=["t_wall", "speed_kph"])
+    assert list(df.columns) == ["t_wall", "speed_kph"]
+
+
+def test_cache_shares_parse_and_invalidates(tmp_path: Path):
+    from tools import run_loader
+
+    run_loader.clear_cache()
+    csv = tmp_path / "c.csv"
+    csv.write_text("t_wall,speed_kph\n1,50\n2,55\n", encoding="utf-8")
+    before = run_loader.stats["parses"]
+    a = load_run(csv)
+    a["speed_kph"] = 0.0  # las copias no contaminan la caché
+    b = load_run(csv)
+    assert run_loader.stats["parses"] == before + 1
+    assert b["speed_kph"].tolist() == [50.0, 55.0]
+    assert b["speed_kph"].dtype == np.float64
+    # el fichero cambia (tamaño/mtime) -> se vuelve a parsear
+    csv.write_text("t_wall,speed_kph\n1,50\n2,55\n3,60\n", encoding="utf-8")
+    assert len(load_run(csv)) == 3
+    assert run_loader.stats["parses"] == before + 2
+
+
+def test_decimal_comma_falls_back_to_loose(tmp_path: Path):
+    csv = tmp_path / "d.csv"
+    csv.write_text('t_wall;v_kmh;phase\n1;"36,5";CRUISE\n2;1.234,5;BRAKE\n', encoding="utf-8")
+    df = load_run(csv)
+    assert df["v_kmh"].tolist() == [36.5, 1234.5]
+    assert df["phase"].tolist() == ["CRUISE", "BRAKE"]
+
+
+def test_to_float_loose_shared():
+    from runtime.control_loop import _to_float_loose
+    from runtime.parsing import to_float_loose, to_float_or_none
+    from tools.migrate_run_csv_to_sqlite import to_float_loose as mig
+
+    assert to_float_loose("1.234.567") == 1234567.0
+    assert to_float_loose("'2,5'") == 2.5
+    assert np.isnan(to_float_loose("abc"))
+    assert _to_float_loose is to_float_loose
+    assert to_float_or_none("") is None and mig("3") == 3.0
+
+
+def test_plot_run_reader_via_loader(tmp_path: Path):
+    from tools.plot_run import read_run_csv
+
+    csv = tmp_path / "run.csv"
+    csv.write_text(
+        "time_ingame_h;time_ingame_m;v_kmh;SpeedometerKPH;odom_m;brake;phase\n"
+        "1;30;;42;10;;COAST\n"
+        "1;31;50;;;0.2;\n",
+        encoding="utf-8",
+    )
+    r = read_run_csv(str(csv))
+    assert r["t_ing"] == [1.5, 1.0 + 31 / 60.0]
+    assert r["v_kmh"] == [42.0, 50.0]
+    assert r["odom"] == [10.0, 0.0]
+    assert r["brake"] == [None, 0.2]
+    assert r["throttle"] == [None, None]
+    assert r["phase"] == ["COAST", None]
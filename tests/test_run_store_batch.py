@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from storage import RunStore
+from storage.run_store_sqlite import _STOP
+
+
+def _row(t: float) -> dict:
+    return {"t_wall": t, "odom_m": t * 10.0, "speed_kph": 50.0, "meta": {}}
+
+
+def _count(db: Path) -> int:
+    con = sqlite3.connect(db.as_posix())
+    try:
+        return con.execute("SELECT COUNT(*) FROM telemetry").fetchone()[0]
+    finally:
+        con.close()
+
+
+def test_batch_flush_and_close_persist_rows(tmp_path: Path):
+    db = tmp_path / "batch.db"
+    rs = RunStore(db, batch_rows=10, batch_ms=10_000)
+    assert rs.batched
+    for i in range(25):
+        rs.insert_row(_row(float(i)))
+    assert rs.flush(timeout=5.0)
+    assert _count(db) == 25
+    latest = rs.latest_since(0)
+    assert latest is not None and latest[1]["t_wall"] == 24.0
+
+    rs.insert_row(_row(99.0))
+    rs.close()
+    assert _count(db) == 26
+    assert rs.stats["written"] == 26
+    assert rs.stats["dropped"] == 0
+
+
+def test_batch_time_deadline_flushes(tmp_path: Path):
+    import time
+
+    db = tmp_path / "deadline.db"
+    rs = RunStore(db, batch_rows=1000, batch_ms=20)
+    rs.insert_row(_row(1.0))
+    t_end = time.monotonic() + 2.0
+    while _count(db) < 1 and time.monotonic() < t_end:
+        time.sleep(0.01)
+    assert _count(db) == 1
+    rs.close()
+
+
+def _stop_writer(rs: RunStore) -> None:
+    """Para el hilo escritor: la cola ya no se vacía sola (pruebas deterministas)."""
+    rs._queue.put(_STOP)
+    rs._writer.join(5.0)
+    assert not rs._writer.is_alive()
+
+
+def test_drop_oldest_when_queue_full(tmp_path: Path):
+    db = tmp_path / "full.db"
+    rs = RunStore(db, batch_rows=1000, batch_ms=10_000, queue_max=5)
+    _stop_writer(rs)
+    for i in range(50):
+        rs.insert_row(_row(float(i)))
+    assert rs.stats["dropped"] == 45
+    rs.close()
+    con = sqlite3.connect(db.as_posix())
+    ts = [r[0] for r in con.execute("SELECT t_wall FROM telemetry ORDER BY rowid")]
+    con.close()
+    # drop_oldest conserva las filas más recientes
+    assert ts == [45.0, 46.0, 47.0, 48.0, 49.0]
+
+
+def test_flush_without_writer_drains_synchronously(tmp_path: Path):
+    import time
+
+    db = tmp_path / "dead.db"
+    rs = RunStore(db, batch_rows=1000, batch_ms=10_000, queue_max=5)
+    _stop_writer(rs)
+    for i in range(5):
+        rs.insert_row(_row(float(i)))
+    # cola llena y sin escritor: flush no se cuelga y escribe en este hilo
+    t0 = time.monotonic()
+    assert rs.flush(timeout=1.0)
+    assert time.monotonic() - t0 < 1.0
+    assert _count(db) == 5
+    rs.close()
+
+
+def test_invalid_on_full_policy(tmp_path: Path):
+    with pytest.raises(ValueError):
+        RunStore(tmp_path / "x.db", batch_rows=5, on_full="explode")
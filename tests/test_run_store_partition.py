@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from storage import RunStore, TelemetryReader
+
+
+def _count(db: Path, table: str = "telemetry") -> int:
+    con = sqlite3.connect(db.as_posix())
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        con.close()
+
+
+def test_new_session_archives_previous_run(tmp_path: Path):
+    db = tmp_path / "run.db"
+    arch = tmp_path / "archive"
+    rs = RunStore(db, archive_dir=arch)
+    r1 = rs.begin_run(["Sifa"])
+    for i in range(20):
+        rs.insert_row({"t_wall": float(i), "Sifa": 1})
+    rs.close()
+
+    reader = TelemetryReader(db)
+    assert reader.latest_since(0)[0] == 20
+
+    rs = RunStore(db, archive_dir=arch)
+    r2 = rs.begin_run(["Sifa", "Heading"])
+    part = rs.partition_path(r1)
+    assert part.exists()
+    assert _count(part) == 20
+    assert _count(db) == 0
+    rs.insert_row({"t_wall": 100.0, "Sifa": 0, "Heading": 3})
+    # el lector detecta el reinicio de rowid y sigue leyendo
+    latest = reader.latest_since(20)
+    assert latest is not None and latest[1]["t_wall"] == 100.0
+    archived = rs.con.execute("SELECT archive_path FROM runs WHERE run_id=?", (r1,)).fetchone()[0]
+    assert archived == part.as_posix()
+    rs.close()
+    reader.close()
+
+    # la partición lleva su fila de runs para ser autocontenida
+    con = sqlite3.connect(part.as_posix())
+    assert con.execute("SELECT run_id FROM runs").fetchall() == [(r1,)]
+    con.close()
+    assert r2 == r1 + 1
+
+
+def test_rotate_keeps_live_tail(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db, archive_dir=tmp_path / "a", keep_live_rows=5)
+    rid = rs.begin_run([])
+    for i in range(30):
+        rs.insert_row({"t_wall": float(i)})
+    moved = rs.rotate()
+    assert moved == 25
+    assert _count(db) == 5
+    assert _count(rs.partition_path(rid)) == 25
+    # segunda rotación añade a la misma partición
+    for i in range(30, 40):
+        rs.insert_row({"t_wall": float(i)})
+    rs.rotate()
+    assert _count(rs.partition_path(rid)) == 35
+    assert rs.latest_since(0)[1]["t_wall"] == 39.0
+    rs.close()
+
+
+def test_retention_by_count_and_age(tmp_path: Path):
+    arch = tmp_path / "a"
+    arch.mkdir()
+    now = time.time()
+    for i in range(5):
+        p = arch / f"run_{i:06d}.db"
+        sqlite3.connect(p.as_posix()).close()
+        os.utime(p, (now - (5 - i) * 86400, now - (5 - i) * 86400))
+    rs = RunStore(tmp_path / "run.db", archive_dir=arch, retention_keep=3)
+    gone = rs.apply_retention(now=now)
+    assert sorted(p.name for p in gone) == ["run_000000.db", "run_000001.db"]
+    rs.retention_keep = 0
+    rs.retention_days = 2.5
+    gone = rs.apply_retention(now=now)
+    assert [p.name for p in gone] == ["run_000002.db"]
+    assert sorted(p.name for p in arch.glob("run_*.db")) == ["run_000003.db", "run_000004.db"]
+    rs.close()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+from storage import RunStore
+
+
+def _cols(db: Path) -> list:
+    con = sqlite3.connect(db.as_posix())
+    try:
+        return [r[1] for r in con.execute("PRAGMA table_info(telemetry)")]
+    finally:
+        con.close()
+
+
+def test_migrates_legacy_db(tmp_path: Path):
+    db = tmp_path / "legacy.db"
+    con = sqlite3.connect(db.as_posix())
+    con.execute(
+        "CREATE TABLE telemetry (t_wall REAL NOT NULL, odom_m REAL, speed_kph REAL, "
+        "next_limit_kph REAL, dist_next_limit_m REAL, meta_json TEXT)"
+    )
+    con.execute("INSERT INTO telemetry(t_wall, speed_kph) VALUES (1.0, 30.0)")
+    con.commit()
+    con.close()
+
+    rs = RunStore(db)
+    assert "run_id" in _cols(db)
+    assert rs.con.execute("PRAGMA user_version").fetchone()[0] >= 2
+    # los datos previos siguen accesibles
+    latest = rs.latest_since(0)
+    assert latest is not None and latest[1]["speed_kph"] == 30.0
+    rs.close()
+
+
+def test_begin_run_projects_controls(tmp_path: Path):
+    db = tmp_path / "proj.db"
+    rs = RunStore(db)
+    fields = ["t_wall", "odom_m", "provider", "BrakePipePressureBAR", "PZB 1000Hz", "gradient"]
+    run_id = rs.begin_run(fields, provider="fake")
+    cols = _cols(db)
+    assert "BrakePipePressureBAR" in cols
+    assert "PZB_1000Hz" in cols
+    assert "gradient" in cols
+    assert "provider" not in cols
+
+    rs.insert_row(
+        {"t_wall": 1.0, "BrakePipePressureBAR": 4.8, "PZB 1000Hz": True, "gradient": "-0.5"}
+    )
+    rs.update_run(product="Route", engine="BR101")
+    rs.close()
+
+    con = sqlite3.connect(db.as_posix())
+    r = con.execute(
+        'SELECT run_id, BrakePipePressureBAR, "PZB_1000Hz", gradient FROM telemetry'
+    ).fetchone()
+    assert r == (run_id, 4.8, 1.0, -0.5)
+    info = con.execute(
+        "SELECT provider, product, engine, ended_at FROM runs WHERE run_id=?", (run_id,)
+    ).fetchone()
+    con.close()
+    assert info[:3] == ("fake", "Route", "BR101")
+    assert info[3] is not None
+
+
+def test_second_run_reuses_columns_batched(tmp_path: Path):
+    db = tmp_path / "two.db"
+    rs = RunStore(db, batch_rows=4, batch_ms=10_000)
+    r1 = rs.begin_run(["Sifa"])
+    rs.insert_row({"t_wall": 1.0, "Sifa": 1})
+    r2 = rs.begin_run(["Sifa", "Heading"])
+    rs.insert_row({"t_wall": 2.0, "Sifa": 0, "Heading": 90})
+    rs.close()
+    assert r2 == r1 + 1
+    con = sqlite3.connect(db.as_posix())
+    rows = con.execute("SELECT run_id, Sifa, Heading FROM telemetry ORDER BY rowid").fetchall()
+    con.close()
+    assert rows == [(r1, 1.0, None), (r2, 0.0, 90.0)]
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from runtime.scheduler import DeadlineScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, dt):
+        self.sleeps.append(dt)
+        self.t += dt
+
+
+def test_deadlines_absorb_work_time_without_drift():
+    clk = FakeClock()
+    s = DeadlineScheduler(hz=10, clock=clk, sleep=clk.sleep)
+    s.wait()  # arranca la rejilla en t=100
+    for _ in range(50):
+        clk.t += 0.03  # trabajo del ciclo
+        s.wait()
+    # 50 periodos exactos: el trabajo no se suma al periodo
+    assert clk.t == pytest.approx(105.0)
+    assert all(d == pytest.approx(0.07) for d in clk.sleeps)
+    assert s.stats["overruns"] == 0 and s.stats["cycles"] == 51
+
+
+def test_skip_policy_realigns_to_grid():
+    clk = FakeClock()
+    s = DeadlineScheduler(period_s=0.1, policy="skip", clock=clk, sleep=clk.sleep)
+    s.wait()
+    clk.t += 0.35  # overrun: plazos 100.1, 100.2, 100.3 perdidos
+    late = s.wait()
+    assert s.stats["overruns"] == 1 and s.stats["skipped"] == 2
+    assert late == pytest.approx(0.05)
+    s.wait()  # el siguiente plazo sigue en la rejilla original
+    assert clk.t == pytest.approx(100.4)
+
+
+def test_catchup_policy_runs_late_cycles_back_to_back():
+    clk = FakeClock()
+    s = DeadlineScheduler(period_s=0.1, policy="catchup", clock=clk, sleep=clk.sleep)
+    s.wait()
+    clk.t += 0.35
+    for _ in range(3):
+        s.wait()  # 100.1, 100.2, 100.3 sin dormir
+    assert clk.sleeps == []
+    s.wait()
+    assert clk.t == pytest.approx(100.4)
+    assert s.stats["skipped"] == 0
+
+
+def test_real_clock_rate_matches_configured_hz():
+    s = DeadlineScheduler(hz=100)
+    t0 = time.perf_counter()
+    s.wait()
+    for _ in range(20):
+        time.sleep(0.004)  # trabajo
+        s.wait()
+    elapsed = time.perf_counter() - t0
+    # 20 periodos de 10 ms; con sleep tras el trabajo serían ~280 ms
+    assert elapsed < 0.26
+    assert "p99" in s.jitter_percentiles()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        DeadlineScheduler()
+    with pytest.raises(ValueError):
+        DeadlineScheduler(hz=10, policy="nope")
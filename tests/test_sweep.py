@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools import sweep
+from tools.sweep import (ROOT, cache_key, code_files, code_version,
+                         parse_param, run_sweep, sample_grid, sample_lhs,
+                         sample_random, write_summary)
+
+
+@pytest.fixture()
+def run_files(tmp_path):
+    n = 300  # 1 min a 5 Hz
+    t = 1000.0 + np.arange(n) * 0.2
+    run = tmp_path / "run.csv"
+    pd.DataFrame({"t_wall": t, "odom_m": np.arange(n) * 100 / 3.6 * 0.2, "speed_kph": 100.0}).to_csv(
+        run, index=False
+    )
+    events = tmp_path / "events.jsonl"
+    events.write_text(
+        json.dumps({"type": "getdata_next_limit", "t_wall": 1002.0, "kph": 60.0, "dist_m": 1200.0}) + "\n",
+        encoding="utf-8",
+    )
+    return run, events
+
+
+def test_grid_is_cartesian_product():
+    combos = sample_grid({"rise_per_s": [0.1, 0.2, 0.3], "hold_s": [0.1, 0.5]})
+    assert len(combos) == 6
+    assert {"rise_per_s": 0.3, "hold_s": 0.5} in combos
+
+
+def test_random_and_lhs_within_bounds_and_seeded():
+    space = {"rise_per_s": [0.05, 1.5], "hold_s": [0.1, 1.0]}
+    for fn in (sample_random, sample_lhs):
+        a = fn(space, 20, 7)
+        assert a == fn(space, 20, 7)
+        assert a != fn(space, 20, 8)
+        assert all(0.05 <= c["rise_per_s"] <= 1.5 and 0.1 <= c["hold_s"] <= 1.0 for c in a)
+
+
+def test_lhs_one_sample_per_stratum():
+    n = 10
+    combos = sample_lhs({"rise_per_s": [0.0, 1.0], "hold_s": [0.0, 1.0]}, n, 3)
+    for name in ("rise_per_s", "hold_s"):
+        strata = sorted(int(c[name] * n) for c in combos)
+        assert strata == list(range(n))
+
+
+def test_unknown_param_rejected():
+    with pytest.raises(ValueError):
+        sample_grid({"bogus": [1.0]})
+
+
+def test_parse_param():
+    assert parse_param("rise-per-s=0.1,0.2") == ("rise_per_s", [0.1, 0.2])
+    assert parse_param("hold_s=0.1:1") == ("hold_s", [0.1, 1.0])
+
+
+def test_cache_key_depends_on_inputs():
+    base = cache_key("r", "e", {"hold_s": 0.1}, {"hz": 5.0}, "c")
+    assert base == cache_key("r", "e", {"hold_s": 0.1}, {"hz": 5.0}, "c")
+    assert base != cache_key("r2", "e", {"hold_s": 0.1}, {"hz": 5.0}, "c")
+    assert base != cache_key("r", "e", {"hold_s": 0.2}, {"hz": 5.0}, "c")
+    assert base != cache_key("r", "e", {"hold_s": 0.1}, {"hz": 5.0}, "c2")
+
+
+def test_code_version_covers_evaluation_dependencies(monkeypatch):
+    files = {p.relative_to(ROOT).as_posix() for p in code_files()}
+    for dep in (
+        "runtime/control_loop.py",
+        "runtime/mode_guard.py",
+        "runtime/braking_era.py",
+        "runtime/parsing.py",
+        "ingestion/rd_fake.py",
+        "tools/run_loader.py",
+        "tools/replay_sim.py",
+        "tools/validate_kpi.py",
+    ):
+        assert dep in files
+    assert not any(f.startswith("tests/") for f in files)
+
+    base = code_version()
+    target = (ROOT / "runtime/mode_guard.py").resolve()
+    real = sweep.file_sha256
+    monkeypatch.setattr(sweep, "file_sha256", lambda p: "x" if Path(p).resolve() == target else real(p))
+    assert code_version() != base
+
+
+def test_sweep_parallel_matches_serial_and_caches(run_files, tmp_path, monkeypatch):
+    run, events = run_files
+    combos = sample_grid({"rise_per_s": [0.1, 1.2], "hold_s": [0.2]})
+    serial = run_sweep(run, combos, events, workers=1, cache_dir=None)
+    cache = tmp_path / "cache"
+    par = run_sweep(run, combos, events, workers=2, cache_dir=cache)
+    assert (par["error"] == "").all()
+    assert not par["cached"].any()
+    cols = ["rise_per_s", "hold_s", "brake_mean", "rd_zero_count", "arrivals"]
+    pd.testing.assert_frame_equal(serial[cols], par[cols])
+    assert len(list(cache.glob("*.json"))) == 2
+
+    # segunda pasada: todo de caché, sin evaluar
+    monkeypatch.setattr(sweep, "evaluate", lambda job: pytest.fail("no debería evaluar"))
+    again = run_sweep(run, combos, events, workers=2, cache_dir=cache)
+    assert again["cached"].all()
+    pd.testing.assert_frame_equal(again[cols], par[cols])
+
+
+def test_write_summary_csv(tmp_path):
+    df = pd.DataFrame({"rise_per_s": [0.1], "arrivals_ok": [1.0]})
+    out = write_summary(df, tmp_path / "s.csv")
+    assert pd.read_csv(out).equals(df)
+    pq = write_summary(df, tmp_path / "s.parquet")
+    assert pq.suffix in (".parquet", ".csv") and pq.exists()
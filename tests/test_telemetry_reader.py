@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from runtime.control_loop import ControlLoop
+from storage import RunStore, TelemetryReader
+
+
+def _row(t: float, v: float = 40.0) -> dict:
+    return {"t_wall": t, "odom_m": t, "speed_kph": v, "meta": {}}
+
+
+def test_reader_missing_db_then_incremental(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rd = TelemetryReader(db)
+    # la base aún no existe: no falla, devuelve vacío
+    assert rd.latest() is None
+    assert rd.read_new() == []
+
+    rs = RunStore(db)
+    rs.insert_row(_row(1.0))
+    rs.insert_row(_row(2.0))
+    new = rd.read_new()
+    assert [s.t_wall for s in new] == [1.0, 2.0]
+    assert rd.read_new() == []
+
+    rs.insert_row(_row(3.0, v=55.0))
+    new = rd.read_new()
+    assert len(new) == 1 and new[0].speed_kph == 55.0
+
+    latest = rd.latest_since(0)
+    assert latest is not None
+    rowid, data = latest
+    assert rowid == new[0].rowid and data["t_wall"] == 3.0
+    assert rd.latest_since(rowid) is None
+    rd.close()
+    rs.close()
+
+
+def test_reader_reuses_connection(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db)
+    rs.insert_row(_row(1.0))
+    rd = TelemetryReader(db)
+    rd.latest()
+    con = rd._con
+    for i in range(5):
+        rs.insert_row(_row(2.0 + i))
+        assert rd.latest().t_wall == 2.0 + i
+    assert rd._con is con
+    assert rd.reconnects == 0
+    rd.close()
+    rs.close()
+
+
+def test_control_loop_reads_sqlite(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db)
+    now = time.time()
+    rs.insert_row(_row(now, v=72.0))
+    cl = ControlLoop(source="sqlite", db_path=str(db))
+    data = cl._read_from_sqlite()
+    assert data is not None
+    assert data["speed_kph"] == 72.0
+    assert "rowid" not in data
+    rs.close()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from scripts import db_health_prometheus
+from storage import RunStore
+from storage.wal_checkpoint import WalCheckpointer, read_status, wal_size_bytes
+
+
+def _fill(rs: RunStore, n: int) -> None:
+    for i in range(n):
+        rs.insert_row({"t_wall": float(i), "meta": {"pad": "x" * 200}})
+
+
+def test_size_threshold_triggers_truncate(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db)
+    # evita que el autocheckpoint de SQLite vacíe el WAL por su cuenta
+    rs.con.execute("PRAGMA wal_autocheckpoint=0")
+    _fill(rs, 300)
+    assert wal_size_bytes(db) > 0
+    ck = WalCheckpointer(db, interval_s=0, wal_max_mb=0, truncate_mb=0.0001)
+    assert ck.tick() == "TRUNCATE"
+    assert wal_size_bytes(db) == 0
+    st = read_status(ck.status_path)
+    assert st["checkpoints_total"] == 1
+    assert st["last_mode"] == "TRUNCATE"
+    assert st["last_log_frames"] >= 0
+    assert st["wal_bytes_max"] > 0
+    ck.stop()
+    rs.close()
+
+
+def test_interval_passive_and_invalid_mode(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db)
+    ck = WalCheckpointer(db, interval_s=0.0001, wal_max_mb=0, truncate_mb=0)
+    import time
+
+    time.sleep(0.01)
+    assert ck.tick() == "PASSIVE"
+    with pytest.raises(ValueError):
+        ck.checkpoint("NOPE")
+    ck.stop()
+    rs.close()
+
+
+def test_truncate_with_active_reader_does_not_block_writer(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db)
+    rs.con.execute("PRAGMA wal_autocheckpoint=0")
+    _fill(rs, 100)
+    reader = sqlite3.connect(db.as_posix(), isolation_level=None)
+    reader.execute("BEGIN")
+    reader.execute("SELECT COUNT(*) FROM telemetry").fetchone()
+    _fill(rs, 100)  # frames posteriores a la instantánea del lector
+    ck = WalCheckpointer(db, interval_s=0, wal_max_mb=0, truncate_mb=0.0001)
+    # el checkpoint no necesita el lock del escritor (otro hilo lo tiene tomado)
+    held, release = threading.Event(), threading.Event()
+
+    def writer_busy():
+        with rs._lock:
+            held.set()
+            release.wait(5.0)
+
+    th = threading.Thread(target=writer_busy)
+    th.start()
+    held.wait(5.0)
+    t0 = time.perf_counter()
+    ck.checkpoint("TRUNCATE")
+    assert time.perf_counter() - t0 < 1.0
+    release.set()
+    th.join()
+    assert ck.stats["busy_total"] == 1
+    assert wal_size_bytes(db) > 0
+    _fill(rs, 10)
+    reader.execute("COMMIT")
+    reader.close()
+    ck.checkpoint("TRUNCATE")
+    assert wal_size_bytes(db) == 0
+    ck.stop()
+    rs.close()
+
+
+def test_runstore_checkpointer_metrics_in_prom(tmp_path: Path):
+    db = tmp_path / "run.db"
+    rs = RunStore(db, checkpoint_s=0.0001)
+    rs.checkpointer.poll_s = 0.01
+    _fill(rs, 20)
+    rs.checkpointer.checkpoint("PASSIVE")
+    rs.close()
+    out = tmp_path / "m.prom"
+    db_health_prometheus.render_prom_file(db, out)
+    txt = out.read_text(encoding="utf-8")
+    assert "trainsim_db_wal_bytes{" in txt
+    assert "trainsim_db_wal_checkpoints_total{" in txt
+    assert "trainsim_db_wal_checkpoint_duration_seconds{" in txt
+
+
+def test_prom_skips_non_numeric_wal_stats(tmp_path: Path):
+    db = tmp_path / "run.db"
+    RunStore(db).close()
+    st = tmp_path / "run.db.walstats.json"
+    st.write_text('{"checkpoints_total": 3, "busy_total": "n/a", "last_mode": "PASSIVE"}', encoding="utf-8")
+    out = tmp_path / "m.prom"
+    db_health_prometheus.render_prom_file(db, out, wal_status_path=st)
+    txt = out.read_text(encoding="utf-8")
+    assert 'trainsim_db_wal_checkpoints_total{db="' in txt
+    assert "trainsim_db_wal_checkpoint_busy_total" not in txt
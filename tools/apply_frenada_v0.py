@@ -8,9 +8,10 @@ from typing import Optional
 import numpy as np
 import pandas as pd
 
-from runtime.braking_era import EraCurve, compute_target_speed_kph_era
+from runtime.braking_era import PHASES, compute_target_speed_kph_era_array, load_era_curve
 from runtime.braking_v0 import BrakingConfig, compute_target_speed_kph
 from runtime.profiles import load_braking_profile, load_profile_extras
+from tools.run_loader import load_run
 
 """
 Herramienta CLI para aplicar la frenada v0 / ERA a un run/dist CSV.
@@ -18,8 +19,8 @@ Herramienta CLI para aplicar la frenada v0 / ERA a un run/dist CSV.
 
 
 def _read_csv_auto(path: Path) -> pd.DataFrame:
-    # sep=None pide a pandas detectar delimitador (soporta ';' y ',')
-    return pd.read_csv(path, sep=None, engine="python")
+    # cargador compartido (';' o ',' detectado por cabecera; columnar si existe)
+    return load_run(path)
 
 
 def _pick_series(df: pd.DataFrame, *cands: str) -> Optional[pd.Series]:
@@ -133,31 +134,21 @@ def main() -> None:
 
     # Curva ERA (precedencia: --era-curve > perfil > None)
     era_curve_path = args.era_curve or extras.get("era_curve_csv")
-    curve = EraCurve.from_csv(era_curve_path) if era_curve_path else None
+    curve = load_era_curve(era_curve_path) if era_curve_path else None
 
+    phase = None
     if curve is not None:
-        tgt: list[float] = []
-        phase: list[str] = []
-        v_arr = v_kph.to_numpy(dtype=float, copy=False)
-        for i in range(len(v_arr)):
-            v_now = float(v_arr[i])
-            d_val = float(dist_arr[i]) if i < len(dist_arr) else np.nan
-            lim_val = None
-            if lim_arr is not None and i < len(lim_arr):
-                lim_val = float(lim_arr[i])
-                if np.isnan(lim_val):
-                    lim_val = None
-            d_opt = None if np.isnan(d_val) else d_val
-            if lim_val is None:
-                # Sin límite a la vista: mantener
-                v_t, ph = v_now, "CRUISE"
-            else:
-                v_t, ph = compute_target_speed_kph_era(
-                    v_now, lim_val, d_opt, curve=curve, cfg=cfg
-                )
-            tgt.append(v_t)
-            phase.append(ph)
-        v_max_kph = np.asarray(tgt, dtype=float)
+        # toda la serie de una vez (sin bucle por fila)
+        grad = _pick_series(df, "gradient", "gradient_pct")
+        v_max_kph, phase_codes = compute_target_speed_kph_era_array(
+            v_kph.to_numpy(dtype=float, copy=False),
+            lim_arr,
+            dist_arr,
+            curve=curve,
+            gradient_pct=None if grad is None else pd.to_numeric(grad, errors="coerce").to_numpy(dtype=float),
+            cfg=cfg,
+        )
+        phase = np.asarray(PHASES, dtype=object)[phase_codes]
     else:
         v_max_kph = compute_target_speed_kph(
             v_kph.to_numpy(dtype=float, copy=False),
@@ -178,11 +169,8 @@ def main() -> None:
         out_df["next_limit_kph"] = df["next_limit_kph"]
     out_df["ctrl_vmax_kph"] = v_max_kph
     out_df["ctrl_needs_brake"] = needs_brake
-    try:
-        if curve is not None:
-            out_df["ctrl_phase"] = phase  # type: ignore[name-defined]
-    except Exception:
-        pass
+    if phase is not None:
+        out_df["ctrl_phase"] = phase
 
     # Escribir con separador ';' para compatibilidad con tools/plot_run.py
     args.out.parent.mkdir(parents=True, exist_ok=True)
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
 import argparse
+import io
 import json
 import re
+import sys
 from pathlib import Path
 from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/dist_next_limit.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from runtime.parsing import sniff_delimiter, to_float_loose_series  # noqa: E402
+from tools.run_loader import load_run  # noqa: E402
+
 RUNS_DIR = Path("data/runs")
 EVENTS_PATH = Path("data/events/events.jsonl")
 
@@ -53,14 +62,9 @@ def _load_events_jsonl(path: Path) -> list[dict]:
     return ev
 
 
-def dist_from_getdata_probes(df: pd.DataFrame, ev_path: Path) -> Optional[pd.Series]:
-    """
-    Construye una serie dist_next_limit_m alineada con df a partir de eventos
-    normalizados getdata_next_limit (que traen meta.dist_m).
-    Requiere que df tenga 't_wall' (float) y que events.jsonl haya sido normalizado.
-    """
-    events = _load_events_jsonl(ev_path)
-    rows: list[dict] = []
+def extract_probes(events: list[dict]) -> List[Tuple[float, float]]:
+    """(t_wall, dist_m) de los eventos normalizados getdata_next_limit."""
+    out: List[Tuple[float, float]] = []
     for e in events:
         if str(e.get("type")) != "getdata_next_limit":
             continue
@@ -68,26 +72,46 @@ def dist_from_getdata_probes(df: pd.DataFrame, ev_path: Path) -> Optional[pd.Ser
         meta = e.get("meta") or {}
         dist = meta.get("dist_m")
         if isinstance(t, (int, float)) and isinstance(dist, (int, float)):
-            rows.append({"t_wall": float(t), "dist_m": float(dist)})
-    if not rows:
+            out.append((float(t), float(dist)))
+    return out
+
+
+def _align_probes(df: pd.DataFrame, probes: List[Tuple[float, float]]) -> Optional[pd.Series]:
+    if not probes:
+        return None
+    if "t_wall" not in df.columns:
         return None
-    probes = (
-        pd.DataFrame(rows)
+    t = pd.to_numeric(df["t_wall"], errors="coerce").astype(float)
+    if t.isna().all():
+        return None
+    pr = (
+        pd.DataFrame(probes, columns=["t_wall", "dist_m"])
         .sort_values("t_wall")
         .drop_duplicates(subset=["t_wall"], keep="last")
     )
-    if "t_wall" not in df.columns or df["t_wall"].isna().all():
-        return None
     # Alinear por tiempo real con merge_asof (sample&hold)
-    s = pd.merge_asof(
-        df[["t_wall"]].sort_values("t_wall"),
-        probes,
-        on="t_wall",
-        direction="backward",
-        allow_exact_matches=True,
-    )["dist_m"]
-    s.index = df.index  # restaurar índice original
-    return s
+    left = pd.DataFrame({"t_wall": t.to_numpy(), "_pos": np.arange(len(t))})
+    left = left.dropna(subset=["t_wall"]).sort_values("t_wall")
+    m = pd.merge_asof(
+        left, pr, on="t_wall", direction="backward", allow_exact_matches=True
+    )
+    vals = np.full(len(t), np.nan)
+    vals[m["_pos"].to_numpy()] = m["dist_m"].to_numpy(dtype=float)
+    return pd.Series(vals, index=df.index, name="dist_m")
+
+
+def dist_from_getdata_probes(
+    df: pd.DataFrame, ev_path: Path, events: Optional[list[dict]] = None
+) -> Optional[pd.Series]:
+    """
+    Construye una serie dist_next_limit_m alineada con df a partir de eventos
+    normalizados getdata_next_limit (que traen meta.dist_m).
+    Requiere que df tenga 't_wall' (float) y que events.jsonl haya sido normalizado.
+    Si se pasan ``events`` ya cargados no se vuelve a leer ``ev_path``.
+    """
+    if events is None:
+        events = _load_events_jsonl(ev_path)
+    return _align_probes(df, extract_probes(events))
 
 
 def pick_series(df: pd.DataFrame, *candidates: str) -> Optional[pd.Series]:
@@ -168,33 +192,82 @@ def extract_limit_events(events: list[dict]) -> Tuple[np.ndarray, np.ndarray]:
     return e_odom_arr, e_next_arr
 
 
+def _event_time(ev: dict) -> Optional[float]:
+    for k in ("t_wall", "t_game", "t_ingame", "time"):
+        if k in ev and ev[k] is not None:
+            try:
+                return float(ev[k])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def nearest_time_index(
+    t_arr: np.ndarray, te: np.ndarray, max_gap_s: Optional[float] = None
+) -> np.ndarray:
+    """
+    Índice de la fila con t más cercano a cada ``te`` (búsqueda binaria, O((n+m) log n)).
+
+    - Filas con t NaN se ignoran; ``te`` NaN -> -1.
+    - Empate entre vecino anterior y posterior: gana el anterior en el tiempo; con
+      t repetidos, la primera fila. Con t ordenado (un run normal) es el mismo
+      resultado que ``np.argmin(np.abs(t_arr - te))``.
+    - Si ``max_gap_s`` está definido, distancias mayores -> -1 (sin casar).
+    """
+    t_arr = np.asarray(t_arr, dtype=float)
+    te = np.asarray(te, dtype=float)
+    out = np.full(te.shape, -1, dtype=np.int64)
+    valid = np.flatnonzero(~np.isnan(t_arr))
+    if valid.size == 0 or te.size == 0:
+        return out
+    order = valid[np.argsort(t_arr[valid], kind="stable")]
+    ts = t_arr[order]
+    ok = ~np.isnan(te)
+    q = te[ok]
+    hi = np.searchsorted(ts, q, side="left")  # primer ts >= q
+    lo = np.clip(hi - 1, 0, ts.size - 1)
+    hi_c = np.clip(hi, 0, ts.size - 1)
+    d_lo = np.where(hi > 0, q - ts[lo], np.inf)
+    d_hi = np.where(hi < ts.size, ts[hi_c] - q, np.inf)
+    use_lo = d_lo <= d_hi
+    pick = np.where(use_lo, lo, hi_c)
+    # t repetidos: primera aparición del valor elegido
+    pick = np.searchsorted(ts, ts[pick], side="left")
+    gap = np.minimum(d_lo, d_hi)
+    res = order[pick]
+    if max_gap_s is not None:
+        res = np.where(gap <= float(max_gap_s), res, -1)
+    out[ok] = res
+    return out
+
+
 def match_events_without_odom(
     e_odom: np.ndarray,
     df_t: pd.Series,
     df_odom: pd.Series,
     events: list[dict],
+    max_gap_s: Optional[float] = None,
 ) -> np.ndarray:
     """
     Rellena odómetros faltantes en e_odom casando por tiempo: usa t_wall o t_game del evento
-    y toma el odómetro de la fila más cercana en el CSV.
+    y toma el odómetro de la fila más cercana en el CSV (todas a la vez, ver
+    ``nearest_time_index``). Con ``max_gap_s`` los eventos demasiado lejos de
+    cualquier fila se quedan en NaN.
     """
     if not len(events):
         return e_odom
-    t_arr = df_t.to_numpy(dtype=float, copy=False)
     out = e_odom.copy()
     limit_events = [e for e in events if str(e.get("type")) == "speed_limit_change"]
-    for i, ev in enumerate(limit_events):
-        if not np.isnan(out[i]):
-            continue
-        te = None
-        for k in ("t_wall", "t_game", "t_ingame", "time"):
-            if k in ev and ev[k] is not None:
-                te = float(ev[k])
-                break
-        if te is None:
-            continue
-        idx = int(np.argmin(np.abs(t_arr - te)))
-        out[i] = float(df_odom.iloc[idx])
+    missing = np.flatnonzero(np.isnan(out[: len(limit_events)]))
+    if missing.size == 0:
+        return out
+    te = np.array(
+        [_event_time(limit_events[i]) for i in missing], dtype=float
+    )  # None -> NaN
+    idx = nearest_time_index(df_t.to_numpy(dtype=float), te, max_gap_s=max_gap_s)
+    od = df_odom.to_numpy(dtype=float)
+    hit = idx >= 0
+    out[missing[hit]] = od[idx[hit]]
     return out
 
 
@@ -246,6 +319,260 @@ def compute_distances(
     return df_out, e_odom_res, e_next
 
 
+# --- modo incremental -------------------------------------------------------
+#
+# El checkpoint (<out>.ckpt.json) guarda:
+#   - run_offset: byte del run.csv donde empieza la primera fila NO volcada
+#   - events_offset: byte de events.jsonl hasta el que ya se leyó
+#   - limits: eventos speed_limit_change ya resueltos [(odom, next_kph)]
+#   - unmatched: eventos sin odómetro cuyo instante aún no tiene filas
+#   - probes: probes getdata_next_limit aún relevantes (t >= última fila volcada)
+#   - horizon: mayor t_wall visto en eventos (el fichero se escribe en orden)
+#   - odom_carry: (t, odom) de la última fila volcada si el odómetro se integra
+#   - history: cola (t, odom) de filas volcadas, para casar eventos tardíos
+#
+# Una fila se vuelca cuando ya no puede cambiar: t_wall <= horizon y, o bien
+# hay un límite conocido más adelante (odom < máx odom de límites), o bien un
+# probe le da distancia. El resto se re-lee en la siguiente pasada.
+
+_HISTORY_ROWS = 2000
+
+
+def checkpoint_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".ckpt.json")
+
+
+def _load_checkpoint(path: Path, run_path: Path) -> dict:
+    ck: dict = {}
+    if path.exists():
+        try:
+            ck = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            ck = {}
+    if ck.get("run_path") != run_path.resolve().as_posix():
+        ck = {}
+    try:
+        # run.csv truncado o rotado -> empezar de cero
+        if int(ck.get("run_offset", 0)) > run_path.stat().st_size:
+            ck = {}
+    except OSError:
+        pass
+    ck.setdefault("run_path", run_path.resolve().as_posix())
+    ck.setdefault("run_offset", 0)
+    ck.setdefault("events_offset", 0)
+    for k in ("limits", "unmatched", "probes", "history"):
+        ck.setdefault(k, [])
+    ck.setdefault("horizon", None)
+    ck.setdefault("odom_carry", None)
+    return ck
+
+
+def _save_checkpoint(path: Path, ck: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(ck), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _read_events_from(path: Path, offset: int) -> Tuple[list[dict], int]:
+    """Eventos de líneas completas a partir de ``offset``; devuelve el nuevo offset."""
+    if not path.exists():
+        return [], offset
+    if path.stat().st_size < offset:
+        offset = 0  # rotado/truncado
+    with path.open("rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    out: list[dict] = []
+    for line in data[:end].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            out.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return out, offset + end
+
+
+def _read_rows_from(run_path: Path, offset: int) -> Tuple[pd.DataFrame, np.ndarray, int]:
+    """Filas completas desde ``offset`` como texto (se copian tal cual a la salida).
+
+    Devuelve (df, fin_de_fila_en_bytes[i], offset_de_la_cabecera_si_se_leyó).
+    """
+    with run_path.open("rb") as f:
+        header_line = f.readline()
+        body_start = f.tell()
+        f.seek(max(offset, body_start))
+        base = f.tell()
+        data = f.read()
+    sep = sniff_delimiter(header_line.decode("utf-8", errors="ignore"))
+    header = [c.strip().strip('"') for c in header_line.decode("utf-8", errors="ignore").rstrip("\r\n").split(sep)]
+    lines: List[bytes] = []
+    ends: List[int] = []
+    pos = 0
+    while True:
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            break  # línea incompleta: se leerá en la próxima pasada
+        line = data[pos:nl]
+        pos = nl + 1
+        if line.strip():
+            lines.append(line)
+            ends.append(base + pos)
+    if not lines:
+        return pd.DataFrame(columns=header), np.array([], dtype=np.int64), body_start
+    df = pd.read_csv(
+        io.BytesIO(b"\n".join(lines)),
+        sep=sep,
+        header=None,
+        names=header,
+        dtype=str,
+        keep_default_na=False,
+        engine="c",
+    )
+    return df, np.asarray(ends, dtype=np.int64), body_start
+
+
+def _num(df: pd.DataFrame, *cands: str) -> Optional[np.ndarray]:
+    s = pick_series(df, *cands)
+    if s is None:
+        return None
+    return to_float_loose_series(s).to_numpy(dtype=float)
+
+
+def _chunk_odom(df: pd.DataFrame, t: np.ndarray, carry: Optional[list]) -> np.ndarray:
+    od = _num(df, "odom_m", "distance_m", "odom")
+    if od is not None:
+        return od
+    v = _num(df, "v_ms", "speed_ms")
+    if v is None:
+        v_kph = _num(df, "speed_kph", "kph", "speed_kmh")
+        if v_kph is None:
+            raise ValueError(
+                "No hay odom_m ni velocidad para integrarla (esperaba speed_kph/v_ms)."
+            )
+        v = v_kph / 3.6
+    v = np.nan_to_num(v, nan=0.0)
+    t_f = pd.Series(t).ffill().bfill().to_numpy(dtype=float)
+    if carry is not None and len(t_f):
+        dt = np.diff(t_f, prepend=float(carry[0]))
+        return float(carry[1]) + np.cumsum(v * dt)
+    dt = np.diff(t_f, prepend=t_f[0] if len(t_f) else 0.0)
+    return np.cumsum(v * dt)
+
+
+def run_incremental(
+    run_path: Path,
+    ev_path: Path,
+    out_path: Path,
+    finalize: bool = False,
+    ckpt_path: Optional[Path] = None,
+) -> int:
+    """Procesa solo lo nuevo desde el checkpoint y añade las filas resueltas a ``out_path``.
+
+    Devuelve el número de filas añadidas.
+    """
+    ckpt_path = ckpt_path or checkpoint_path(out_path)
+    ck = _load_checkpoint(ckpt_path, run_path)
+    if ck["run_offset"] == 0 and out_path.exists():
+        out_path.unlink()  # checkpoint nuevo/invalidado: regenerar salida completa
+
+    # 1) eventos nuevos (una sola lectura)
+    new_events, ck["events_offset"] = _read_events_from(ev_path, int(ck["events_offset"]))
+    for ev in new_events:
+        te = ev.get("t_wall")
+        if isinstance(te, (int, float)):
+            ck["horizon"] = float(te) if ck["horizon"] is None else max(ck["horizon"], float(te))
+    ck["probes"].extend([list(p) for p in extract_probes(new_events)])
+    e_odom, e_next = extract_limit_events(new_events)
+    limit_evs = [e for e in new_events if str(e.get("type")) == "speed_limit_change"]
+    for i, ev in enumerate(limit_evs):
+        if np.isnan(e_odom[i]):
+            ck["unmatched"].append({"t": _event_time(ev), "next": float(e_next[i])})
+        else:
+            ck["limits"].append([float(e_odom[i]), float(e_next[i])])
+
+    # 2) filas desde la primera no volcada
+    df, ends, body_start = _read_rows_from(run_path, int(ck["run_offset"]))
+    if ck["run_offset"] == 0:
+        ck["run_offset"] = body_start
+    if df.empty:
+        _save_checkpoint(ckpt_path, ck)
+        return 0
+    t = _num(df, "t_wall", "time_wall_s", "time", "t")
+    if t is None:
+        t = np.arange(len(df), dtype=float)
+    odom = _chunk_odom(df, t, ck["odom_carry"])
+
+    # 3) casar eventos sin odómetro con filas (historial + bloque actual)
+    hist = np.asarray(ck["history"], dtype=float).reshape(-1, 2)
+    t_all = np.concatenate([hist[:, 0], t])
+    od_all = np.concatenate([hist[:, 1], odom])
+    t_max = np.nanmax(t_all) if np.isfinite(t_all).any() else -np.inf
+    still: list = []
+    ready: list = []
+    for ev in ck["unmatched"]:
+        te = ev.get("t")
+        if te is None:
+            continue  # sin tiempo no se puede casar nunca
+        (ready if te <= t_max or finalize else still).append(ev)
+    if ready:
+        idx = nearest_time_index(t_all, np.array([ev["t"] for ev in ready], dtype=float))
+        for ev, i in zip(ready, idx):
+            if i >= 0:
+                ck["limits"].append([float(od_all[i]), float(ev.get("next", np.nan))])
+    ck["unmatched"] = still
+
+    # 4) distancias con todos los límites conocidos
+    lim = np.asarray(ck["limits"], dtype=float).reshape(-1, 2)
+    lim = lim[np.argsort(lim[:, 0], kind="stable")] if len(lim) else lim
+    dist = np.full(len(df), np.nan)
+    next_lim = np.full(len(df), np.nan)
+    if len(lim):
+        idx = np.searchsorted(lim[:, 0], odom, side="right")
+        has_next = idx < len(lim)
+        dist[has_next] = lim[idx[has_next], 0] - odom[has_next]
+        next_lim[has_next] = lim[idx[has_next], 1]
+    probe = _align_probes(pd.DataFrame({"t_wall": t}), [tuple(p) for p in ck["probes"]])
+    if probe is not None:
+        p_arr = probe.to_numpy(dtype=float)
+        dist = np.where(np.isnan(p_arr), dist, p_arr)
+
+    # 5) prefijo de filas que ya no pueden cambiar
+    if finalize:
+        n_done = len(df)
+    else:
+        horizon = ck["horizon"] if ck["horizon"] is not None else -np.inf
+        max_lim = lim[:, 0].max() if len(lim) else -np.inf
+        has_probe = np.zeros(len(df), dtype=bool) if probe is None else ~np.isnan(probe.to_numpy(dtype=float))
+        ok = (t <= horizon) & ((odom < max_lim) | has_probe)
+        bad = np.flatnonzero(~ok)
+        n_done = int(bad[0]) if bad.size else len(df)
+    if n_done == 0:
+        _save_checkpoint(ckpt_path, ck)
+        return 0
+
+    out = df.iloc[:n_done].copy()
+    out["dist_next_limit_m"] = dist[:n_done]
+    out["next_limit_kph"] = next_lim[:n_done]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(out_path, mode="a", header=not out_path.exists(), index=False)
+
+    # 6) avanzar checkpoint
+    ck["run_offset"] = int(ends[n_done - 1])
+    t_last = float(t[n_done - 1])
+    ck["odom_carry"] = [t_last, float(odom[n_done - 1])]
+    new_hist = np.column_stack([t[:n_done], odom[:n_done]])
+    ck["history"] = np.concatenate([hist, new_hist])[-_HISTORY_ROWS:].tolist()
+    # probes: conservar el último <= t_last (sample&hold) y los posteriores
+    pr = sorted(ck["probes"])
+    older = [p for p in pr if p[0] <= t_last]
+    ck["probes"] = older[-1:] + [p for p in pr if p[0] > t_last]
+    _save_checkpoint(ckpt_path, ck)
+    return n_done
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Añade dist_next_limit_m al último run.")
     ap.add_argument(
@@ -268,6 +595,16 @@ def main() -> None:
         action="store_true",
         help="Si el run ya es .dist.csv, escribe <base>.dist2.csv en vez de sobrescribir",
     )
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Procesar solo filas/eventos nuevos desde el último checkpoint y añadir a la salida",
+    )
+    ap.add_argument(
+        "--finalize",
+        action="store_true",
+        help="(con --incremental) volcar también las filas aún sin resolver (fin de sesión)",
+    )
     args = ap.parse_args()
 
     run_path = Path(args.run) if args.run else latest_csv()
@@ -285,14 +622,19 @@ def main() -> None:
         )
         out_path = run_path.with_name(target)
 
-    # Detectar delimitador automáticamente (nuestros CSV suelen ser ';')
-    df = pd.read_csv(run_path, sep=None, engine="python")
+    if args.incremental:
+        n = run_incremental(run_path, ev_path, out_path, finalize=args.finalize)
+        print(f"[dist] +{n} filas → {out_path}")
+        return
+
+    # Cargador compartido: columnar si existe, si no CSV con parser C
+    df = load_run(run_path)
     events = read_events(ev_path)
     # 1) Cálculo existente por eventos de límite y odómetro
     df_out, _, _ = compute_distances(df, events)
     # 2) Si hay probes getdata_next_limit con distancias, preferirlos
     try:
-        s_probe = dist_from_getdata_probes(df_out, ev_path)
+        s_probe = dist_from_getdata_probes(df_out, ev_path, events=events)
     except Exception:
         s_probe = None
     if s_probe is not None and not s_probe.isna().all():
@@ -2,9 +2,16 @@ from __future__ import annotations
 
 import csv
 import json
+import sys
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/drain_lua_bus.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ingestion import bus_cursor  # noqa: E402
+
 # Re-export normalize so tests can call drain.normalize(...)
 try:
     from runtime.events_bus import normalize  # type: ignore
@@ -23,39 +30,22 @@ def load_offset(
     - If state file exists: return stored integer offset.
     - If not: start at 0 (read existing content) regardless of from_start to match tests.
     """
-    state = Path(state_path)
-    try:
-        if state.exists():
-            txt = state.read_text(encoding="utf-8").strip()
-            return int(txt) if txt else 0
-    except Exception:
-        return 0
-    return 0
+    return bus_cursor.load_offset(state_path)
 
 
 def iter_new_lines(bus_path: Path | str, offset: int) -> Tuple[List[str], int]:
     """Read new JSONL lines from bus_path starting at byte offset.
 
-    Returns (lines, new_offset).
+    Returns (lines, new_offset). Only complete lines are returned: a line still
+    being written stays for the next call (see ``ingestion.bus_cursor``).
     """
-    p = Path(bus_path)
-    if not p.exists():
-        return [], offset
-    size = p.stat().st_size
-    if offset < 0 or offset > size:
-        offset = 0
-    lines: List[str] = []
-    with p.open("r", encoding="utf-8") as f:
-        f.seek(offset)
-        for line in f:
-            if line:
-                lines.append(line.rstrip("\n"))
-        new_off = f.tell()
+    raw, new_off = bus_cursor.read_new_lines(bus_path, offset)
+    lines: List[str] = [ln.decode("utf-8", errors="ignore") for ln in raw]
     return lines, new_off
 
 
 def write_offset(state_path: Path | str, offset: int) -> None:
-    Path(state_path).write_text(str(offset), encoding="utf-8")
+    bus_cursor.write_offset(state_path, offset)
 
 
 def last_csv_row(repo_root: Path | str) -> Dict[str, Any]:
@@ -129,26 +119,25 @@ def _main(repo_root: Path) -> int:  # pragma: no cover
     out.parent.mkdir(parents=True, exist_ok=True)
     state = repo_root / "data" / ".lua_bus.offset"
 
-    off = load_offset(state, bus)
-    lines, new_off = iter_new_lines(bus, off)
-    if not lines:
-        return 0
-    row = last_csv_row(repo_root)
-    with out.open("a", encoding="utf-8") as f:
-        for line in lines:
-            try:
-                evt = json.loads(line)
-            except Exception:
-                continue
-            e = enrich(evt, row)
-            n = normalize(e)
-            f.write(json.dumps(n, ensure_ascii=False) + "\n")
-    write_offset(state, new_off)
+    # offset persistido en `state`; se guarda tras escribir la salida
+    cursor = bus_cursor.BusCursor(bus, state_path=state, from_end=False, autocommit=False)
+    try:
+        events = cursor.read_batch()
+        if not events:
+            return 0
+        row = last_csv_row(repo_root)
+        with out.open("a", encoding="utf-8") as f:
+            for evt in events:
+                e = enrich(evt, row)
+                n = normalize(e)
+                f.write(json.dumps(n, ensure_ascii=False) + "\n")
+        cursor.commit()
+    finally:
+        # autocommit=False: close() no guarda el offset si la salida falló
+        cursor.close()
     return 0
 
 
 if __name__ == "__main__":  # pragma: no cover
-    import sys
-
     code = _main(Path.cwd())
     sys.exit(code)
@@ -0,0 +1,170 @@
+"""
+Informe de latencias por etapa (p50/p95/p99) a partir de los sellos ``ts_*``
+(ver ``runtime/latency.py``).
+
+- Telemetría: salida del control (``--ctrl``) con ctrl_read/decision/rd_send/
+  rd_ack; ingest sale de la propia fila o, si falta (fuente SQLite), de
+  ``--run`` uniendo por ``t_wall``; commit, de la tabla ``commits`` de ``--db``
+  (sello que RunStore toma tras cada COMMIT), por el rango t_first..t_last.
+- Eventos: ``events.jsonl`` con bridge_read/bus_write/ingest/write (``write``
+  lo sella el escritor de eventos al escribir el lote; no es un COMMIT y no se
+  compara con el ``commit`` de la telemetría). ``limit_reached`` hereda los
+  sellos del evento que lo dispara.
+
+Uso:
+  python tools/latency_report.py --ctrl data/ctrl_live.csv --run data/runs/run.csv --db data/run.db
+  python tools/latency_report.py --events data/events/events.jsonl --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/latency_report.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from runtime.latency import COLUMNS, stage_latencies_ms, summarize  # noqa: E402
+from tools.run_loader import load_run  # noqa: E402
+
+TELEMETRY_STAGES = ("ingest", "commit", "ctrl_read", "decision", "rd_send", "rd_ack")
+EVENT_STAGES = ("bridge_read", "bus_write", "ingest", "write")
+
+
+def _numeric(df: pd.DataFrame, cols) -> pd.DataFrame:
+    for c in cols:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df
+
+
+def commits_table(db_path: Path) -> pd.DataFrame:
+    """Tabla ``commits`` de run.db (t_first, t_last, ts_commit); vacía si no existe."""
+    cols = ["t_first", "t_last", "ts_commit"]
+    try:
+        con = sqlite3.connect(f"file:{db_path.as_posix()}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return pd.DataFrame(columns=cols)
+    try:
+        return pd.read_sql_query(f"SELECT {', '.join(cols)} FROM commits ORDER BY t_first", con)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.DataFrame(columns=cols)
+    finally:
+        con.close()
+
+
+def _join_commits(ctrl: pd.DataFrame, commits: pd.DataFrame) -> pd.DataFrame:
+    """``ts_commit`` del lote cuyo rango t_first..t_last contiene el ``t_wall`` de cada fila."""
+    ctrl = ctrl.drop(columns=["ts_commit"], errors="ignore")
+    if commits.empty:
+        return ctrl
+    commits = _numeric(commits.copy(), commits.columns).dropna().sort_values("t_first")
+    order = ctrl["t_wall"].sort_values(kind="stable").index
+    left = ctrl.loc[order, ["t_wall"]].reset_index()
+    m = pd.merge_asof(
+        left.dropna(subset=["t_wall"]), commits, left_on="t_wall", right_on="t_first", direction="backward"
+    )
+    m.loc[m["t_wall"] > m["t_last"], "ts_commit"] = np.nan
+    ctrl["ts_commit"] = m.set_index("index")["ts_commit"].reindex(ctrl.index)
+    return ctrl
+
+
+def telemetry_table(
+    ctrl_path: Path, run_path: Optional[Path] = None, db_path: Optional[Path] = None
+) -> pd.DataFrame:
+    """Filas del control con los sellos de toda la cadena de telemetría."""
+    ctrl = _numeric(load_run(ctrl_path), ("t_wall", *COLUMNS))
+    missing = [c for c in ("ts_ingest", "ts_commit") if c not in ctrl.columns or ctrl[c].isna().all()]
+    if missing and run_path is not None and run_path.exists():
+        run = load_run(run_path)
+        have = [c for c in missing if c in run.columns]
+        if have and "t_wall" in run.columns:
+            run = _numeric(run[["t_wall", *have]].copy(), ("t_wall", *have))
+            # t_wall se copia tal cual de la fila leída: clave de unión exacta (a µs)
+            key = "_t_us"
+            run[key] = (run["t_wall"] * 1e6).round()
+            ctrl[key] = (ctrl["t_wall"] * 1e6).round()
+            run = run.drop(columns=["t_wall"]).drop_duplicates(subset=[key], keep="last")
+            ctrl = ctrl.drop(columns=[c for c in have if c in ctrl.columns])
+            ctrl = ctrl.merge(run, on=key, how="left").drop(columns=[key])
+    no_commit = "ts_commit" not in ctrl.columns or ctrl["ts_commit"].isna().all()
+    if no_commit and db_path is not None and db_path.exists():
+        ctrl = _join_commits(ctrl, commits_table(db_path))
+    return ctrl
+
+
+def events_table(events_path: Path) -> pd.DataFrame:
+    rows: List[Dict[str, Any]] = []
+    with events_path.open("r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ev = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            raw = ev.get("raw") if isinstance(ev.get("raw"), dict) else {}
+            rec = {c: ev.get(c, raw.get(c)) for c in COLUMNS}
+            if any(v is not None for v in rec.values()):
+                rec["type"] = ev.get("type")
+                rows.append(rec)
+    return _numeric(pd.DataFrame(rows, columns=["type", *COLUMNS]), COLUMNS)
+
+
+def report(
+    ctrl_path: Optional[Path] = None,
+    run_path: Optional[Path] = None,
+    events_path: Optional[Path] = None,
+    db_path: Optional[Path] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    if ctrl_path is not None and ctrl_path.exists():
+        out["telemetry"] = summarize(
+            stage_latencies_ms(telemetry_table(ctrl_path, run_path, db_path), TELEMETRY_STAGES)
+        )
+    if events_path is not None and events_path.exists():
+        out["events"] = summarize(stage_latencies_ms(events_table(events_path), EVENT_STAGES))
+    return out
+
+
+def _fmt(v: Any) -> str:
+    return f"{v:9.2f}" if isinstance(v, float) and np.isfinite(v) else f"{'-':>9}"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Latencias por etapa (p50/p95/p99) de un run")
+    ap.add_argument("--ctrl", type=Path, default=Path("data/ctrl_live.csv"), help="CSV de salida del control")
+    ap.add_argument("--run", type=Path, default=Path("data/runs/run.csv"), help="run.csv del colector")
+    ap.add_argument("--db", type=Path, default=Path("data/run.db"), help="run.db con la tabla commits")
+    ap.add_argument("--events", type=Path, default=Path("data/events/events.jsonl"))
+    ap.add_argument("--json", type=Path, default=None, help="Guardar el informe en JSON")
+    args = ap.parse_args()
+
+    rep = report(args.ctrl, args.run, args.events, args.db)
+    if not rep:
+        print("[latency] no hay ficheros con sellos ts_*")
+        sys.exit(1)
+    for chain, rows in rep.items():
+        print(f"== {chain} (ms)")
+        print(f"{'tramo':<24}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+        for r in rows:
+            print(
+                f"{r['segment']:<24}{r['n']:>7}"
+                + "".join(_fmt(r.get(k)) for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+            )
+    if args.json:
+        args.json.write_text(json.dumps(rep, indent=2), encoding="utf-8")
+        print(f"[latency] OK → {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,33 +5,16 @@ import csv
 from pathlib import Path
 from typing import Optional
 
+from runtime.parsing import sniff_delimiter, to_float_or_none
 from storage.run_store_sqlite import RunStore
 
 
 def pick_delim(line: str) -> str:
-    cands = [",", ";", "\t", "|"]
-    counts = [(d, line.count(d)) for d in cands]
-    d = max(counts, key=lambda t: t[1])[0]
-    return d if line.count(d) > 0 else ","
+    return sniff_delimiter(line)
 
 
 def to_float_loose(s: Optional[str]) -> Optional[float]:
-    if s is None:
-        return None
-    v = str(s).strip()
-    if v == "" or v.lower() == "nan":
-        return None
-    # si contiene coma, asumimos coma decimal y puntos como separador de miles
-    if "," in v:
-        v = v.replace(".", "").replace(",", ".")
-    else:
-        # si hay más de un punto, probablemente son separadores de miles
-        if v.count(".") > 1:
-            v = v.replace(".", "")
-    try:
-        return float(v)
-    except Exception:
-        return None
+    return to_float_or_none(s)
 
 
 def main(in_csv: str = "data/runs/run.csv", out_db: str = "data/run.db") -> None:
@@ -11,7 +11,7 @@ from typing import Optional
 
 import numpy as np
 
-from runtime.braking_era import EraCurve, compute_target_speed_kph_era
+from runtime.braking_era import compute_target_speed_kph_era, load_era_curve
 from runtime.braking_v0 import BrakingConfig, compute_target_speed_kph
 from runtime.guards import RateLimiter, clamp01, overspeed_guard
 from runtime.profiles import load_braking_profile, load_profile_extras
@@ -198,7 +198,7 @@ def main() -> None:
         cfg = replace(cfg, reaction_time_s=float(args.reaction))
 
     era_curve_path = args.era_curve or extras.get("era_curve_csv")
-    curve = EraCurve.from_csv(era_curve_path) if era_curve_path else None
+    curve = load_era_curve(era_curve_path) if era_curve_path else None
 
     # Estado de eventos y rate limiters
     ev_stream = NonBlockingEventStream(
@@ -311,8 +311,12 @@ def main() -> None:
 
         # 4) objetivo y PID
         if curve and next_limit_kph is not None:
+            try:
+                grad_pct = float(row.get("gradient") or 0.0)
+            except (TypeError, ValueError):
+                grad_pct = 0.0
             v_tgt, phase = compute_target_speed_kph_era(
-                speed_kph, next_limit_kph, dist_next_limit_m, curve=curve, cfg=cfg
+                speed_kph, next_limit_kph, dist_next_limit_m, curve=curve, gradient_pct=grad_pct, cfg=cfg
             )
         else:
             # compute_target_speed_kph (vectorizado) -> usar tamaño 1
@@ -9,7 +9,7 @@ try:
 except Exception:  # pragma: no cover - best-effort plotting
     plt = None
 
-from runtime.braking_era import EraCurve, compute_target_speed_kph_era
+from runtime.braking_era import compute_target_speed_kph_era, load_era_curve
 from runtime.braking_v0 import BrakingConfig
 from runtime.profiles import load_braking_profile, load_profile_extras
 
@@ -29,7 +29,7 @@ def main(v_now: float, limit: float, dmax: float, step: float, profile: str) ->
         print("Profile does not include 'era_curve_csv' in extras", file=sys.stderr)
         return
 
-    curve = EraCurve.from_csv(era_csv)
+    curve = load_era_curve(era_csv)
 
     ds = [i * step for i in range(int(dmax / step) + 1)]
     vs = []
@@ -19,81 +19,64 @@ import csv
 import json
 import math
 import os
+import sys
 from pathlib import Path
 from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
 import matplotlib
+import numpy as np
 
 matplotlib.use("Agg")  # sin GUI
 
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/plot_run.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def _detect_delimiter(sample: str) -> str:
-    return ";" if sample.count(";") >= sample.count(",") else ","
+from tools.run_loader import detect_format, load_arrays, load_run  # noqa: E402
+
+
+def _nullable(arr: Any) -> List[Optional[float]]:
+    return [None if math.isnan(x) else float(x) for x in arr]
 
 
 def read_run_csv(path: str) -> Dict[str, List[Any]]:
     if not os.path.exists(path):
         raise FileNotFoundError(f"No existe CSV: {path}")
-    try:
-        csv.field_size_limit(50 * 1024 * 1024)
-    except Exception:
-        pass
-    t_ing: List[Optional[float]] = []
-    v_kmh: List[Optional[float]] = []
-    odom: List[Optional[float]] = []
-    throttle: List[Optional[float]] = []
-    brake: List[Optional[float]] = []
-    phase: List[Optional[str]] = []
-    with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
-        sample = f.read(4096)
-        delim = _detect_delimiter(sample)
-        f.seek(0)
-        r = csv.DictReader(f, delimiter=delim)
-        for row in r:
-            # tiempo in-game -> horas decimales (si existen columnas)
-            try:
-                H = float(row.get("time_ingame_h") or 0.0)
-                M = float(row.get("time_ingame_m") or 0.0)
-                S = float(row.get("time_ingame_s") or 0.0)
-                tg = H + M / 60.0 + S / 3600.0
-            except Exception:
-                tg = None
-            t_ing.append(tg)
-            # velocidad
-            try:
-                vk = float(
-                    row.get("v_kmh")
-                    or (row.get("SpeedometerKPH") or 0.0)
-                    or (row.get("speed_kph") or 0.0)
-                )
-            except Exception:
-                vk = None
-            v_kmh.append(vk)
-            # odómetro
-            try:
-                om = float(row.get("odom_m") or 0.0)
-            except Exception:
-                om = None
-            odom.append(om)
-            # señales opcionales del controlador
-            try:
-                th = row.get("throttle")
-                throttle.append(float(th) if th not in (None, "") else None)
-            except Exception:
-                throttle.append(None)
-            try:
-                br = row.get("brake")
-                brake.append(float(br) if br not in (None, "") else None)
-            except Exception:
-                brake.append(None)
-            ph = row.get("phase")
-            phase.append(ph if ph not in (None, "") else None)
+    # cargador compartido (parser C + caché); columnas ausentes -> NaN
+    cols = [
+        "time_ingame_h",
+        "time_ingame_m",
+        "time_ingame_s",
+        "v_kmh",
+        "SpeedometerKPH",
+        "speed_kph",
+        "odom_m",
+        "throttle",
+        "brake",
+    ]
+    a = load_arrays(path, cols)
+    df_phase = load_run(path, ["phase"]) if "phase" in detect_format(path).columns else None
+
+    def z(x: Any) -> Any:
+        return np.nan_to_num(x, nan=0.0)
+
+    # tiempo in-game -> horas decimales (columnas ausentes/vacías cuentan como 0)
+    t_ing = z(a["time_ingame_h"]) + z(a["time_ingame_m"]) / 60.0 + z(a["time_ingame_s"]) / 3600.0
+    # velocidad: primera disponible entre v_kmh / SpeedometerKPH / speed_kph
+    v = np.where(
+        np.isnan(a["v_kmh"]),
+        np.where(np.isnan(a["SpeedometerKPH"]), a["speed_kph"], a["SpeedometerKPH"]),
+        a["v_kmh"],
+    )
+    phase: List[Optional[str]] = [None] * len(t_ing)
+    if df_phase is not None and "phase" in df_phase.columns:
+        phase = [p if isinstance(p, str) and p != "" else None for p in df_phase["phase"]]
     return {
-        "t_ing": t_ing,
-        "v_kmh": v_kmh,
-        "odom": odom,
-        "throttle": throttle,
-        "brake": brake,
+        "t_ing": [float(x) for x in t_ing],
+        "v_kmh": [float(x) for x in z(v)],
+        "odom": [float(x) for x in z(a["odom_m"])],
+        "throttle": _nullable(a["throttle"]),
+        "brake": _nullable(a["brake"]),
         "phase": phase,  # Optional[str]
     }
 
@@ -0,0 +1,389 @@
+"""
+Reproducción offline en lazo cerrado del control online.
+
+Ejecuta ``runtime.control_loop.ControlStepper`` (la misma lógica de ciclo que
+``control_loop.main``) contra un run grabado + sus eventos, con tiempo
+simulado: sin ``time.sleep`` ni ``time.time()``, tan rápido como dé la CPU.
+Una sesión de 30 min a 5 Hz son ~9000 ciclos: segundos en lugar de minutos.
+
+En cada ciclo (periodo ``1/hz`` sobre el ``t_wall`` grabado):
+
+1. los ``getdata_next_limit`` cuyo ``t_wall`` ya se alcanzó se entregan al
+   control; su distancia se recalcula contra la posición SIMULADA (cada sonda
+   se fija a una posición absoluta en la vía: odómetro grabado + distancia);
+2. el control decide freno (y tracción en modo ``full``) con la velocidad y
+   el odómetro simulados;
+3. se integran velocidad y odómetro hasta el ciclo siguiente.
+
+Maquinista (modos ``brake``/``advisory``, la IA no acelera), ``driver``:
+
+- ``follow`` (por defecto): sigue la velocidad grabada (aceleración grabada
+  + corrección proporcional acotada a ``thrust``/``brake_decel``), así que sin frenada del control la trayectoria
+  simulada ES la grabada y los KPI se miden sobre el run real;
+- ``throttle`` (opcional): reproduce ``Regulator``/``throttle`` del run a
+  través de la física del ``FakeRailDriver`` (``ingestion.rd_fake.accel_mps2``).
+  Ese modelo no está calibrado contra la locomotora real y la velocidad
+  simulada se separa de la grabada; útil solo para pruebas con el fake
+  (``drag=0.05`` reproduce sus coeficientes).
+
+Mientras el control frena, el maquinista suelta el acelerador: freno de
+``accel_mps2`` (sin tracción) o la deceleración grabada si es mayor. En
+modo ``full`` la tracción del PID pasa por ``accel_mps2``.
+
+El resultado es un DataFrame en memoria con las columnas de salida del
+control (``next_limit_kph``, ``dist_next_limit_m``, ``brake``...) más las de
+la simulación; sirve directamente a ``tools.validate_kpi.compute_kpis``.
+
+Uso:
+  python -m tools.replay_sim --run data/runs/run.csv --events data/events/events.jsonl \\
+      --rise-per-s 0.2 --hold-s 0.2 --out data/replay.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/replay_sim.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ingestion.rd_fake import accel_mps2  # noqa: E402
+from runtime import latency  # noqa: E402
+from runtime.braking_v0 import BrakingConfig  # noqa: E402
+from runtime.control_loop import ControlStepper, build_config  # noqa: E402
+from runtime.mode_guard import ModeGuard  # noqa: E402
+from tools.run_loader import load_run  # noqa: E402
+
+# Sonda de próximo límite: (t_wall de aparición, posición absoluta del hito [m], límite [km/h])
+Probe = Tuple[float, float, float]
+
+# Ganancia del maquinista que sigue la velocidad grabada [1/s]
+DRIVER_KP = 0.5
+DRIVERS = ("follow", "throttle")
+# Rozamiento por defecto [1/s]: en deriva ~0.14 m/s² a 100 km/h. El del
+# fake (0.05) limita la velocidad a 57.6 km/h con tracción plena.
+DEFAULT_DRAG = 0.005
+
+
+def _num_col(df: pd.DataFrame, *cands: str) -> Optional[np.ndarray]:
+    for c in cands:
+        if c in df.columns:
+            vals = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+            if np.isfinite(vals).any():
+                return vals
+    return None
+
+
+def _fill(x: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Interpola los NaN sobre ``t`` (bordes: valor más cercano)."""
+    ok = np.isfinite(x)
+    if ok.all() or not ok.any():
+        return x
+    return np.interp(t, t[ok], x[ok])
+
+
+def _probe_fields(ev: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    """(kph, dist_m) de un ``getdata_next_limit`` crudo (bus LUA) o normalizado (events.jsonl)."""
+    meta = ev.get("meta") if isinstance(ev.get("meta"), dict) else {}
+    kph = None
+    for k in ("kph", "speed_kph", "limit_kph", "limit_next_kmh"):
+        if ev.get(k) is not None:
+            kph = ev[k]
+            break
+    if kph is None:
+        kph = meta.get("to")
+    dist = None
+    for k in ("dist_m", "dist", "dist_est_m"):
+        if ev.get(k) is not None:
+            dist = ev[k]
+            break
+    if dist is None:
+        dist = meta.get("dist_m")
+    try:
+        return (None if kph is None else float(kph)), (None if dist is None else float(dist))
+    except (TypeError, ValueError):
+        return None, None
+
+
+def read_events(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    """JSONL de eventos (líneas inválidas se ignoran)."""
+    out: List[Dict[str, Any]] = []
+    p = Path(path)
+    if not p.exists():
+        return out
+    with p.open("r", encoding="utf-8", errors="ignore") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ev = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(ev, dict):
+                out.append(ev)
+    return out
+
+
+def probes_from_events(
+    events: Iterable[Dict[str, Any]], t_rec: np.ndarray, odom_rec: np.ndarray
+) -> List[Probe]:
+    """Sondas con posición absoluta: odómetro del evento (o el grabado en su ``t_wall``) + distancia."""
+    out: List[Probe] = []
+    for ev in events:
+        if ev.get("type") == "custom" and isinstance(ev.get("payload"), dict):
+            ev = {**ev, **ev["payload"]}
+        if ev.get("type") != "getdata_next_limit":
+            continue
+        kph, dist = _probe_fields(ev)
+        try:
+            t = float(ev["t_wall"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if kph is None or dist is None or not np.isfinite(t):
+            continue
+        try:
+            odom = float(ev["odom_m"])
+        except (KeyError, TypeError, ValueError):
+            odom = float(np.interp(t, t_rec, odom_rec))
+        if not np.isfinite(odom):
+            odom = float(np.interp(t, t_rec, odom_rec))
+        out.append((t, odom + dist, kph))
+    out.sort(key=lambda p: p[0])
+    return out
+
+
+def probes_from_columns(df: pd.DataFrame, t_rec: np.ndarray, odom_rec: np.ndarray) -> List[Probe]:
+    """Sondas a partir de ``next_limit_kph``/``dist_next_limit_m`` del propio run (una por cambio de límite)."""
+    lim = _num_col(df, "next_limit_kph", "limit_next_kph")
+    dist = _num_col(df, "dist_next_limit_m", "next_limit_dist_m")
+    if lim is None or dist is None:
+        return []
+    out: List[Probe] = []
+    prev = np.nan
+    for i in range(len(lim)):
+        if not (np.isfinite(lim[i]) and np.isfinite(dist[i])):
+            prev = np.nan
+            continue
+        if lim[i] != prev:
+            out.append((float(t_rec[i]), float(odom_rec[i] + dist[i]), float(lim[i])))
+        prev = lim[i]
+    return out
+
+
+def replay(
+    run: Union[str, Path, pd.DataFrame],
+    events: Union[str, Path, Iterable[Dict[str, Any]], None] = None,
+    *,
+    hz: float = 5.0,
+    mode: str = "brake",
+    cfg: Optional[BrakingConfig] = None,
+    extras: Optional[Dict[str, object]] = None,
+    startup_gate_s: Optional[float] = None,
+    hold_s: Optional[float] = None,
+    rise_per_s: Optional[float] = None,
+    fall_per_s: Optional[float] = None,
+    substeps: int = 4,
+    duration_s: Optional[float] = None,
+    driver: str = "follow",
+    thrust: float = 0.8,
+    brake_decel: float = 1.2,
+    drag: float = DEFAULT_DRAG,
+) -> pd.DataFrame:
+    """Reproduce ``run`` en lazo cerrado y devuelve una fila por ciclo de control.
+
+    ``events``: ruta JSONL o lista de eventos; sin eventos se usan las columnas
+    ``next_limit_kph``/``dist_next_limit_m`` del run si existen.
+    ``driver``: ``follow`` (velocidad grabada) o ``throttle`` (acelerador grabado
+    por la física del fake; sin columna de acelerador se usa ``follow``).
+    ``thrust``/``brake_decel``/``drag``: coeficientes de ``accel_mps2``.
+    """
+    if driver not in DRIVERS:
+        raise ValueError(f"driver must be one of {DRIVERS}")
+    df = run if isinstance(run, pd.DataFrame) else load_run(Path(run))
+    t_rec = _num_col(df, "t_wall")
+    if t_rec is None:
+        raise ValueError("run sin columna t_wall")
+    keep = np.isfinite(t_rec)
+    df = df.loc[keep].reset_index(drop=True)
+    t_rec = t_rec[keep]
+    order = np.argsort(t_rec, kind="stable")
+    df = df.iloc[order].reset_index(drop=True)
+    t_rec = t_rec[order]
+    if len(t_rec) == 0:
+        raise ValueError("run vacío")
+
+    v_rec = _num_col(df, "speed_kph", "v_kmh", "SpeedometerKPH")
+    odom_rec = _num_col(df, "odom_m")
+    if v_rec is None and odom_rec is None:
+        raise ValueError("run sin velocidad ni odómetro")
+    if odom_rec is None:
+        # odómetro integrado desde la velocidad grabada
+        v_ms = np.nan_to_num(_fill(v_rec, t_rec)) / 3.6  # type: ignore[arg-type]
+        odom_rec = np.concatenate([[0.0], np.cumsum(np.diff(t_rec) * 0.5 * (v_ms[1:] + v_ms[:-1]))])
+    odom_rec = _fill(odom_rec, t_rec)
+    if v_rec is None:
+        dt = np.maximum(np.diff(t_rec), 1e-3)
+        v_rec = np.concatenate([[0.0], np.maximum(0.0, np.diff(odom_rec) / dt * 3.6)])
+    v_rec = np.nan_to_num(_fill(v_rec, t_rec))
+    thr_rec = _num_col(df, "Regulator", "throttle")
+    if thr_rec is not None:
+        thr_rec = np.nan_to_num(_fill(thr_rec, t_rec))
+
+    if events is None:
+        probes = probes_from_columns(df, t_rec, odom_rec)
+    else:
+        evs = read_events(events) if isinstance(events, (str, Path)) else list(events)
+        probes = probes_from_events(evs, t_rec, odom_rec)
+
+    period = 1.0 / max(0.5, float(hz))
+    stepper = ControlStepper(
+        cfg,
+        extras,
+        period=period,
+        startup_gate_s=startup_gate_s,
+        hold_s=hold_s,
+        rise_per_s=rise_per_s,
+        fall_per_s=fall_per_s,
+    )
+    guard = ModeGuard(mode)
+    t_end = float(t_rec[-1])
+    if duration_s is not None:
+        t_end = min(t_end, float(t_rec[0]) + float(duration_s))
+    t_grid = np.arange(float(t_rec[0]), t_end + 1e-9, period)
+    v_drv = np.interp(t_grid, t_rec, v_rec)
+    odom_drv = np.interp(t_grid, t_rec, odom_rec)
+    thr_drv = None if thr_rec is None or driver != "throttle" else np.interp(t_grid, t_rec, thr_rec)
+    # aceleración grabada [m/s²] (el maquinista "follow" la reproduce)
+    a_drv = np.gradient(v_drv / 3.6, t_grid) if len(t_grid) > 1 else np.zeros(len(t_grid))
+
+    v_ms = float(v_drv[0]) / 3.6
+    odom = float(odom_drv[0])
+    nsub = max(1, int(substeps))
+    h = period / nsub
+    pi = 0
+    rows: List[Dict[str, Any]] = []
+    for k, t in enumerate(t_grid):
+        due: List[Dict[str, Any]] = []
+        while pi < len(probes) and probes[pi][0] <= t:
+            _, pos, kph = probes[pi]
+            due.append({"type": "getdata_next_limit", "kph": kph, "dist_m": pos - odom})
+            pi += 1
+        out = stepper.step(
+            {"t_wall": float(t), "odom_m": odom, "speed_kph": v_ms * 3.6},
+            drain=lambda: due,
+        )
+        if out is None:
+            continue
+        t_send, b_send = guard.clamp_outputs(stepper.throttle_plan, stepper.brake_cmd)
+        brk = float(b_send) if b_send is not None else 0.0
+        thr: Optional[float]
+        if t_send is not None:
+            thr = float(t_send)
+        elif brk > 0.0:
+            thr = 0.0
+        elif thr_drv is not None:
+            thr = float(thr_drv[k])
+        else:
+            thr = None  # maquinista "follow": sin mando de acelerador
+        v_ref, a_ref = float(v_drv[k]) / 3.6, float(a_drv[k])
+        for j in range(nsub):
+            # maquinista que sigue la velocidad grabada dentro del ciclo (rampa con a_ref);
+            # la corrección no supera la tracción/freno disponibles
+            corr = DRIVER_KP * (v_ref + a_ref * j * h - v_ms)
+            a_follow = a_ref + min(thrust, max(-brake_decel, corr))
+            if t_send is not None:
+                a = accel_mps2(float(t_send), brk, v_ms, thrust, brake_decel, drag)
+            elif brk > 0.0:
+                # el control frena: sin tracción; la frenada grabada, si es mayor, se mantiene
+                a = min(accel_mps2(0.0, brk, v_ms, thrust, brake_decel, drag), a_follow)
+            elif thr is not None:
+                a = accel_mps2(thr, 0.0, v_ms, thrust, brake_decel, drag)
+            else:
+                a = a_follow
+            v_next = max(0.0, v_ms + a * h)
+            odom += 0.5 * (v_ms + v_next) * h
+            v_ms = v_next
+        out["throttle_applied"] = float("nan") if thr is None else thr
+        out["brake_applied"] = brk
+        out["speed_rec_kph"] = float(v_drv[k])
+        out["odom_rec_m"] = float(odom_drv[k])
+        rows.append(out)
+
+    res = pd.DataFrame(rows)
+    res = res.drop(columns=[c for c in latency.COLUMNS if c in res.columns])
+    for c in ("next_limit_kph", "next_limit_used_kph", "dist_next_limit_m", "active_limit_kph"):
+        if c in res.columns:
+            res[c] = pd.to_numeric(res[c], errors="coerce")
+    return res
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Reproducción offline en lazo cerrado del control online")
+    p.add_argument("--run", type=Path, default=Path("data/runs/run.csv"))
+    p.add_argument(
+        "--events",
+        type=Path,
+        default=None,
+        help="events.jsonl o bus LUA; sin él se usan next_limit_kph/dist_next_limit_m del run",
+    )
+    p.add_argument("--out", type=Path, default=None, help="CSV de salida (opcional)")
+    p.add_argument("--hz", type=float, default=5.0)
+    p.add_argument("--mode", choices=["full", "brake", "advisory"], default="brake")
+    p.add_argument("--profile", type=str, default=None)
+    p.add_argument("--A", type=float, default=None)
+    p.add_argument("--margin-kph", type=float, default=None)
+    p.add_argument("--reaction", type=float, default=None)
+    p.add_argument("--rise-per-s", type=float, default=None)
+    p.add_argument("--fall-per-s", type=float, default=None)
+    p.add_argument("--startup-gate-s", type=float, default=None)
+    p.add_argument("--hold-s", type=float, default=None)
+    p.add_argument("--duration", type=float, default=None, help="Segundos simulados (por defecto: todo el run)")
+    p.add_argument(
+        "--driver",
+        choices=DRIVERS,
+        default="follow",
+        help="Maquinista: follow (velocidad grabada) o throttle (acelerador grabado, física del fake)",
+    )
+    p.add_argument("--drag", type=float, default=DEFAULT_DRAG, help="Rozamiento proporcional [1/s] (fake: 0.05)")
+    args = p.parse_args()
+
+    cfg, extras = build_config(args.profile, margin_kph=args.margin_kph, A=args.A, reaction=args.reaction)
+    t0 = time.perf_counter()
+    res = replay(
+        args.run,
+        args.events,
+        hz=args.hz,
+        mode=args.mode,
+        cfg=cfg,
+        extras=extras,
+        startup_gate_s=args.startup_gate_s,
+        hold_s=args.hold_s,
+        rise_per_s=args.rise_per_s,
+        fall_per_s=args.fall_per_s,
+        duration_s=args.duration,
+        driver=args.driver,
+        drag=args.drag,
+    )
+    wall = time.perf_counter() - t0
+    sim_s = float(res["t_wall"].iloc[-1] - res["t_wall"].iloc[0]) if len(res) else 0.0
+    print(
+        f"[replay] ciclos={len(res)} simulado={sim_s:.1f} s real={wall:.2f} s "
+        f"(x{sim_s / wall if wall > 0 else float('inf'):.0f})"
+    )
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        res.to_csv(args.out, index=False)
+        print(f"[replay] OK -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Cargador compartido de runs para las herramientas offline.
+
+Orden de preferencia:
+  1) ``<run>.f64`` (formato columnar de ``storage.columnar``) si existe junto al
+     CSV, no es más antiguo que él y cubre sus mismas filas (mismo primer
+     ``t_wall`` y último ``t_wall`` no anterior al del CSV): un ``.f64`` de una
+     sesión previa a la rotación del CSV se ignora;
+  2) el CSV, detectando el delimitador por la cabecera y usando el parser C
+     de pandas (``engine="c"``), no el motor Python de ``sep=None``.
+
+Un CSV grabado por cambios (``collector --delta``, columna ``keyframe``) se
+devuelve ya reconstruido en filas densas.
+
+El formato (tipo, delimitador, cabecera) se detecta una vez por fichero y se
+cachea junto con el DataFrame ya parseado, con clave (ruta, tamaño, mtime).
+Así una misma invocación que encadena dist -> frenada -> KPI -> informe
+parsea cada fichero una sola vez; si el fichero cambia, la clave cambia.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from runtime.delta_recorder import KEYFRAME_COL, reconstruct
+from runtime.parsing import (sniff_delimiter, to_float_loose,
+                             to_float_loose_series)
+from storage.columnar import (SUFFIX, columnar_path_for, read_columnar,
+                              read_schema, schema_path)
+
+# Columnas conocidas que siempre son numéricas: se piden como float64 al parser C
+NUMERIC_COLUMNS = frozenset(
+    {
+        "t_wall",
+        "odom_m",
+        "v_ms",
+        "v_kmh",
+        "speed_kph",
+        "speed_filt_kph",
+        "SpeedometerKPH",
+        "next_limit_kph",
+        "next_limit_used_kph",
+        "cur_limit_used_kph",
+        "active_limit_kph",
+        "dist_next_limit_m",
+        "target_speed_kph",
+        "throttle",
+        "brake",
+        "lat",
+        "lon",
+        "heading",
+        "gradient",
+        "time_ingame_h",
+        "time_ingame_m",
+        "time_ingame_s",
+    }
+)
+
+_CACHE_MAX = 8
+
+
+class RunFormat(NamedTuple):
+    kind: str  # "csv" | "columnar"
+    path: Path  # fichero que realmente se lee
+    sep: str
+    columns: Tuple[str, ...]
+
+
+FileKey = Tuple[str, int, int]
+
+_format_cache: Dict[str, Tuple[FileKey, RunFormat]] = {}
+_frame_cache: "OrderedDict[Tuple[FileKey, Optional[Tuple[str, ...]]], pd.DataFrame]" = OrderedDict()
+stats = {"parses": 0, "hits": 0}
+
+
+def file_key(path: str | Path) -> FileKey:
+    p = Path(path).resolve()
+    st = p.stat()
+    return (p.as_posix(), st.st_size, st.st_mtime_ns)
+
+
+def clear_cache() -> None:
+    _format_cache.clear()
+    _frame_cache.clear()
+
+
+def detect_delimiter(path: str | Path) -> str:
+    """Delimitador por la primera línea: ';' (colector) o ',' (control loop)."""
+    with Path(path).open("r", encoding="utf-8", errors="ignore") as f:
+        head = f.readline()
+    return sniff_delimiter(head)
+
+
+def _csv_t_bounds(path: Path) -> Tuple[float, float]:
+    """Primer y último ``t_wall`` del CSV leyendo solo cabecera, primera fila y cola."""
+    nan = float("nan")
+    with path.open("rb") as f:
+        head = f.readline().decode("utf-8", errors="ignore")
+        first = f.readline().decode("utf-8", errors="ignore")
+        if not first.endswith("\n"):
+            first = ""  # primera fila aún a medio escribir
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 64 * 1024))
+        tail = f.read().decode("utf-8", errors="ignore")
+    sep = sniff_delimiter(head)
+    cols = [c.strip().strip('"') for c in head.rstrip("\r\n").split(sep)]
+    if "t_wall" not in cols:
+        return nan, nan
+    i = cols.index("t_wall")
+    # última línea completa (una fila a medio escribir no cuenta)
+    lines = [ln for ln in tail.split("\n")[:-1] if ln.strip()]
+    last = lines[-1] if lines else ""
+
+    def t_of(line: str) -> float:
+        parts = line.rstrip("\r\n").split(sep)
+        return to_float_loose(parts[i]) if i < len(parts) else nan
+
+    return t_of(first), t_of(last)
+
+
+def _columnar_consistent(csv_path: Path, col_path: Path) -> bool:
+    """``True`` si el ``.f64`` cubre las filas del CSV (misma sesión)."""
+    t_first, t_last = _csv_t_bounds(csv_path)
+    if t_first != t_first:  # CSV vacío o sin t_wall: nada que contradiga al .f64
+        return True
+    # memmap: solo se tocan la primera y la última fila
+    cols, mat = read_columnar(col_path)
+    if "t_wall" not in cols or mat.shape[0] == 0:
+        return False
+    j = cols.index("t_wall")
+    f_first, f_last = float(mat[0, j]), float(mat[-1, j])
+    del mat
+    if abs(f_first - t_first) > 1e-6:
+        return False
+    # el .f64 puede ir por delante del CSV (buffers distintos), nunca por detrás
+    return not (t_last == t_last and f_last < t_last - 1e-6)
+
+
+def _columnar_for(path: Path) -> Optional[Path]:
+    if path.suffix == SUFFIX:
+        return path
+    cand = columnar_path_for(path)
+    if not schema_path(cand).exists() or not cand.exists():
+        return None
+    try:
+        if path.exists() and cand.stat().st_mtime < path.stat().st_mtime - 1.0:
+            # el CSV es más reciente (editado o regenerado): mandan sus datos
+            return None
+        if path.exists() and not _columnar_consistent(path, cand):
+            # .f64 de otra sesión (CSV rotado) o incompleto: mandan los datos del CSV
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return cand
+
+
+def detect_format(path: str | Path, prefer_columnar: bool = True) -> RunFormat:
+    """Detecta (y cachea por ruta/tamaño/mtime) el formato de un run."""
+    p = Path(path)
+    col_path = _columnar_for(p) if prefer_columnar else None
+    target = col_path or p
+    key = file_key(target)
+    cached = _format_cache.get(key[0])
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if col_path is not None:
+        fmt = RunFormat("columnar", col_path, "", tuple(read_schema(col_path)["columns"]))
+    else:
+        with p.open("r", encoding="utf-8", errors="ignore") as f:
+            head = f.readline()
+        sep = sniff_delimiter(head)
+        cols_csv = tuple(c.strip().strip('"') for c in head.rstrip("\r\n").split(sep))
+        fmt = RunFormat("csv", p, sep, cols_csv)
+    _format_cache[key[0]] = (key, fmt)
+    return fmt
+
+
+def _parse(fmt: RunFormat, columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    if fmt.kind == "csv" and KEYFRAME_COL in fmt.columns:
+        # run por cambios: leer con el marcador y rellenar cada tramo de keyframe
+        extra = None if columns is None else [*columns, KEYFRAME_COL]
+        keep = columns is not None and KEYFRAME_COL in columns
+        return reconstruct(_parse_plain(fmt, extra), keep_marker=keep)
+    return _parse_plain(fmt, columns)
+
+
+def _parse_plain(fmt: RunFormat, columns: Optional[Sequence[str]]) -> pd.DataFrame:
+    if fmt.kind == "columnar":
+        cols, mat = read_columnar(fmt.path, columns)
+        # copia: no mantener el memmap (y el fichero) abierto tras cargar
+        return pd.DataFrame(mat, columns=cols, copy=True)
+    wanted = list(fmt.columns) if columns is None else [c for c in fmt.columns if c in set(columns)]
+    dtypes = {c: "float64" for c in wanted if c in NUMERIC_COLUMNS}
+    usecols = None if columns is None else wanted
+    try:
+        return pd.read_csv(
+            fmt.path, sep=fmt.sep, engine="c", usecols=usecols, dtype=dtypes, low_memory=False
+        )
+    except (ValueError, TypeError):
+        # alguna columna "numérica" trae texto (p. ej. coma decimal): leer sin
+        # dtypes y convertir de forma tolerante solo esas columnas
+        df = pd.read_csv(fmt.path, sep=fmt.sep, engine="c", usecols=usecols, low_memory=False)
+        for c in dtypes:
+            if c in df.columns:
+                df[c] = to_float_loose_series(df[c])
+        return df
+
+
+def load_run(
+    path: str | Path,
+    columns: Optional[Sequence[str]] = None,
+    prefer_columnar: bool = True,
+    cache: bool = True,
+) -> pd.DataFrame:
+    """Carga un run (CSV o columnar) como DataFrame.
+
+    El resultado se cachea; cada llamada devuelve una copia, así que el
+    llamador puede modificarla sin afectar a otras herramientas.
+    """
+    fmt = detect_format(path, prefer_columnar=prefer_columnar)
+    if not cache:
+        stats["parses"] += 1
+        return _parse(fmt, columns)
+    ck = (file_key(fmt.path), None if columns is None else tuple(columns))
+    df = _frame_cache.get(ck)
+    if df is None:
+        stats["parses"] += 1
+        df = _parse(fmt, columns)
+        _frame_cache[ck] = df
+        while len(_frame_cache) > _CACHE_MAX:
+            _frame_cache.popitem(last=False)
+    else:
+        stats["hits"] += 1
+        _frame_cache.move_to_end(ck)
+    return df.copy()
+
+
+def load_arrays(
+    path: str | Path, columns: Sequence[str], prefer_columnar: bool = True
+) -> Dict[str, np.ndarray]:
+    """Columnas pedidas como arrays float64 (NaN si faltan o no son numéricas)."""
+    fmt = detect_format(path, prefer_columnar=prefer_columnar)
+    present: List[str] = [c for c in columns if c in fmt.columns]
+    df = load_run(path, present, prefer_columnar=prefer_columnar)
+    n = len(df)
+    out: Dict[str, np.ndarray] = {}
+    for c in columns:
+        if c in df.columns:
+            out[c] = to_float_loose_series(df[c]).to_numpy(dtype=float)
+        else:
+            out[c] = np.full(n, np.nan)
+    return out
+
+
+__all__ = [
+    "NUMERIC_COLUMNS",
+    "RunFormat",
+    "clear_cache",
+    "detect_delimiter",
+    "detect_format",
+    "file_key",
+    "load_arrays",
+    "load_run",
+    "sniff_delimiter",
+]
@@ -1,18 +1,22 @@
 from __future__ import annotations
 
 import argparse
+import sys
 from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/session_report.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.run_loader import load_run  # noqa: E402
+
 
 def _load_csv(p: Path) -> pd.DataFrame:
-    with p.open("r", encoding="utf-8", errors="ignore") as f:
-        head = f.readline()
-    sep = "," if head.count(",") >= head.count(";") else ";"
-    df = pd.read_csv(p, sep=sep, engine="python")
+    df = load_run(p)
     for c in [
         "t_wall",
         "odom_m",
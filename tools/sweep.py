@@ -0,0 +1,427 @@
+"""
+Sweep paralelo de parámetros del control sobre la reproducción offline.
+
+Sustituye el bucle serie de ``scripts/sweep_brake_params.py`` (un
+subproceso en tiempo real por combinación, ``duration`` segundos cada uno):
+
+- cada combinación se evalúa con ``tools.replay_sim.replay`` (lazo cerrado,
+  tiempo simulado) y ``tools.validate_kpi.compute_kpis``;
+- las combinaciones se reparten en un ``ProcessPoolExecutor`` (``--workers``);
+- cada resultado se cachea en ``data/sweep/cache/<sha256>.json`` con clave
+  (hash del run, hash de los eventos, parámetros, ajustes de la reproducción,
+  versión del código). Repetir o ampliar un sweep solo evalúa lo nuevo;
+  tocar el control o la física invalida la caché sola;
+- muestreo ``grid`` (producto cartesiano), ``random`` (uniforme) o ``lhs``
+  (hipercubo latino: una muestra por estrato en cada dimensión);
+- un único resumen CSV o Parquet (por la extensión de ``--out``; Parquet
+  necesita ``pyarrow``, si falta se escribe CSV al lado).
+
+Uso:
+  python -m tools.sweep --run data/runs/run.csv --events data/events/events.jsonl \\
+      --param rise_per_s=0.05,0.1,0.2 --param hold_s=0.1,0.2 --out data/sweep/summary.parquet
+  python -m tools.sweep --run data/runs/run.csv --sampler lhs -n 300 \\
+      --param rise_per_s=0.05:1.5 --param hold_s=0.1:1.0 --param startup_gate_s=0.5:4
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/sweep.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from runtime.control_loop import build_config  # noqa: E402
+from tools.replay_sim import DEFAULT_DRAG, DRIVERS, replay  # noqa: E402
+from tools.validate_kpi import compute_kpis  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = Path("data/sweep/cache")
+CACHE_VERSION = 2
+
+# Parámetros barribles -> destino (argumento de replay o override de build_config)
+REPLAY_PARAMS = ("rise_per_s", "fall_per_s", "startup_gate_s", "hold_s")
+CONFIG_PARAMS = ("A", "margin_kph", "reaction")
+PARAMS = REPLAY_PARAMS + CONFIG_PARAMS
+
+# Paquetes del repo cuyos módulos importados definen el resultado de una
+# evaluación (versión del código en la clave de caché)
+CODE_PACKAGES = ("ingestion", "runtime", "storage", "tools")
+
+# KPI de tools.validate_kpi.compute_kpis que pasan al resumen
+VALIDATE_KPIS = ("arrivals", "arrivals_ok", "monotonicity_bumps", "mean_margin_last50_kph")
+KPI_COLUMNS = VALIDATE_KPIS + (
+    "brake_max",
+    "brake_mean",
+    "overspeed_max_kph",
+    "rd_zero_count",
+    "rd_intermediate_count",
+    "rd_full_count",
+)
+
+# Espacio: nombre -> lista de valores (grid) o rango (lo, hi) (random/lhs)
+Space = Mapping[str, Sequence[float]]
+
+
+# --- muestreo ---------------------------------------------------------------
+def _check_space(space: Space) -> None:
+    unknown = [k for k in space if k not in PARAMS]
+    if unknown:
+        raise ValueError(f"parámetros desconocidos: {unknown} (válidos: {list(PARAMS)})")
+    for k, vals in space.items():
+        if len(vals) == 0:
+            raise ValueError(f"{k}: sin valores")
+
+
+def sample_grid(space: Space, n: Optional[int] = None, seed: Optional[int] = None) -> List[Dict[str, float]]:
+    """Producto cartesiano de las listas de valores (``n``/``seed`` se ignoran)."""
+    _check_space(space)
+    names = list(space)
+    return [dict(zip(names, map(float, combo))) for combo in itertools.product(*(space[k] for k in names))]
+
+
+def _bounds(space: Space) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    _check_space(space)
+    names = list(space)
+    lo = np.array([min(space[k]) for k in names], dtype=float)
+    hi = np.array([max(space[k]) for k in names], dtype=float)
+    return names, lo, hi
+
+
+def sample_random(space: Space, n: Optional[int] = None, seed: Optional[int] = None) -> List[Dict[str, float]]:
+    """``n`` puntos uniformes en [min, max] de cada parámetro."""
+    names, lo, hi = _bounds(space)
+    rng = np.random.default_rng(seed)
+    u = rng.random((int(n or 1), len(names)))
+    return [dict(zip(names, map(float, row))) for row in lo + u * (hi - lo)]
+
+
+def sample_lhs(space: Space, n: Optional[int] = None, seed: Optional[int] = None) -> List[Dict[str, float]]:
+    """Hipercubo latino: ``n`` estratos por parámetro, un punto en cada uno."""
+    names, lo, hi = _bounds(space)
+    k = int(n or 1)
+    rng = np.random.default_rng(seed)
+    u = np.empty((k, len(names)))
+    for j in range(len(names)):
+        u[:, j] = (rng.permutation(k) + rng.random(k)) / k
+    return [dict(zip(names, map(float, row))) for row in lo + u * (hi - lo)]
+
+
+SAMPLERS = {"grid": sample_grid, "random": sample_random, "lhs": sample_lhs}
+
+
+# --- claves de caché ----------------------------------------------------------
+def file_sha256(path: Optional[os.PathLike | str]) -> str:
+    """sha256 del contenido (cadena vacía si no hay fichero)."""
+    if path is None or not Path(path).exists():
+        return ""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def code_files(root: Path = ROOT) -> List[Path]:
+    """Ficheros del repo importados en este proceso.
+
+    Las dependencias de ``evaluate`` se importan al cargar este módulo, así
+    que todo lo que usa la evaluación (control, física, KPI, cargador...)
+    está aquí sin mantener una lista a mano. Un módulo de más solo produce
+    un fallo de caché, nunca un resultado obsoleto.
+    """
+    root = root.resolve()
+    out = set()
+    for name, mod in list(sys.modules.items()):
+        if name.split(".", 1)[0] not in CODE_PACKAGES:
+            continue
+        f = getattr(mod, "__file__", None)
+        if not f:
+            continue
+        path = Path(f).resolve()
+        if path.is_relative_to(root):
+            out.add(path)
+    return sorted(out)
+
+
+def code_version(files: Optional[Iterable[Path]] = None, root: Path = ROOT) -> str:
+    h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for path in code_files(root) if files is None else files:
+        h.update(Path(path).resolve().relative_to(root.resolve()).as_posix().encode())
+        h.update(file_sha256(path).encode())
+    return h.hexdigest()
+
+
+def cache_key(
+    run_hash: str,
+    events_hash: str,
+    params: Mapping[str, float],
+    settings: Mapping[str, Any],
+    code: str,
+) -> str:
+    payload = json.dumps(
+        {
+            "run": run_hash,
+            "events": events_hash,
+            "params": {k: float(v) for k, v in sorted(params.items())},
+            "settings": dict(sorted(settings.items())),
+            "code": code,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_load(cache_dir: Optional[Path], key: str) -> Optional[Dict[str, Any]]:
+    if cache_dir is None:
+        return None
+    try:
+        data = json.loads((cache_dir / f"{key}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _cache_save(cache_dir: Optional[Path], key: str, result: Mapping[str, Any]) -> None:
+    if cache_dir is None:
+        return
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        path = cache_dir / f"{key}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(result), encoding="utf-8")
+        tmp.replace(path)
+    except OSError:
+        pass
+
+
+# --- evaluación (proceso de trabajo) -----------------------------------------
+def sim_kpis(res: pd.DataFrame) -> Dict[str, Any]:
+    """KPI de ``compute_kpis`` + estadísticas de freno y conteos de envíos RD (0 / intermedio / 1.0)."""
+    out: Dict[str, Any] = {}
+    try:
+        k = compute_kpis(res.copy())
+        out.update({c: k[c] for c in VALIDATE_KPIS})
+    except SystemExit:
+        # run sin tramos con límite/distancia: sin KPI de llegada
+        out.update({c: float("nan") for c in VALIDATE_KPIS})
+    if len(res) == 0:
+        res = pd.DataFrame({"brake": [], "speed_kph": [], "next_limit_kph": []})
+    br = res["brake"].to_numpy(dtype=float)
+    lim = pd.to_numeric(res["next_limit_kph"], errors="coerce")
+    over = (pd.to_numeric(res["speed_kph"], errors="coerce") - lim).to_numpy(dtype=float)
+    over = over[np.isfinite(over)]
+    out["brake_max"] = float(br.max()) if br.size else 0.0
+    out["brake_mean"] = float(br.mean()) if br.size else 0.0
+    out["overspeed_max_kph"] = float(max(0.0, over.max())) if over.size else 0.0
+    out["rd_zero_count"] = int((br == 0.0).sum())
+    out["rd_full_count"] = int((br == 1.0).sum())
+    out["rd_intermediate_count"] = int(br.size - out["rd_zero_count"] - out["rd_full_count"])
+    return out
+
+
+def evaluate(job: Mapping[str, Any]) -> Dict[str, Any]:
+    """Una combinación: reproducción + KPI. Nivel de módulo para poder enviarla a otro proceso."""
+    t0 = time.perf_counter()
+    params = dict(job["params"])
+    settings = dict(job["settings"])
+    cfg, extras = build_config(
+        settings.get("profile"),
+        **{k: params[k] for k in CONFIG_PARAMS if k in params},
+    )
+    try:
+        res = replay(
+            job["run"],
+            job.get("events"),
+            hz=settings["hz"],
+            mode=settings["mode"],
+            cfg=cfg,
+            extras=extras,
+            driver=settings.get("driver", "follow"),
+            drag=settings["drag"],
+            duration_s=settings.get("duration_s"),
+            **{k: params[k] for k in REPLAY_PARAMS if k in params},
+        )
+        out: Dict[str, Any] = sim_kpis(res)
+        out["cycles"] = int(len(res))
+        out["error"] = ""
+    except Exception as e:  # una combinación rota no tumba el sweep
+        out = {"error": f"{type(e).__name__}: {e}"}
+    out["elapsed_s"] = time.perf_counter() - t0
+    return out
+
+
+# --- orquestación ---------------------------------------------------------------
+def run_sweep(
+    run: os.PathLike | str,
+    combos: Sequence[Mapping[str, float]],
+    events: Optional[os.PathLike | str] = None,
+    *,
+    hz: float = 5.0,
+    mode: str = "brake",
+    profile: Optional[str] = None,
+    driver: str = "follow",
+    drag: float = DEFAULT_DRAG,
+    duration_s: Optional[float] = None,
+    workers: Optional[int] = None,
+    cache_dir: Optional[os.PathLike | str] = CACHE_DIR,
+    progress: bool = False,
+) -> pd.DataFrame:
+    """Evalúa ``combos`` (en paralelo salvo ``workers<=1``) y devuelve una fila por combinación."""
+    settings: Dict[str, Any] = {
+        "hz": float(hz),
+        "mode": mode,
+        "profile": profile,
+        "profile_hash": file_sha256(profile) if profile else "",
+        "driver": driver,
+        "drag": float(drag),
+        "duration_s": duration_s,
+    }
+    cdir = Path(cache_dir) if cache_dir is not None else None
+    run_hash = file_sha256(run)
+    events_hash = file_sha256(events)
+    code = code_version()
+
+    rows: List[Optional[Dict[str, Any]]] = [None] * len(combos)
+    pending: List[Tuple[int, str, Dict[str, Any]]] = []
+    for i, params in enumerate(combos):
+        key = cache_key(run_hash, events_hash, params, settings, code)
+        hit = _cache_load(cdir, key)
+        if hit is not None:
+            rows[i] = {**params, **hit, "cached": True, "key": key}
+            continue
+        job = {"run": str(run), "events": str(events) if events else None, "params": dict(params), "settings": settings}
+        pending.append((i, key, job))
+
+    def done(i: int, key: str, result: Dict[str, Any]) -> None:
+        if not result.get("error"):
+            _cache_save(cdir, key, result)
+        rows[i] = {**combos[i], **result, "cached": False, "key": key}
+        if progress:
+            n_done = sum(r is not None for r in rows)
+            print(f"[sweep] {n_done}/{len(combos)} {dict(combos[i])} -> {result.get('error') or 'ok'}")
+
+    n_workers = workers if workers is not None else (os.cpu_count() or 1)
+    if n_workers <= 1 or len(pending) <= 1:
+        for i, key, job in pending:
+            done(i, key, evaluate(job))
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(pending))) as ex:
+            futs = {ex.submit(evaluate, job): (i, key) for i, key, job in pending}
+            for fut in as_completed(futs):
+                i, key = futs[fut]
+                try:
+                    result = fut.result()
+                except Exception as e:  # proceso de trabajo caído
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                done(i, key, result)
+
+    df = pd.DataFrame([r for r in rows if r is not None])
+    df["run_file"] = str(run)
+    first = [c for c in PARAMS if c in df.columns] + [c for c in KPI_COLUMNS if c in df.columns]
+    return df[first + [c for c in df.columns if c not in first]]
+
+
+def write_summary(df: pd.DataFrame, out: os.PathLike | str) -> Path:
+    """CSV o Parquet según la extensión; sin motor Parquet se escribe ``.csv`` al lado."""
+    path = Path(out)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".parquet":
+        try:
+            df.to_parquet(path, index=False)
+            return path
+        except ImportError:
+            path = path.with_suffix(".csv")
+            print(f"[sweep] sin pyarrow/fastparquet: resumen en CSV ({path})")
+    df.to_csv(path, index=False)
+    return path
+
+
+def parse_param(spec: str) -> Tuple[str, List[float]]:
+    """``"rise_per_s=0.05,0.1"`` (valores) o ``"rise_per_s=0.05:1.5"`` (rango lo:hi)."""
+    name, sep, vals = spec.partition("=")
+    name = name.strip().replace("-", "_")
+    if not sep or not vals.strip():
+        raise argparse.ArgumentTypeError(f"formato esperado nombre=v1,v2 o nombre=lo:hi: {spec!r}")
+    try:
+        if ":" in vals:
+            lo, hi = vals.split(":", 1)
+            return name, [float(lo), float(hi)]
+        return name, [float(v) for v in vals.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor no numérico en {spec!r}")
+
+
+# Espacio por defecto: el de scripts/sweep_brake_params.py
+DEFAULT_SPACE: Dict[str, List[float]] = {
+    "rise_per_s": [0.05, 0.1, 0.2],
+    "startup_gate_s": [0.5, 1.0, 2.0],
+    "hold_s": [0.1, 0.2],
+    "fall_per_s": [1.0],
+}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Sweep paralelo de parámetros del control (reproducción offline)")
+    p.add_argument("--run", type=Path, default=Path(os.environ.get("SWEEP_RUN_FILE", "data/runs/run.csv")))
+    p.add_argument("--events", type=Path, default=None)
+    p.add_argument(
+        "--param",
+        action="append",
+        type=parse_param,
+        default=[],
+        help="nombre=v1,v2,... (grid) o nombre=lo:hi (random/lhs). Repetible. "
+        f"Nombres: {', '.join(PARAMS)}",
+    )
+    p.add_argument("--sampler", choices=sorted(SAMPLERS), default="grid")
+    p.add_argument("-n", "--samples", type=int, default=100, help="Muestras para random/lhs")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--workers", type=int, default=None, help="Procesos (por defecto: núcleos)")
+    p.add_argument("--hz", type=float, default=5.0)
+    p.add_argument("--mode", choices=["full", "brake", "advisory"], default="brake")
+    p.add_argument("--profile", type=str, default=None)
+    p.add_argument("--driver", choices=DRIVERS, default="follow")
+    p.add_argument("--drag", type=float, default=DEFAULT_DRAG)
+    p.add_argument("--duration", type=float, default=None)
+    p.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--out", type=Path, default=Path("data/sweep/summary.csv"))
+    args = p.parse_args()
+
+    space = dict(args.param) if args.param else DEFAULT_SPACE
+    combos = SAMPLERS[args.sampler](space, args.samples, args.seed)
+    print(f"[sweep] {len(combos)} combinaciones ({args.sampler}) sobre {args.run}")
+    t0 = time.perf_counter()
+    df = run_sweep(
+        args.run,
+        combos,
+        args.events,
+        hz=args.hz,
+        mode=args.mode,
+        profile=args.profile,
+        driver=args.driver,
+        drag=args.drag,
+        duration_s=args.duration,
+        workers=args.workers,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        progress=True,
+    )
+    out = write_summary(df, args.out)
+    n_cached = int(df["cached"].sum()) if "cached" in df else 0
+    print(f"[sweep] {len(df)} filas ({n_cached} de caché) en {time.perf_counter() - t0:.1f} s -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,12 @@ from typing import Any, Dict, List, Tuple
 import numpy as np
 import pandas as pd
 
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/validate_kpi.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tools.run_loader import load_run  # noqa: E402
+
 
 def _choose_col(df: pd.DataFrame, candidates: List[str], name: str) -> str:
     """Elige la primera columna presente (case-insensitive)."""
@@ -188,7 +194,7 @@ def main():
     path = Path(args.csv)
     if not path.exists():
         raise SystemExit(f"[validate_kpi] No existe: {path}")
-    df = pd.read_csv(path)
+    df = load_run(path)
     k = compute_kpis(
         df,
         dist_col=args.dist_col,
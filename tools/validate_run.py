@@ -5,6 +5,13 @@ import json
 import os
 import sys
 from collections import Counter, deque
+from pathlib import Path
+
+if __package__ in (None, ""):
+    # ejecutado como script (python tools/validate_run.py): raíz del repo al path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from runtime.parsing import sniff_delimiter  # noqa: E402
 
 CSV_PATH = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "runs", "run.csv")
 EVT_PATH = (
@@ -44,7 +51,9 @@ def read_csv(path):
     except Exception:
         pass
     with open(path, newline="", encoding="utf-8") as f:
-        r = csv.DictReader(f, delimiter=";")
+        delim = sniff_delimiter(f.readline())
+        f.seek(0)
+        r = csv.DictReader(f, delimiter=delim)
         rows = list(r)
     return r.fieldnames, rows
 